@@ -15,12 +15,16 @@ load_dotenv()
 # Importer la validation des secrets (cela vérifiera en production)
 from modules.core.security import FLASK_SECRET_KEY
 from modules.core.utilisateurs import initialiser_systeme_utilisateurs
+from modules.core.stockage import obtenir_moteur_stockage
 
 app = Flask(__name__)
 
 # Initialiser le système d'utilisateurs au démarrage
 initialiser_systeme_utilisateurs()
 
+# Index des exercices de la banque (reconstruit s'il est périmé)
+obtenir_moteur_stockage().preparer()
+
 # Configuration de sécurité
 app.config['SECRET_KEY'] = FLASK_SECRET_KEY
 app.config['JSON_AS_ASCII'] = False
@@ -3,7 +3,8 @@ Routes API Flask - ProjetEducationPython
 Gestion complète et sécurisée de tous les endpoints
 """
 
-from flask import request, jsonify
+from flask import request, jsonify, Response, stream_with_context
+import json
 import sys
 import os
 from datetime import datetime, timedelta
@@ -45,12 +46,14 @@ from modules.core.fonctions import (
 from modules.core.progression import (
     charger_progression, mettre_a_jour_progression
 )
+from modules.core.journal_progression import sans_position_journal
 from modules.core.domaines import (
     charger_domaines, obtenir_themes_domaine
 )
 from modules.core.utilisateurs import (
     lister_utilisateurs, creer_utilisateur, selectionner_utilisateur, 
-    obtenir_utilisateur_actif, charger_utilisateurs
+    obtenir_utilisateur_actif, charger_utilisateurs,
+    obtenir_utilisateur, sauvegarder_utilisateur, email_deja_utilise
 )
 from modules.core.xp_systeme import (
     calculer_xp, calculer_niveau, xp_pour_prochain_niveau, SEUILS_NIVEAU
@@ -168,10 +171,7 @@ def register_routes(app, limiter):
                 }), 400
             
             # Vérifier si l'utilisateur existe déjà
-            utilisateurs_data = charger_utilisateurs()
-            utilisateurs = utilisateurs_data.get('utilisateurs', {})
-            
-            if username in utilisateurs:
+            if obtenir_utilisateur(username) is not None:
                 log_security_event('registration_failed', {
                     'reason': 'username_exists',
                     'username': username
@@ -182,16 +182,15 @@ def register_routes(app, limiter):
                 }), 409
             
             # Vérifier si l'email existe déjà
-            for user_data in utilisateurs.values():
-                if user_data and isinstance(user_data, dict) and user_data.get('email') == email:
-                    log_security_event('registration_failed', {
-                        'reason': 'email_exists',
-                        'email': email
-                    })
-                    return jsonify({
-                        'success': False,
-                        'error': 'Cet email est déjà utilisé'
-                    }), 409
+            if email_deja_utilise(email):
+                log_security_event('registration_failed', {
+                    'reason': 'email_exists',
+                    'email': email
+                })
+                return jsonify({
+                    'success': False,
+                    'error': 'Cet email est déjà utilisé'
+                }), 409
             
             # Hash du mot de passe
             password_hash = hash_password(password)
@@ -286,20 +285,17 @@ def register_routes(app, limiter):
             username = sanitize_string(data.get('username', ''))
             password = data.get('password', '')
             
-            # Charger les utilisateurs
-            utilisateurs_data = charger_utilisateurs()
-            utilisateurs = utilisateurs_data.get('utilisateurs', {})
+            # Charger l'utilisateur (lecture indexée)
+            user_data = obtenir_utilisateur(username)
             
             # Vérifier si l'utilisateur existe
-            if username not in utilisateurs:
+            if user_data is None:
                 log_auth_attempt(username, False, 'user_not_found')
                 return jsonify({
                     'success': False,
                     'error': 'Identifiants invalides'
                 }), 401
             
-            user_data = utilisateurs[username]
-            
             # Vérifier le mot de passe
             if not verify_password(password, user_data.get('password_hash', '')):
                 log_auth_attempt(username, False, 'invalid_password')
@@ -312,6 +308,7 @@ def register_routes(app, limiter):
             if 'statistiques' not in user_data:
                 user_data['statistiques'] = {}
             user_data['statistiques']['derniere_connexion'] = datetime.now().isoformat()
+            sauvegarder_utilisateur(username, user_data)
             
             # Générer les tokens JWT
             user_role = user_data.get('role', 'user')
@@ -387,14 +384,13 @@ def register_routes(app, limiter):
                 user_id = payload.get('user_id')
                 
                 # Récupérer les infos utilisateur pour générer un nouveau token
-                utilisateurs = charger_utilisateurs()
-                if user_id not in utilisateurs:
+                user_data = obtenir_utilisateur(user_id)
+                if user_data is None:
                     return jsonify({
                         'success': False,
                         'error': 'Utilisateur non trouvé'
                     }), 404
                 
-                user_data = utilisateurs[user_id]
                 user_role = user_data.get('role', 'user')
                 
                 # Générer un nouveau access token
@@ -442,16 +438,14 @@ def register_routes(app, limiter):
         try:
             username = request.username
             
-            utilisateurs = charger_utilisateurs()
+            user_data = obtenir_utilisateur(username)
             
-            if username not in utilisateurs:
+            if user_data is None:
                 return jsonify({
                     'success': False,
                     'error': 'Utilisateur non trouvé'
                 }), 404
             
-            user_data = utilisateurs[username]
-            
             # Retour sans le hash du mot de passe
             user_response = {k: v for k, v in user_data.items() if k != 'password_hash'}
             
@@ -474,6 +468,158 @@ def register_routes(app, limiter):
     # EXERCICES
     # ========================================================================
     
+    def _erreur_json(message, code=400):
+        return jsonify({'success': False, 'error': message}), code
+    
+    def _parametres_generation():
+        """
+        Valide le body de génération
+        
+        Returns:
+            tuple: ((domaine, theme, difficulte), None) ou (None, réponse d'erreur)
+        """
+        if not request.is_json:
+            return None, _erreur_json('Content-Type doit être application/json')
+        
+        data = request.get_json()
+        
+        # Validation des clés requises
+        required_keys = ['domaine', 'theme']
+        if not validate_json_keys(data, required_keys):
+            return None, _erreur_json('Champs requis: domaine, theme')
+        
+        # Validation et sanitization
+        domaine = sanitize_string(data.get('domaine', ''))
+        theme = sanitize_string(data.get('theme', ''))
+        difficulte = data.get('difficulte', 1)
+        
+        # Validation du domaine
+        if not validate_domain(domaine):
+            return None, _erreur_json('Domaine invalide')
+        
+        # Validation de la difficulté
+        if not validate_integer(difficulte, 1, 5):
+            return None, _erreur_json('Difficulté invalide (1-5)')
+        
+        return (domaine, theme, difficulte), None
+    
+    def _parametres_verification():
+        """
+        Valide le body de vérification et retrouve l'exercice
+        
+        Returns:
+            tuple: (dict des paramètres, None) ou (None, réponse d'erreur)
+        """
+        if not request.is_json:
+            return None, _erreur_json('Content-Type doit être application/json')
+        
+        data = request.get_json()
+        
+        # Validation des clés requises
+        required_keys = ['domaine', 'theme', 'code']
+        if not validate_json_keys(data, required_keys):
+            return None, _erreur_json('Champs requis: domaine, theme, code')
+        
+        domaine = sanitize_string(data.get('domaine', ''))
+        
+        # Validation du domaine
+        if not validate_domain(domaine):
+            return None, _erreur_json('Domaine invalide')
+        
+        return {
+            'data': data,
+            'domaine': domaine,
+            'theme': sanitize_string(data.get('theme', '')),
+            'code': data.get('code', ''),
+            'exercice_id': data.get('exercice_id', ''),
+            'exercice_enonce': data.get('exercice_enonce', ''),
+            'tentative': data.get('tentative', 1)
+        }, None
+    
+    def _exercice_a_verifier(params):
+        """Exercice complet de la banque (pour ses cas_test), sinon simple énoncé"""
+        from modules.core.fonctions import obtenir_exercice_par_id
+        
+        exercice_id = params['exercice_id']
+        exercice_complet = obtenir_exercice_par_id(exercice_id) if exercice_id else None
+        
+        if not exercice_complet:
+            # Fallback : créer un objet exercice simple
+            exercice_complet = {'enonce': params['exercice_enonce']}
+        return exercice_complet
+    
+    def _resultat_verification(params, username, est_correct, message):
+        """Tentatives, XP en cas de succès, log ; retourne le bloc 'data' de la réponse"""
+        tentative = params['tentative']
+        
+        # Gérer les tentatives
+        tentatives_restantes = 3 - tentative
+        peut_voir_correction = tentative >= 3
+        
+        # Préparer le message
+        if est_correct:
+            message_final = message
+            # Mise à jour XP et progression
+            try:
+                from modules.core.xp_systeme import calculer_xp
+                from modules.core.progression import charger_progression, mettre_a_jour_progression
+                
+                difficulte = params['data'].get('difficulte', 1)
+                xp_gagne = calculer_xp(difficulte, True)
+                
+                progression = charger_progression(username)
+                progression['xp'] = progression.get('xp', 0) + xp_gagne
+                progression['exercices_reussis'] = progression.get('exercices_reussis', 0) + 1
+                mettre_a_jour_progression(username, progression)
+            except Exception as prog_error:
+                print(f"Erreur progression: {prog_error}")
+        else:
+            message_final = message
+            if tentatives_restantes > 0:
+                message_final += f"\n\nIl vous reste {tentatives_restantes} tentative(s)"
+            elif peut_voir_correction:
+                message_final += "\n\nVoulez-vous voir la correction ?"
+        
+        # Log de sécurité
+        log_security_event('exercice_verification', {
+            'username': username,
+            'domaine': params['domaine'],
+            'theme': params['theme'],
+            'correct': est_correct,
+            'tentative': tentative
+        })
+        
+        return {
+            'correct': est_correct,
+            'message': message_final,
+            'correction_complete': message,
+            'tentatives_restantes': tentatives_restantes,
+            'peut_voir_correction': peut_voir_correction,
+            'tentative_actuelle': tentative
+        }
+    
+    def _reponse_sse(evenements):
+        """
+        Réponse text/event-stream : un événement SSE par dict produit
+        
+        Chaque dict {'type': ..., ...} devient "event: <type>" suivi de ses
+        données en JSON. Une erreur en cours de flux produit un événement 'erreur'.
+        """
+        def flux():
+            try:
+                for evenement in evenements:
+                    donnees = {k: v for k, v in evenement.items() if k != 'type'}
+                    yield f"event: {evenement['type']}\ndata: {json.dumps(donnees, ensure_ascii=False)}\n\n"
+            except Exception as e:
+                log_error(f"Erreur pendant un flux SSE: {str(e)}\n{traceback.format_exc()}")
+                yield f"event: erreur\ndata: {json.dumps({'error': 'Erreur interne du serveur'})}\n\n"
+        
+        return Response(stream_with_context(flux()), mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            # Désactive la mise en tampon des reverse proxies (nginx)
+            'X-Accel-Buffering': 'no'
+        })
+    
     @app.route('/api/exercices/generer', methods=['POST'])
     @limiter.limit("20 per hour")
     @require_auth
@@ -487,45 +633,16 @@ def register_routes(app, limiter):
         Returns: {success, data: {exercice}}
         """
         try:
-            if not request.is_json:
-                return jsonify({
-                    'success': False,
-                    'error': 'Content-Type doit être application/json'
-                }), 400
-            
-            data = request.get_json()
             # Username fourni par @require_auth
             username = getattr(request, 'username', 'anonymous')
             
-            # Validation des clés requises
-            required_keys = ['domaine', 'theme']
-            if not validate_json_keys(data, required_keys):
-                return jsonify({
-                    'success': False,
-                    'error': 'Champs requis: domaine, theme'
-                }), 400
-            
-            # Validation et sanitization
-            domaine = sanitize_string(data.get('domaine', ''))
-            theme = sanitize_string(data.get('theme', ''))
-            difficulte = data.get('difficulte', 1)
-            
-            # Validation du domaine
-            if not validate_domain(domaine):
-                return jsonify({
-                    'success': False,
-                    'error': 'Domaine invalide'
-                }), 400
-            
-            # Validation de la difficulté
-            if not validate_integer(difficulte, 1, 5):
-                return jsonify({
-                    'success': False,
-                    'error': 'Difficulté invalide (1-5)'
-                }), 400
+            params, erreur = _parametres_generation()
+            if erreur:
+                return erreur
+            domaine, theme, difficulte = params
             
             # Génération de l'exercice
-            exercice = generer_exercice(domaine, theme, difficulte)
+            exercice = generer_exercice(difficulte, theme, domaine)
             
             if not exercice:
                 return jsonify({
@@ -556,6 +673,51 @@ def register_routes(app, limiter):
             }), 500
     
     
+    @app.route('/api/exercices/generer/flux', methods=['POST'])
+    @limiter.limit("20 per hour")
+    @require_auth
+    def generer_exercice_flux_endpoint():
+        """
+        Génère un nouvel exercice en flux (Server-Sent Events)
+        Rate limit: 20 requêtes par heure
+        Authentification requise
+        
+        Body: {domaine, theme, difficulte}
+        Événements SSE :
+            source   {source: banque|ia}
+            token    {texte}              fragment du modèle
+            champ    {nom, valeur}        champ complet (enonce dès qu'il est écrit)
+            exercice {exercice}           exercice validé et ajouté à la banque
+            erreur   {error}
+        """
+        try:
+            username = getattr(request, 'username', 'anonymous')
+            
+            params, erreur = _parametres_generation()
+            if erreur:
+                return erreur
+            domaine, theme, difficulte = params
+            
+            from modules.core.fonctions import generer_exercice_flux
+            
+            log_security_event('exercice_generated', {
+                'username': username,
+                'domaine': domaine,
+                'theme': theme,
+                'difficulte': difficulte,
+                'flux': True
+            })
+            
+            return _reponse_sse(generer_exercice_flux(difficulte, theme, domaine))
+            
+        except Exception as e:
+            log_error(f"Erreur lors de la génération d'exercice (flux): {str(e)}\n{traceback.format_exc()}")
+            return jsonify({
+                'success': False,
+                'error': 'Erreur interne du serveur'
+            }), 500
+    
+    
     @app.route('/api/exercices/verifier', methods=['POST'])
     @limiter.limit("30 per hour")
     @require_auth
@@ -575,125 +737,36 @@ def register_routes(app, limiter):
         Returns: {success, data: {correct, message, tentatives_restantes, peut_voir_correction}}
         """
         try:
-            if not request.is_json:
-                return jsonify({
-                    'success': False,
-                    'error': 'Content-Type doit être application/json'
-                }), 400
-            
-            data = request.get_json()
             username = getattr(request, 'username', 'anonymous')
             
-            # Validation des clés requises
-            required_keys = ['domaine', 'theme', 'code']
-            if not validate_json_keys(data, required_keys):
-                return jsonify({
-                    'success': False,
-                    'error': 'Champs requis: domaine, theme, code'
-                }), 400
-            
-            domaine = sanitize_string(data.get('domaine', ''))
-            theme = sanitize_string(data.get('theme', ''))
-            code_utilisateur = data.get('code', '')
-            exercice_id = data.get('exercice_id', '')
-            tentative = data.get('tentative', 1)
-            
-            # Validation du domaine
-            if not validate_domain(domaine):
-                return jsonify({
-                    'success': False,
-                    'error': 'Domaine invalide'
-                }), 400
+            params, erreur = _parametres_verification()
+            if erreur:
+                return erreur
             
             # Vérification OPTIMISÉE (IA au minimum)
-            from modules.core.fonctions import verifier_reponse_optimisee, verifier_reponse, analyser_verdict, obtenir_exercice_par_id
+            from modules.core.fonctions import verifier_reponse_optimisee, verifier_reponse, analyser_verdict
             
             try:
-                # Récupérer l'exercice complet pour accéder aux cas_test
-                exercice_id = data.get('exercice_id', '')
-                exercice_enonce = data.get('exercice_enonce', '')
-                
                 # 1. Chercher l'exercice dans la banque
-                exercice_complet = obtenir_exercice_par_id(exercice_id) if exercice_id else None
-                
-                if not exercice_complet:
-                    # Fallback : créer un objet exercice simple
-                    exercice_complet = {'enonce': exercice_enonce}
+                exercice_complet = _exercice_a_verifier(params)
                 
                 # 2. Tentative de vérification SANS IA
-                est_correct, message = verifier_reponse_optimisee(exercice_complet, code_utilisateur)
+                est_correct, message = verifier_reponse_optimisee(exercice_complet, params['code'])
                 
-                # 3. Si la fonction retourne None → Fallback sur IA
+                # 3. Si la fonction retourne None → Fallback sur IA (verdict mis en cache)
                 if est_correct is None:
                     print("[Vérification par IA - Fallback nécessaire]")
                     correction_ia = verifier_reponse(
-                        exercice=exercice_enonce,
-                        reponse_utilisateur=code_utilisateur,
-                        domaine=domaine
+                        params['exercice_enonce'], params['code'], params['domaine'],
+                        exercice_id=exercice_complet.get('id')
                     )
-                    
-                    # Stocker la correction dans la banque pour la prochaine fois
-                    if exercice_banque:
-                        # Extraire les mots-clés de la correction IA
-                        import re
-                        mots_cles_detectes = re.findall(r'\b[a-z_]+\b', code_utilisateur.lower())[:5]
-                # 3. Si la fonction retourne None → Fallback sur IA
-                if est_correct is None:
-                    print("[Vérification par IA - Fallback nécessaire]")
-                    correction_ia = verifier_reponse(exercice_enonce, code_utilisateur, domaine)
                     est_correct = analyser_verdict(correction_ia)
                     message = correction_ia
-                else:
-                    # Vérification réussie SANS IA
-                    correction_ia = message
-                
-                # 4. Gérer les tentatives
-                tentatives_restantes = 3 - tentative
-                peut_voir_correction = tentative >= 3
-                
-                # 5. Préparer le message
-                if est_correct:
-                    message_final = message
-                    # Mise à jour XP et progression
-                    try:
-                        from modules.core.xp_systeme import calculer_xp
-                        from modules.core.progression import charger_progression, mettre_a_jour_progression
-                        
-                        difficulte = data.get('difficulte', 1)
-                        xp_gagne = calculer_xp(difficulte, True)
-                        
-                        progression = charger_progression(username)
-                        progression['xp'] = progression.get('xp', 0) + xp_gagne
-                        progression['exercices_reussis'] = progression.get('exercices_reussis', 0) + 1
-                        mettre_a_jour_progression(username, progression)
-                    except Exception as prog_error:
-                        print(f"Erreur progression: {prog_error}")
-                else:
-                    message_final = message
-                    if tentatives_restantes > 0:
-                        message_final += f"\n\nIl vous reste {tentatives_restantes} tentative(s)"
-                    elif peut_voir_correction:
-                        message_final += "\n\nVoulez-vous voir la correction ?"
-                
-                # 6. Log de sécurité
-                log_security_event('exercice_verification', {
-                    'username': username,
-                    'domaine': domaine,
-                    'theme': theme,
-                    'correct': est_correct,
-                    'tentative': tentative
-                })
                 
+                # 4-6. Tentatives, XP, log
                 return jsonify({
                     'success': True,
-                    'data': {
-                        'correct': est_correct,
-                        'message': message_final,
-                        'correction_complete': message,
-                        'tentatives_restantes': tentatives_restantes,
-                        'peut_voir_correction': peut_voir_correction,
-                        'tentative_actuelle': tentative
-                    }
+                    'data': _resultat_verification(params, username, est_correct, message)
                 }), 200
                 
             except Exception as exec_error:
@@ -703,7 +776,7 @@ def register_routes(app, limiter):
                     'data': {
                         'correct': False,
                         'message': f'Erreur lors de la vérification: {str(exec_error)}',
-                        'tentatives_restantes': 3 - tentative,
+                        'tentatives_restantes': 3 - params['tentative'],
                         'peut_voir_correction': False
                     }
                 }), 200
@@ -714,6 +787,64 @@ def register_routes(app, limiter):
                 'success': False,
                 'error': 'Erreur interne du serveur'
             }), 500
+    
+    
+    @app.route('/api/exercices/verifier/flux', methods=['POST'])
+    @limiter.limit("30 per hour")
+    @require_auth
+    def verifier_reponse_flux_endpoint():
+        """
+        Vérifie la réponse à un exercice, correction IA relayée en flux (SSE)
+        Rate limit: 30 requêtes par heure
+        Authentification requise
+        
+        Body: {domaine, theme, code, exercice_id, tentative}
+        Événements SSE :
+            source   {source: tests|cache|ia}
+            token    {texte}              fragment de la correction IA
+            resultat {correct, message, tentatives_restantes, peut_voir_correction, ...}
+            erreur   {error}
+        """
+        try:
+            username = getattr(request, 'username', 'anonymous')
+            
+            params, erreur = _parametres_verification()
+            if erreur:
+                return erreur
+            
+            from modules.core.fonctions import verifier_reponse_optimisee, verifier_reponse_flux, analyser_verdict
+            
+            exercice_complet = _exercice_a_verifier(params)
+            est_correct, message = verifier_reponse_optimisee(exercice_complet, params['code'])
+            
+            def evenements():
+                if est_correct is not None:
+                    yield {'type': 'source', 'source': 'tests'}
+                    yield dict(_resultat_verification(params, username, est_correct, message), type='resultat')
+                    return
+                
+                print("[Vérification par IA - Fallback nécessaire (flux)]")
+                for evenement in verifier_reponse_flux(
+                    params['exercice_enonce'], params['code'], params['domaine'],
+                    exercice_id=exercice_complet.get('id')
+                ):
+                    if evenement['type'] == 'verdict':
+                        verdict = evenement['message']
+                        yield dict(
+                            _resultat_verification(params, username, analyser_verdict(verdict), verdict),
+                            type='resultat'
+                        )
+                    else:
+                        yield evenement
+            
+            return _reponse_sse(evenements())
+            
+        except Exception as e:
+            log_error(f"Erreur endpoint verifier (flux): {str(e)}\n{traceback.format_exc()}")
+            return jsonify({
+                'success': False,
+                'error': 'Erreur interne du serveur'
+            }), 500
 
 
     @app.route('/api/terminal/execute', methods=['POST'])
@@ -887,7 +1018,7 @@ def register_routes(app, limiter):
                 }), 400
             
             # Exécution sécurisée du code
-            resultat = executer_code_securise(code, inputs)
+            resultat = executer_code_securise(code, test_inputs=inputs)
             
             # Log de l'événement
             log_code_execution(username, code, resultat.get('success', False))
@@ -918,8 +1049,12 @@ def register_routes(app, limiter):
         Rate limit: 30 requêtes par heure
         Authentification requise
         
-        Body: {code, tests}
-        Returns: {success, data: {results, all_passed}}
+        Le code est exécuté une fois, puis chaque appel est évalué avec sa
+        propre échéance.
+        
+        Body: {code, nom_fonction, tests: [{args, attendu}, ...]}
+            args: liste des arguments (ex: [5]) ; [args, attendu] est aussi accepté
+        Returns: {success, data: {results, all_passed, passed_count, total_count}}
         """
         try:
             if not request.is_json:
@@ -932,16 +1067,31 @@ def register_routes(app, limiter):
             username = request.username
             
             # Validation des clés requises
-            required_keys = ['code', 'tests']
+            required_keys = ['code', 'nom_fonction', 'tests']
             if not validate_json_keys(data, required_keys):
                 return jsonify({
                     'success': False,
-                    'error': 'Champs requis: code, tests'
+                    'error': 'Champs requis: code, nom_fonction, tests'
                 }), 400
             
             code = data.get('code', '')
+            nom_fonction = data.get('nom_fonction', '')
             tests = data.get('tests', [])
             
+            if not isinstance(nom_fonction, str) or not nom_fonction.isidentifier():
+                return _erreur_json('nom_fonction invalide')
+            
+            # Arguments JSON (liste) -> tuple d'arguments
+            tests_formattes = []
+            for test in tests if isinstance(tests, list) else [None]:
+                if isinstance(test, dict) and 'args' in test and 'attendu' in test:
+                    args, attendu = test['args'], test['attendu']
+                elif isinstance(test, list) and len(test) == 2:
+                    args, attendu = test
+                else:
+                    return _erreur_json('tests doit être une liste de {args, attendu}')
+                tests_formattes.append((tuple(args) if isinstance(args, list) else args, attendu))
+            
             # Validation du code
             if not validate_code_input(code):
                 log_security_event('dangerous_code_attempt', {
@@ -955,22 +1105,22 @@ def register_routes(app, limiter):
                 }), 400
             
             # Exécution des tests
-            resultat = tester_fonction(code, tests)
+            resultat = tester_fonction(code, nom_fonction, tests_formattes)
             
             # Log de l'événement
             log_security_event('function_tested', {
                 'username': username,
-                'num_tests': len(tests),
-                'all_passed': resultat.get('all_passed', False)
+                'num_tests': len(tests_formattes),
+                'all_passed': resultat['success']
             })
             
             return jsonify({
                 'success': True,
                 'data': {
-                    'results': resultat.get('results', []),
-                    'all_passed': resultat.get('all_passed', False),
-                    'passed_count': resultat.get('passed_count', 0),
-                    'total_count': resultat.get('total_count', 0)
+                    'results': resultat['details'],
+                    'all_passed': resultat['success'],
+                    'passed_count': resultat['tests_reussis'],
+                    'total_count': resultat['tests_total']
                 }
             }), 200
             
@@ -1009,7 +1159,7 @@ def register_routes(app, limiter):
             return jsonify({
                 'success': True,
                 'data': {
-                    'progression': progression
+                    'progression': sans_position_journal(progression)
                 }
             }), 200
             
@@ -1579,6 +1729,151 @@ def register_routes(app, limiter):
             }), 500
     
     
+    @app.route('/api/admin/exercices/generer-lot', methods=['POST'])
+    @limiter.limit("20 per hour")
+    @require_role('admin')
+    def admin_generer_exercices_lot():
+        """
+        Génère plusieurs exercices en un seul appel IA et les ajoute à la banque
+        (admin seulement)
+        
+        Body: {domaine, theme, niveau, nombre}
+        Returns: {success, data: {demandes, recus, valides, ajoutes, exercices}}
+        """
+        try:
+            if not request.is_json:
+                return jsonify({
+                    'success': False,
+                    'error': 'Content-Type doit être application/json'
+                }), 400
+            
+            data = request.get_json()
+            if not validate_json_keys(data, ['domaine', 'theme']):
+                return jsonify({
+                    'success': False,
+                    'error': 'Champs requis: domaine, theme'
+                }), 400
+            
+            domaine = sanitize_string(data.get('domaine', ''))
+            theme = sanitize_string(data.get('theme', ''))
+            niveau = data.get('niveau', 1)
+            nombre = data.get('nombre', 5)
+            
+            if not validate_domain(domaine):
+                return jsonify({
+                    'success': False,
+                    'error': 'Domaine invalide'
+                }), 400
+            
+            if not validate_integer(niveau, 1, 5) or not validate_integer(nombre, 1, 20):
+                return jsonify({
+                    'success': False,
+                    'error': 'Niveau (1-5) ou nombre (1-20) invalide'
+                }), 400
+            
+            from modules.core.fonctions import generer_exercices_lot
+            resultat = generer_exercices_lot(int(niveau), theme, domaine, int(nombre))
+            
+            log_security_event('exercices_generated_batch', {
+                'username': request.username,
+                'domaine': domaine,
+                'theme': theme,
+                'niveau': niveau,
+                'ajoutes': resultat['ajoutes']
+            })
+            
+            return jsonify({
+                'success': True,
+                'data': resultat
+            }), 200
+            
+        except Exception as e:
+            log_error(f"Erreur lors de la génération par lot: {str(e)}\n{traceback.format_exc()}")
+            return jsonify({
+                'success': False,
+                'error': 'Erreur interne du serveur'
+            }), 500
+    
+    
+    @app.route('/api/admin/metriques/llm', methods=['GET'])
+    @require_role('admin')
+    def admin_metriques_llm():
+        """
+        Métriques des appels au LLM (admin seulement)
+        
+        Query: ?reinitialiser=1 remet les agrégats à zéro après lecture
+        Returns: {success, data: {appels, client, generation, cache_verdicts}}
+            appels: par opération, durée / attente / premier jeton (moyenne, p50,
+                    p95, max en ms), jetons, résultats (analyse, repli, erreur...) ;
+                    pour generation et generation_lot, exercices produits et
+                    cout_par_exercice_ms (durée totale / exercices)
+        """
+        try:
+            from modules.core.metriques_llm import obtenir_metriques_llm
+            from modules.core.client_llm import obtenir_client_llm
+            from modules.core.fonctions import obtenir_stats_generation, obtenir_stats_cache_verdicts
+            
+            metriques = obtenir_metriques_llm()
+            donnees = {
+                'appels': metriques.stats() if metriques is not None else None,
+                'client': obtenir_client_llm().stats(),
+                'generation': obtenir_stats_generation(),
+                'cache_verdicts': obtenir_stats_cache_verdicts()
+            }
+            if metriques is not None and request.args.get('reinitialiser') == '1':
+                metriques.reinitialiser()
+            
+            return jsonify({
+                'success': True,
+                'data': donnees
+            }), 200
+            
+        except Exception as e:
+            log_error(f"Erreur lors de la lecture des métriques LLM: {str(e)}\n{traceback.format_exc()}")
+            return jsonify({
+                'success': False,
+                'error': 'Erreur interne du serveur'
+            }), 500
+    
+    @app.route('/api/admin/metriques/sandbox', methods=['GET'])
+    @require_role('admin')
+    def admin_metriques_sandbox():
+        """
+        Métriques de la sandbox Python (admin seulement)
+        
+        Returns: {success, data: {pool, cache_compilation, cache_resultats}}
+            pool: jobs, délais, refus faute de worker libre (occupe), workers tués,
+                  crashs, recyclages (None si désactivé)
+            cache_compilation: trouves, manques, evictions, taux_succes, codes
+                               (None si désactivé)
+            cache_resultats: trouves, manques, ignores (codes non déterministes),
+                             taux_succes, entrees, octets (None si désactivé)
+        """
+        try:
+            from modules.core.sandbox import obtenir_pool_sandbox
+            from modules.core.cache_compilation import obtenir_cache_compilation
+            from modules.core.cache_resultats import obtenir_cache_resultats
+            
+            pool = obtenir_pool_sandbox()
+            cache = obtenir_cache_compilation()
+            cache_resultats = obtenir_cache_resultats()
+            return jsonify({
+                'success': True,
+                'data': {
+                    'pool': pool.stats() if pool is not None else None,
+                    'cache_compilation': cache.stats() if cache is not None else None,
+                    'cache_resultats': cache_resultats.stats() if cache_resultats is not None else None
+                }
+            }), 200
+            
+        except Exception as e:
+            log_error(f"Erreur lors de la lecture des métriques sandbox: {str(e)}\n{traceback.format_exc()}")
+            return jsonify({
+                'success': False,
+                'error': 'Erreur interne du serveur'
+            }), 500
+    
+    
     # ========================================================================
     # GESTION DES ERREURS
     # ========================================================================
@@ -0,0 +1,354 @@
+"""
+Banque d'exercices découpée en shards (un fichier par clé "domaine:theme")
+
+Avec un seul banque_exercices.json, chaque ajout d'exercice relit et
+réécrit toute la banque sous un verrou global : toutes les générations IA,
+tous thèmes confondus, se sérialisent. Ici chaque clé de banque a son
+fichier (donc son verrou) :
+
+    banque/
+        manifest.json                       {'version': 1, 'shards': {cle: fichier},
+                                             'source': {'fichier': ..., 'empreinte': ...}}
+        python_Les_boucles_3f2a9c1b7e.json  {niveau: [exercice, ...]}
+        python_Les_boucles_3f2a9c1b7e.index.json
+
+Le manifeste n'est réécrit qu'à la création d'un nouveau shard. Chaque shard
+a son IndexExercices ; une table id -> clé en mémoire permet de retrouver le
+shard d'un exercice.
+
+Import depuis le fichier unique (banque_exercices.json, suivi par git) :
+automatique au premier accès si le manifeste n'existe pas ou si le contenu
+du fichier a changé depuis le dernier import (empreinte dans le manifeste),
+ou via
+    python -m modules.core.stockage sharder
+Le fichier source n'est jamais déplacé ni modifié : ses exercices absents
+(par ID ou énoncé) sont ajoutés aux shards, les exercices générés depuis
+sont gardés.
+"""
+
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+from typing import Any, Dict, List, Optional
+
+from modules.core.file_lock import (
+    atomic_json_writer, safe_json_read, safe_json_update,
+    verrou_fichier, log_file_operation
+)
+from modules.core.index_exercices import IndexExercices
+
+VERSION_MANIFESTE = 1
+
+
+def nom_fichier_shard(cle_banque: str) -> str:
+    """
+    Nom de fichier déterministe pour une clé de banque
+
+    Lisible (slug ASCII) et sans collision (hash de la clé complète), pour
+    que deux processus créant le même shard choisissent le même fichier.
+    """
+    ascii_ = unicodedata.normalize('NFKD', cle_banque).encode('ascii', 'ignore').decode('ascii')
+    slug = re.sub(r'[^A-Za-z0-9]+', '_', ascii_).strip('_')[:40]
+    empreinte = hashlib.sha1(cle_banque.encode('utf-8')).hexdigest()[:10]
+    return f"{slug}_{empreinte}.json" if slug else f"{empreinte}.json"
+
+
+def empreinte_fichier(chemin: str) -> str:
+    """Empreinte du contenu d'un fichier (indépendante de sa date de modification)"""
+    with open(chemin, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+class BanqueShardee:
+    """Banque d'exercices répartie en un fichier par clé "domaine:theme" """
+
+    def __init__(self, dossier: str, fichier_monolithique: Optional[str] = None):
+        self.dossier = os.path.abspath(dossier)
+        self.manifeste = os.path.join(self.dossier, 'manifest.json')
+        self.fichier_monolithique = fichier_monolithique
+        self._lock = threading.Lock()
+        self._prete = False
+        self._index: Dict[str, IndexExercices] = {}
+        self._id_vers_cle: Dict[str, str] = {}
+        self._ids_par_cle: Dict[str, set] = {}
+
+    # ------------------------------------------------------------------
+    # Manifeste et migration
+    # ------------------------------------------------------------------
+
+    def _shards(self) -> Dict[str, str]:
+        """Clé de banque -> nom de fichier du shard"""
+        self._assurer_migration()
+        return self._shards_sans_migration()
+
+    def _chemin(self, nom_fichier: str) -> str:
+        return os.path.join(self.dossier, nom_fichier)
+
+    def _chemin_shard(self, cle_banque: str, creer: bool = False) -> Optional[str]:
+        nom = self._shards().get(cle_banque)
+        if nom is not None:
+            return self._chemin(nom)
+        if not creer:
+            return None
+
+        nom = nom_fichier_shard(cle_banque)
+
+        def enregistrer(manifeste):
+            manifeste.setdefault('version', VERSION_MANIFESTE)
+            manifeste.setdefault('shards', {}).setdefault(cle_banque, nom)
+            return manifeste
+
+        # Seule écriture du manifeste sur le chemin courant : la création d'un thème
+        os.makedirs(self.dossier, exist_ok=True)
+        manifeste = safe_json_update(self.manifeste, enregistrer)
+        return self._chemin(manifeste['shards'][cle_banque])
+
+    def _source_importee(self) -> Optional[str]:
+        """Empreinte du fichier source lors du dernier import (manifeste)"""
+        if not os.path.exists(self.manifeste):
+            return None
+        with safe_json_read(self.manifeste) as manifeste:
+            return manifeste.get('source', {}).get('empreinte')
+
+    def _assurer_migration(self):
+        if self._prete:
+            return
+        with self._lock:
+            if self._prete:
+                return
+            fichier = self.fichier_monolithique
+            if fichier:
+                # Les anciennes migrations renommaient le fichier suivi par git
+                ancien = fichier + '.avant_shards'
+                if not os.path.exists(fichier) and os.path.exists(ancien):
+                    os.replace(ancien, fichier)
+                if os.path.exists(fichier) and self._source_importee() != empreinte_fichier(fichier):
+                    self.migrer(fichier)
+            self._prete = True
+
+    def migrer(self, fichier_monolithique: str) -> Dict[str, int]:
+        """
+        Importe un banque_exercices.json monolithique dans les shards
+
+        Les exercices absents sont ajoutés à leur shard ; le fichier
+        source n'est pas modifié. Le manifeste, avec l'empreinte de la source,
+        est écrit en dernier : un import interrompu est simplement refait.
+
+        Args:
+            fichier_monolithique: Chemin de la banque monolithique
+
+        Returns:
+            dict: Nombre d'exercices ajoutés par clé de banque
+        """
+        os.makedirs(self.dossier, exist_ok=True)
+        resultat = {}
+        # Verrou dédié : le manifeste est lui-même écrit (et verrouillé) plus bas
+        with verrou_fichier(os.path.join(self.dossier, 'migration'), exclusif=True):
+            empreinte = empreinte_fichier(fichier_monolithique)
+            if self._source_importee() == empreinte:
+                # Un autre processus a importé cette version entre-temps
+                return resultat
+            shards = dict(self._shards_sans_migration())
+            with safe_json_read(fichier_monolithique) as banque:
+                for cle_banque, niveaux in banque.items():
+                    nom = shards.setdefault(cle_banque, nom_fichier_shard(cle_banque))
+                    resultat[cle_banque] = self._fusionner(self._chemin(nom), niveaux)
+
+            def enregistrer(manifeste):
+                manifeste.setdefault('version', VERSION_MANIFESTE)
+                # Garder les shards créés en parallèle par ajouter()
+                for cle_banque, nom in shards.items():
+                    manifeste.setdefault('shards', {}).setdefault(cle_banque, nom)
+                manifeste['source'] = {
+                    'fichier': os.path.basename(fichier_monolithique),
+                    'empreinte': empreinte
+                }
+                return manifeste
+
+            safe_json_update(self.manifeste, enregistrer)
+
+        log_file_operation("BANQUE_SHARDEE", self.manifeste)
+        return resultat
+
+    def _shards_sans_migration(self) -> Dict[str, str]:
+        if not os.path.exists(self.manifeste):
+            return {}
+        with safe_json_read(self.manifeste) as manifeste:
+            return manifeste.get('shards', {})
+
+    def _fusionner(self, chemin: str, niveaux_source: Dict[str, Any]) -> int:
+        """
+        Ajoute à un shard les exercices de niveaux_source absents
+
+        Un exercice est déjà présent si son ID ou son énoncé l'est (les
+        exercices de la banque d'origine n'ont pas tous d'ID).
+        """
+        ajoutes = 0
+
+        def inserer(niveaux):
+            nonlocal ajoutes
+            for niveau, exercices in niveaux_source.items():
+                if not isinstance(exercices, list):
+                    niveaux.setdefault(niveau, exercices)
+                    continue
+                existants = niveaux.setdefault(niveau, [])
+                connus = {ex.get(champ) for ex in existants for champ in ('id', 'enonce')} - {None}
+                for exercice in exercices:
+                    cles = {exercice.get('id'), exercice.get('enonce')} - {None}
+                    if not connus.isdisjoint(cles):
+                        continue
+                    connus.update(cles)
+                    existants.append(exercice)
+                    ajoutes += 1
+            return niveaux
+
+        safe_json_update(chemin, inserer)
+        return ajoutes
+
+    # ------------------------------------------------------------------
+    # Lecture / écriture
+    # ------------------------------------------------------------------
+
+    def _lire_shard(self, chemin: str) -> Dict[str, Any]:
+        if not os.path.exists(chemin):
+            return {}
+        with safe_json_read(chemin) as niveaux:
+            return niveaux
+
+    def charger_theme(self, cle_banque: str) -> Dict[str, Any]:
+        """Niveaux d'une seule clé de banque (ne lit que son shard)"""
+        chemin = self._chemin_shard(cle_banque)
+        return self._lire_shard(chemin) if chemin else {}
+
+    def charger(self) -> Dict[str, Any]:
+        """Banque complète {cle: {niveau: [exercices]}} (lit tous les shards)"""
+        return {
+            cle_banque: self._lire_shard(self._chemin(nom))
+            for cle_banque, nom in self._shards().items()
+        }
+
+    def sauvegarder(self, banque: Dict[str, Any]):
+        """Réécrit toute la banque (administration) ; les clés absentes sont supprimées"""
+        anciens = self._shards()
+        os.makedirs(self.dossier, exist_ok=True)
+        shards = {}
+        for cle_banque, niveaux in banque.items():
+            nom = anciens.get(cle_banque) or nom_fichier_shard(cle_banque)
+            with atomic_json_writer(self._chemin(nom)) as writer:
+                writer(niveaux)
+            shards[cle_banque] = nom
+
+        def remplacer(manifeste):
+            # L'empreinte de la source est gardée : la banque importée n'est pas réimportée
+            manifeste['version'] = VERSION_MANIFESTE
+            manifeste['shards'] = shards
+            return manifeste
+
+        safe_json_update(self.manifeste, remplacer)
+
+        for cle_banque, nom in anciens.items():
+            if cle_banque not in shards:
+                for chemin in (self._chemin(nom), self._chemin(os.path.splitext(nom)[0] + '.index.json')):
+                    if os.path.exists(chemin):
+                        os.remove(chemin)
+        self._rafraichir()
+
+    def ajouter(self, cle_banque: str, niveau: str, exercice: Dict[str, Any]) -> bool:
+        """
+        Ajoute un exercice s'il n'existe pas déjà (par ID) dans son shard
+
+        Seul le shard de la clé est verrouillé et réécrit.
+
+        Returns:
+            bool: True si ajouté
+        """
+        return self.ajouter_plusieurs(cle_banque, niveau, [exercice]) == 1
+
+    def ajouter_plusieurs(self, cle_banque: str, niveau: str, exercices: List[Dict[str, Any]]) -> int:
+        """
+        Ajoute les exercices absents (par ID) en une seule réécriture du shard
+
+        Returns:
+            int: Nombre d'exercices ajoutés
+        """
+        chemin = self._chemin_shard(cle_banque, creer=True)
+        ajoutes = 0
+
+        def inserer(niveaux):
+            nonlocal ajoutes
+            if not niveaux:
+                niveaux = {"1": [], "2": [], "3": []}
+            existants = niveaux.setdefault(niveau, [])
+            ids = {ex.get('id') for ex in existants}
+            for exercice in exercices:
+                if exercice.get('id') not in ids:
+                    ids.add(exercice.get('id'))
+                    existants.append(exercice)
+                    ajoutes += 1
+            return niveaux
+
+        safe_json_update(chemin, inserer)
+        if ajoutes:
+            self._synchroniser(cle_banque, chemin)
+        return ajoutes
+
+    # ------------------------------------------------------------------
+    # Index id -> exercice
+    # ------------------------------------------------------------------
+
+    def _index_shard(self, cle_banque: str, chemin: str) -> IndexExercices:
+        with self._lock:
+            index = self._index.get(cle_banque)
+            if index is None:
+                index = IndexExercices(chemin, cle_banque=cle_banque)
+                self._index[cle_banque] = index
+            return index
+
+    def _synchroniser(self, cle_banque: str, chemin: str, forcer: bool = False):
+        """Met à jour la table id -> clé pour un shard dont l'index a changé"""
+        index = self._index_shard(cle_banque, chemin)
+        if not index.verifier() and not forcer:
+            return
+        ids = set(index.identifiants())
+        with self._lock:
+            for ancien in self._ids_par_cle.get(cle_banque, set()) - ids:
+                if self._id_vers_cle.get(ancien) == cle_banque:
+                    del self._id_vers_cle[ancien]
+            for exercice_id in ids:
+                self._id_vers_cle.setdefault(exercice_id, cle_banque)
+            self._ids_par_cle[cle_banque] = ids
+
+    def _rafraichir(self):
+        """Vérifie tous les shards (un os.stat par shard)"""
+        shards = self._shards()
+        with self._lock:
+            disparus = set(self._index) - set(shards)
+            for cle_banque in disparus:
+                del self._index[cle_banque]
+                for exercice_id in self._ids_par_cle.pop(cle_banque, set()):
+                    if self._id_vers_cle.get(exercice_id) == cle_banque:
+                        del self._id_vers_cle[exercice_id]
+        for cle_banque, nom in shards.items():
+            self._synchroniser(cle_banque, self._chemin(nom), forcer=cle_banque not in self._ids_par_cle)
+
+    def preparer(self):
+        """Migration éventuelle et chargement/reconstruction des index (démarrage)"""
+        self._rafraichir()
+
+    def obtenir_par_id(self, exercice_id: str) -> Optional[Dict[str, Any]]:
+        """Exercice d'id donné, ou None"""
+        for tentative in range(2):
+            with self._lock:
+                cle_banque = self._id_vers_cle.get(exercice_id)
+            if cle_banque is not None:
+                chemin = self._chemin_shard(cle_banque)
+                if chemin is not None:
+                    exercice = self._index_shard(cle_banque, chemin).obtenir(exercice_id)
+                    if exercice is not None:
+                        return exercice
+            if tentative == 0:
+                # Id inconnu ou déplacé : un autre processus a pu modifier des shards
+                self._rafraichir()
+        return None
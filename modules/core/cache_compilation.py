@@ -0,0 +1,157 @@
+"""
+Cache de compilation du code Python soumis par les élèves
+
+Un élève soumet souvent le même code plusieurs fois (terminal, puis
+"Soumettre", puis un nouvel essai) : chaque exécution refaisait le contrôle
+de sécurité statique et compile(). Le cache garde, par empreinte SHA-256 du
+code source :
+
+- le verdict du contrôle statique (refus ou code accepté) ;
+- le bytecode (marshal) de compile(code, '<string>', 'exec'), ou le message
+  de l'erreur de compilation.
+
+Un objet code ne passe pas d'un processus à l'autre : le cache vit dans le
+processus de l'API et le bytecode est envoyé au worker de la sandbox avec
+le code, marshal.loads() remplaçant compile() (~35 fois plus rapide).
+
+Le cache est un LRU borné à SANDBOX_COMPILE_CACHE_SIZE codes.
+"""
+
+import hashlib
+import marshal
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+CONFIG_CACHE_COMPILATION = {
+    'actif': os.getenv('SANDBOX_COMPILE_CACHE_ENABLED', 'True') == 'True',
+    'entrees': int(os.getenv('SANDBOX_COMPILE_CACHE_SIZE', '256'))
+}
+
+_ABSENT = object()
+
+
+def empreinte_code(code: str) -> str:
+    """Empreinte SHA-256 (hexadécimale) du code source"""
+    return hashlib.sha256(code.encode('utf-8', 'surrogatepass')).hexdigest()
+
+
+def message_erreur_compilation(e: Exception) -> str:
+    return f'Erreur d\'execution : {type(e).__name__}: {str(e)}'
+
+
+def compiler_code(code: str) -> Tuple[Optional[bytes], Optional[str]]:
+    """
+    Compile le code source
+
+    Returns:
+        tuple: (bytecode marshal, None) ou (None, message d'erreur de compilation)
+    """
+    try:
+        return marshal.dumps(compile(code, '<string>', 'exec')), None
+    except (SyntaxError, ValueError) as e:
+        return None, message_erreur_compilation(e)
+
+
+class CacheCompilation:
+    """
+    LRU borné : empreinte du code -> verdict du contrôle statique et bytecode
+
+    Args:
+        entrees: Nombre maximal de codes gardés
+    """
+
+    def __init__(self, entrees: int = 256):
+        self.entrees = max(1, entrees)
+        self._lock = threading.Lock()
+        self._cache: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._stats = {'trouves': 0, 'manques': 0, 'evictions': 0}
+
+    def _valeur(self, code: str, champ: str, calculer: Callable[[str], Any]) -> Any:
+        """Valeur d'un champ de l'entrée du code, calculée hors lock au premier accès"""
+        cle = empreinte_code(code)
+        with self._lock:
+            entree = self._cache.get(cle)
+            valeur = _ABSENT if entree is None else entree.get(champ, _ABSENT)
+            if valeur is not _ABSENT:
+                self._cache.move_to_end(cle)
+                self._stats['trouves'] += 1
+                return valeur
+            self._stats['manques'] += 1
+
+        valeur = calculer(code)
+
+        with self._lock:
+            entree = self._cache.get(cle)
+            if entree is None:
+                entree = self._cache[cle] = {}
+            entree[champ] = valeur
+            self._cache.move_to_end(cle)
+            while len(self._cache) > self.entrees:
+                self._cache.popitem(last=False)
+                self._stats['evictions'] += 1
+        return valeur
+
+    def verdict(self, code: str, verifier: Callable[[str], Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        """
+        Verdict du contrôle statique, calculé par verifier au premier appel
+
+        Returns:
+            dict: Copie du résultat de refus, ou None si le code est accepté
+        """
+        refus = self._valeur(code, 'verdict', verifier)
+        return None if refus is None else dict(refus)
+
+    def compiler(self, code: str) -> Tuple[Optional[bytes], Optional[str]]:
+        """Bytecode du code, compilé au premier appel (voir compiler_code)"""
+        return self._valeur(code, 'bytecode', compiler_code)
+
+    def stats(self) -> Dict[str, Any]:
+        """Compteurs, taux de succès et occupation du cache"""
+        with self._lock:
+            requetes = self._stats['trouves'] + self._stats['manques']
+            return dict(
+                self._stats,
+                taux_succes=round(self._stats['trouves'] / requetes, 4) if requetes else 0.0,
+                codes=len(self._cache),
+                entrees_max=self.entrees
+            )
+
+    def vider(self):
+        """Vide le cache (les compteurs sont conservés)"""
+        with self._lock:
+            self._cache.clear()
+
+
+# ============================================================================
+# CACHE GLOBAL
+# ============================================================================
+
+_cache: Optional[CacheCompilation] = None
+_cache_lock = threading.Lock()
+
+
+def obtenir_cache_compilation() -> Optional[CacheCompilation]:
+    """Cache global, ou None si SANDBOX_COMPILE_CACHE_ENABLED=False"""
+    global _cache
+    if not CONFIG_CACHE_COMPILATION['actif']:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = CacheCompilation(CONFIG_CACHE_COMPILATION['entrees'])
+    return _cache
+
+
+def verdict_en_cache(code: str, verifier: Callable[[str], Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+    """Verdict du contrôle statique, via le cache s'il est actif"""
+    cache = obtenir_cache_compilation()
+    return verifier(code) if cache is None else cache.verdict(code, verifier)
+
+
+def compiler_en_cache(code: str) -> Tuple[Optional[bytes], Optional[str]]:
+    """Bytecode du code, via le cache s'il est actif (voir compiler_code)"""
+    cache = obtenir_cache_compilation()
+    return compiler_code(code) if cache is None else cache.compiler(code)
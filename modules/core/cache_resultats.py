@@ -0,0 +1,341 @@
+"""
+Mémoïsation des résultats d'exécution des codes déterministes (opt-in)
+
+Pour un exercice à cas_test fixes, un même (code, inputs) produit toujours
+la même sortie : /api/exercices/verifier et /api/terminal/execute
+réexécutaient pourtant le code à chaque soumission. Quand
+SANDBOX_RESULT_CACHE_ENABLED vaut True, le résultat est gardé sous
+
+    sha256(empreinte du code, inputs, langage, version de l'exécuteur)
+
+dans une base SQLite (mode WAL) partagée par tous les processus de l'API,
+bornée à SANDBOX_RESULT_CACHE_MAX_MB (les entrées lues le moins récemment
+sont supprimées).
+
+Ne sont jamais mis en cache :
+- un code dont le résultat peut varier d'une exécution à l'autre, détecté
+  statiquement (voir code_deterministe) : hasard, heure, ordre d'itération
+  d'un ensemble (hash des chaînes aléatoire par processus), id()/hash() ;
+- un résultat qui dépend de la charge ou de la machine : échéance dépassée
+  (et cas suivants non exécutés), serveur occupé, worker tué, adresse
+  mémoire dans la sortie ("<function f at 0x...>") ;
+- pour les langages exécutés par un sous-processus (JavaScript, Java, C...),
+  une exécution en échec (compilateur absent, timeout...).
+
+Les résultats dépendent de l'interpréteur ou du compilateur : la version de
+Python fait partie de la clé, mais pas celle des autres chaînes de
+compilation. Après leur mise à jour, vider le cache :
+    python -m modules.core.cache_resultats vider
+"""
+
+import ast
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from modules.core.cache_compilation import empreinte_code
+from modules.core.file_lock import log_file_operation
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CONFIG_CACHE_RESULTATS = {
+    'actif': os.getenv('SANDBOX_RESULT_CACHE_ENABLED', 'False') == 'True',
+    'fichier': os.getenv('SANDBOX_RESULT_CACHE_PATH', os.path.join(BASE_DIR, 'cache_resultats.db')),
+    'taille_max_mo': float(os.getenv('SANDBOX_RESULT_CACHE_MAX_MB', '64'))
+}
+
+# À incrémenter quand le format des résultats ou la sandbox change
+VERSION_EXECUTEUR = 1
+
+
+def version_executeur(langage: str) -> str:
+    """Version de l'exécuteur d'un langage (version de Python pour la sandbox)"""
+    if langage == 'python':
+        return f'{VERSION_EXECUTEUR}:python{sys.version_info[0]}.{sys.version_info[1]}'
+    return str(VERSION_EXECUTEUR)
+
+
+def cle_resultat(code: str, inputs: Optional[List[str]], langage: str) -> str:
+    """Clé d'un résultat : code, inputs, langage et version de l'exécuteur"""
+    contenu = json.dumps([empreinte_code(code), inputs, langage, version_executeur(langage)], ensure_ascii=False)
+    return hashlib.sha256(contenu.encode('utf-8', 'surrogatepass')).hexdigest()
+
+
+# ============================================================================
+# DÉTECTION DES CODES NON DÉTERMINISTES
+# ============================================================================
+
+# Noms Python dont la présence rend le résultat variable
+_NOMS_VARIABLES_PYTHON = {
+    'random', 'time', 'datetime', 'secrets', 'uuid', 'os', 'sys',
+    'id', 'hash', 'set', 'frozenset', 'object'
+}
+
+# Appels non déterministes des autres langages
+_MOTIFS_VARIABLES = {
+    'javascript': r'Math\.random|\bDate\b|performance\.now|\bcrypto\b|process\.hrtime',
+    'java': r'\bRandom\b|Math\.random|currentTimeMillis|nanoTime|\bLocalDate(Time)?\b|\bInstant\b|\bUUID\b'
+            r'|hashCode|\bHashSet\b|\bHashMap\b|identityHashCode',
+    'c': r'\bs?rand\s*\(|\btime\s*\(|\bclock\s*\(|/dev/u?random|getpid|%p',
+    'cpp': r'\bs?rand\s*\(|\btime\s*\(|\bclock\s*\(|random_device|\bchrono\b|/dev/u?random|getpid'
+           r'|unordered_|%p',
+    'sql': r'\brandom\s*\(|\bnow\s*\(|current_(date|time|timestamp)|\bdate\s*\(\s*[\'"]now'
+}
+
+
+def code_deterministe(code: str, langage: str) -> bool:
+    """
+    Indique si le résultat du code ne dépend que du code et de ses inputs
+
+    Python : analyse de l'AST (noms et attributs de _NOMS_VARIABLES_PYTHON,
+    imports, ensembles littéraux ou en compréhension). Autres langages :
+    motifs d'appels connus. Dans le doute (langage inconnu), False.
+    """
+    if langage == 'python':
+        try:
+            arbre = ast.parse(code)
+        except (SyntaxError, ValueError):
+            # L'erreur de syntaxe est un résultat déterministe
+            return True
+        for noeud in ast.walk(arbre):
+            if isinstance(noeud, (ast.Import, ast.ImportFrom, ast.Set, ast.SetComp)):
+                return False
+            if isinstance(noeud, ast.Name) and noeud.id in _NOMS_VARIABLES_PYTHON:
+                return False
+            if isinstance(noeud, ast.Attribute) and noeud.attr in _NOMS_VARIABLES_PYTHON:
+                return False
+        return True
+    motif = _MOTIFS_VARIABLES.get(langage)
+    if motif is None:
+        return False
+    return re.search(motif, code, re.IGNORECASE) is None
+
+
+def resultat_memorisable(resultat: Dict[str, Any], langage: str) -> bool:
+    """Indique si le résultat ne dépend pas de la charge ou de la machine"""
+    if resultat.get('timeout') or resultat.get('occupe'):
+        return False
+    if langage != 'python' and not resultat.get('success'):
+        return False
+    texte = f"{resultat.get('output', '')}{resultat.get('error', '')}"
+    return all(motif not in texte for motif in ('Execution interrompue', 'Non execute :', ' at 0x'))
+
+
+# ============================================================================
+# STOCKAGE
+# ============================================================================
+
+class CacheResultats:
+    """
+    Résultats d'exécution dans une base SQLite partagée entre processus
+
+    Args:
+        chemin: Fichier SQLite
+        taille_max_octets: Taille cumulée des résultats au-delà de laquelle
+                           les entrées lues le moins récemment sont supprimées
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS resultats (
+            cle TEXT PRIMARY KEY,
+            resultat TEXT NOT NULL,
+            taille INTEGER NOT NULL,
+            acces REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_resultats_acces ON resultats(acces);
+    """
+
+    # Une lecture ne met à jour la date d'accès que si elle date de plus de
+    # tant de secondes (évite une écriture par lecture)
+    INTERVALLE_ACCES_S = 60
+    # La taille totale est recalculée toutes les N écritures du processus
+    INTERVALLE_VERIFICATION = 50
+
+    def __init__(self, chemin: str, taille_max_octets: int = 64 * 1024 * 1024):
+        self.chemin = os.path.abspath(chemin)
+        self.taille_max_octets = taille_max_octets
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._schema_pret = False
+        self._ecritures = 0
+        self._stats = {'trouves': 0, 'manques': 0, 'enregistres': 0, 'ignores': 0, 'evictions': 0, 'erreurs': 0}
+
+    def _connexion(self) -> sqlite3.Connection:
+        """Retourne la connexion du thread courant (créée à la demande)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.chemin), exist_ok=True)
+            conn = sqlite3.connect(self.chemin, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            with self._lock:
+                if not self._schema_pret:
+                    conn.executescript(self.SCHEMA)
+                    self._schema_pret = True
+            self._local.conn = conn
+        return conn
+
+    def _compter(self, cle: str, nombre: int = 1):
+        with self._lock:
+            self._stats[cle] += nombre
+
+    def _erreur(self, e: sqlite3.Error):
+        # Le cache ne doit jamais empêcher l'exécution : erreur = absence
+        self._compter('erreurs')
+        log_file_operation("CACHE_RESULTATS", self.chemin, success=False, error=str(e))
+
+    def obtenir(self, cles: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """Résultats en cache (None pour une clé absente), lus en une requête"""
+        try:
+            conn = self._connexion()
+            lignes = {
+                cle: (resultat, acces) for cle, resultat, acces in conn.execute(
+                    f"SELECT cle, resultat, acces FROM resultats WHERE cle IN ({','.join('?' * len(cles))})",
+                    cles
+                )
+            }
+            maintenant = time.time()
+            anciennes = [(maintenant, cle) for cle, (_, acces) in lignes.items()
+                         if maintenant - acces > self.INTERVALLE_ACCES_S]
+            if anciennes:
+                conn.executemany('UPDATE resultats SET acces = ? WHERE cle = ?', anciennes)
+        except sqlite3.Error as e:
+            self._erreur(e)
+            lignes = {}
+        with self._lock:
+            self._stats['trouves'] += sum(1 for cle in cles if cle in lignes)
+            self._stats['manques'] += sum(1 for cle in cles if cle not in lignes)
+        return [json.loads(lignes[cle][0]) if cle in lignes else None for cle in cles]
+
+    def enregistrer(self, cle: str, resultat: Dict[str, Any]):
+        """Enregistre un résultat (puis supprime les plus anciens si la base est trop grosse)"""
+        donnees = json.dumps(resultat, ensure_ascii=False, separators=(',', ':'))
+        try:
+            conn = self._connexion()
+            conn.execute(
+                'INSERT OR REPLACE INTO resultats (cle, resultat, taille, acces) VALUES (?, ?, ?, ?)',
+                (cle, donnees, len(donnees), time.time())
+            )
+            with self._lock:
+                self._stats['enregistres'] += 1
+                self._ecritures += 1
+                verifier = self._ecritures % self.INTERVALLE_VERIFICATION == 1
+            if verifier:
+                self._evincer(conn)
+        except sqlite3.Error as e:
+            self._erreur(e)
+
+    def _evincer(self, conn: sqlite3.Connection):
+        """Supprime les entrées lues le moins récemment jusqu'à 90 % de la taille maximale"""
+        total = conn.execute('SELECT COALESCE(SUM(taille), 0) FROM resultats').fetchone()[0]
+        if total <= self.taille_max_octets:
+            return
+        a_liberer = total - int(self.taille_max_octets * 0.9)
+        cles = []
+        for cle, taille in conn.execute('SELECT cle, taille FROM resultats ORDER BY acces'):
+            cles.append((cle,))
+            a_liberer -= taille
+            if a_liberer <= 0:
+                break
+        conn.executemany('DELETE FROM resultats WHERE cle = ?', cles)
+        self._compter('evictions', len(cles))
+
+    def executer_lot(self, code: str, liste_inputs: List[Optional[List[str]]], langage: str,
+                     executer: Callable[[List[Optional[List[str]]]], List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """
+        Résultats en cache, et exécution des seuls vecteurs d'inputs manquants
+
+        Args:
+            code: Code source
+            liste_inputs: Un vecteur d'inputs par exécution
+            langage: Langage du code
+            executer: fonction (liste d'inputs) -> liste de résultats, appelée
+                      une fois avec les vecteurs absents du cache
+
+        Returns:
+            list: Un résultat par vecteur d'inputs
+        """
+        if not code_deterministe(code, langage):
+            self._compter('ignores', len(liste_inputs))
+            return executer(liste_inputs)
+
+        cles = [cle_resultat(code, inputs, langage) for inputs in liste_inputs]
+        resultats = self.obtenir(cles)
+        manquants = [numero for numero, resultat in enumerate(resultats) if resultat is None]
+        if manquants:
+            executes = executer([liste_inputs[numero] for numero in manquants])
+            for numero, resultat in zip(manquants, executes):
+                resultats[numero] = resultat
+                if resultat_memorisable(resultat, langage):
+                    self.enregistrer(cles[numero], resultat)
+        return resultats
+
+    def vider(self):
+        """Supprime tous les résultats"""
+        try:
+            self._connexion().execute('DELETE FROM resultats')
+        except sqlite3.Error as e:
+            self._erreur(e)
+
+    def stats(self) -> Dict[str, Any]:
+        """Compteurs du processus, taux de succès et occupation de la base"""
+        with self._lock:
+            stats = dict(self._stats)
+        requetes = stats['trouves'] + stats['manques']
+        stats['taux_succes'] = round(stats['trouves'] / requetes, 4) if requetes else 0.0
+        try:
+            entrees, octets = self._connexion().execute(
+                'SELECT COUNT(*), COALESCE(SUM(taille), 0) FROM resultats'
+            ).fetchone()
+            stats.update(entrees=entrees, octets=octets)
+        except sqlite3.Error as e:
+            self._erreur(e)
+        stats['octets_max'] = self.taille_max_octets
+        return stats
+
+
+# ============================================================================
+# CACHE GLOBAL
+# ============================================================================
+
+_cache: Optional[CacheResultats] = None
+_cache_lock = threading.Lock()
+
+
+def obtenir_cache_resultats() -> Optional[CacheResultats]:
+    """Cache global, ou None si SANDBOX_RESULT_CACHE_ENABLED ne vaut pas True"""
+    global _cache
+    if not CONFIG_CACHE_RESULTATS['actif']:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = CacheResultats(
+                    CONFIG_CACHE_RESULTATS['fichier'],
+                    taille_max_octets=int(CONFIG_CACHE_RESULTATS['taille_max_mo'] * 1024 * 1024)
+                )
+    return _cache
+
+
+def executer_lot_memoise(code: str, liste_inputs: List[Optional[List[str]]], langage: str,
+                         executer: Callable[[List[Optional[List[str]]]], List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Exécute via le cache de résultats s'il est actif (voir CacheResultats.executer_lot)"""
+    cache = obtenir_cache_resultats()
+    if cache is None:
+        return executer(liste_inputs)
+    return cache.executer_lot(code, liste_inputs, langage, executer)
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] == ['vider']:
+        CacheResultats(CONFIG_CACHE_RESULTATS['fichier']).vider()
+        print(f"Cache vidé : {CONFIG_CACHE_RESULTATS['fichier']}")
+    else:
+        print('Usage : python -m modules.core.cache_resultats vider')
+        sys.exit(1)
@@ -0,0 +1,237 @@
+"""
+Cache des verdicts de l'IA pour verifier_reponse
+
+Quand la vérification sans IA ne conclut pas, verifier_reponse interroge le
+LLM. Beaucoup de soumissions sont identiques au formatage près (la même
+erreur faite par plusieurs élèves) : le verdict est mis en cache sous
+sha256(exercice, réponse normalisée, domaine).
+
+Normalisation :
+- Python : la réponse est passée dans tokenize ; commentaires, lignes vides
+  et espaces entre tokens sont ignorés (l'indentation, qui fait partie de la
+  syntaxe, est conservée via INDENT/DEDENT) ;
+- autres domaines, ou code Python invalide : espaces consécutifs fusionnés.
+
+Le cache est borné (VERDICT_CACHE_MAX_ENTRIES, éviction LRU), les entrées
+expirent après VERDICT_CACHE_TTL_S et il est sauvegardé dans
+cache_verdicts.json pour survivre aux redémarrages (et être partagé entre
+processus).
+"""
+
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+import tokenize
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from modules.core.file_lock import (
+    safe_json_read, safe_json_update, declarer_durabilite, log_file_operation
+)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CONFIG_CACHE_VERDICTS = {
+    'actif': os.getenv('VERDICT_CACHE_ENABLED', 'True') == 'True',
+    'fichier': os.getenv('VERDICT_CACHE_FILE', os.path.join(BASE_DIR, 'cache_verdicts.json')),
+    'max_entrees': int(os.getenv('VERDICT_CACHE_MAX_ENTRIES', '10000')),
+    'ttl_s': float(os.getenv('VERDICT_CACHE_TTL_S', str(30 * 24 * 3600)))
+}
+
+VERSION_CACHE = 1
+
+_TOKENS_IGNORES = {tokenize.COMMENT, tokenize.NL, tokenize.ENCODING, tokenize.ENDMARKER}
+
+
+# ============================================================================
+# NORMALISATION ET CLÉ
+# ============================================================================
+
+def normaliser_reponse(reponse: str, domaine: str = 'python') -> str:
+    """
+    Forme canonique d'une réponse : deux réponses qui ne diffèrent que par
+    les espaces ou les commentaires ont la même forme
+
+    Args:
+        reponse: Réponse de l'élève
+        domaine: Domaine (tokenize n'est utilisé que pour 'python')
+
+    Returns:
+        str: Réponse normalisée
+    """
+    reponse = str(reponse)
+    if domaine == 'python':
+        try:
+            tokens = [
+                # NEWLINE/INDENT/DEDENT ont un texte d'espaces : seul leur type compte
+                tok.string if tok.type not in (tokenize.NEWLINE, tokenize.INDENT, tokenize.DEDENT)
+                else tokenize.tok_name[tok.type]
+                for tok in tokenize.generate_tokens(io.StringIO(reponse).readline)
+                if tok.type not in _TOKENS_IGNORES
+            ]
+            return ' '.join(tokens)
+        except (tokenize.TokenError, IndentationError, SyntaxError):
+            pass
+    return ' '.join(reponse.split())
+
+
+def cle_verdict(exercice: Any, reponse: str, domaine: str, exercice_id: Optional[str] = None) -> str:
+    """
+    Clé de cache d'un verdict
+
+    Args:
+        exercice: Énoncé (utilisé si exercice_id est absent)
+        reponse: Réponse de l'élève
+        domaine: Domaine
+        exercice_id: ID de l'exercice dans la banque
+    """
+    reference = f"id:{exercice_id}" if exercice_id else f"enonce:{exercice}"
+    contenu = json.dumps([reference, normaliser_reponse(reponse, domaine), domaine], ensure_ascii=False)
+    return hashlib.sha256(contenu.encode('utf-8')).hexdigest()
+
+
+# ============================================================================
+# CACHE
+# ============================================================================
+
+class CacheVerdicts:
+    """
+    Cache LRU persistant cle -> verdict, avec expiration
+
+    Args:
+        fichier: Fichier de sauvegarde
+        max_entrees: Nombre maximal de verdicts gardés
+        ttl_s: Durée de vie d'un verdict (secondes)
+    """
+
+    def __init__(self, fichier: str, max_entrees: int = 10000, ttl_s: float = 30 * 24 * 3600):
+        self.fichier = os.path.abspath(fichier)
+        self.max_entrees = max(1, max_entrees)
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        # cle -> [verdict, instant de création (epoch)], ordre = récence d'accès
+        self._entrees: 'OrderedDict[str, list]' = OrderedDict()
+        self._signature = None
+        self._stats = {'succes': 0, 'echecs': 0, 'expires': 0, 'evinces': 0}
+        # Reconstructible (au prix d'appels au LLM) : pas de fsync
+        declarer_durabilite(self.fichier, 'os')
+
+    def _signature_fichier(self):
+        try:
+            st = os.stat(self.fichier)
+            return (st.st_mtime_ns, st.st_size, st.st_ino)
+        except OSError:
+            return None
+
+    def _synchroniser(self):
+        """Fusionne les verdicts écrits par d'autres processus (lock tenu)"""
+        signature = self._signature_fichier()
+        if signature is None or signature == self._signature:
+            return
+        try:
+            with safe_json_read(self.fichier) as donnees:
+                entrees = donnees.get('entrees', {})
+        except (IOError, ValueError) as e:
+            log_file_operation("CACHE_VERDICTS", self.fichier, success=False, error=str(e))
+            return
+        self._signature = signature
+        for cle, entree in entrees.items():
+            if cle not in self._entrees:
+                self._entrees[cle] = entree
+                # Entrées du fichier : moins récentes que celles déjà en mémoire
+                self._entrees.move_to_end(cle, last=False)
+        self._evincer()
+
+    def _evincer(self):
+        while len(self._entrees) > self.max_entrees:
+            self._entrees.popitem(last=False)
+            self._stats['evinces'] += 1
+
+    def obtenir(self, cle: str) -> Optional[str]:
+        """Verdict en cache, ou None (absent ou expiré)"""
+        with self._lock:
+            entree = self._entrees.get(cle)
+            if entree is None:
+                self._synchroniser()
+                entree = self._entrees.get(cle)
+            if entree is not None and time.time() - entree[1] > self.ttl_s:
+                del self._entrees[cle]
+                self._stats['expires'] += 1
+                entree = None
+            if entree is None:
+                self._stats['echecs'] += 1
+                return None
+            self._entrees.move_to_end(cle)
+            self._stats['succes'] += 1
+            return entree[0]
+
+    def enregistrer(self, cle: str, verdict: str):
+        """Ajoute un verdict et le sauvegarde"""
+        entree = [verdict, time.time()]
+        with self._lock:
+            self._entrees[cle] = entree
+            self._entrees.move_to_end(cle)
+            self._evincer()
+
+        limite = time.time() - self.ttl_s
+
+        def fusionner(donnees):
+            entrees = donnees.get('entrees', {})
+            entrees.pop(cle, None)
+            entrees[cle] = entree
+            # Le fichier garde l'ordre d'insertion : on retire expirés puis plus anciens
+            for ancienne in [c for c, e in entrees.items() if e[1] < limite]:
+                del entrees[ancienne]
+            for ancienne in list(entrees)[:max(0, len(entrees) - self.max_entrees)]:
+                del entrees[ancienne]
+            return {'version': VERSION_CACHE, 'entrees': entrees}
+
+        try:
+            safe_json_update(self.fichier, fusionner)
+        except IOError as e:
+            log_file_operation("CACHE_VERDICTS", self.fichier, success=False, error=str(e))
+            return
+        with self._lock:
+            # Notre propre écriture : inutile de relire le fichier
+            self._signature = self._signature_fichier()
+
+    def vider(self):
+        """Supprime tous les verdicts (mémoire et fichier)"""
+        with self._lock:
+            self._entrees.clear()
+            self._signature = None
+            if os.path.exists(self.fichier):
+                os.remove(self.fichier)
+
+    def stats(self) -> Dict[str, Any]:
+        """Succès, échecs, taux de succès, expirations, évictions et taille"""
+        with self._lock:
+            total = self._stats['succes'] + self._stats['echecs']
+            return dict(
+                self._stats,
+                taux_succes=round(self._stats['succes'] / total, 4) if total else 0.0,
+                entrees=len(self._entrees)
+            )
+
+
+_cache: Optional[CacheVerdicts] = None
+_cache_lock = threading.Lock()
+
+
+def obtenir_cache_verdicts() -> Optional[CacheVerdicts]:
+    """Cache global, ou None si VERDICT_CACHE_ENABLED=False"""
+    global _cache
+    if not CONFIG_CACHE_VERDICTS['actif']:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = CacheVerdicts(
+                    CONFIG_CACHE_VERDICTS['fichier'],
+                    max_entrees=CONFIG_CACHE_VERDICTS['max_entrees'],
+                    ttl_s=CONFIG_CACHE_VERDICTS['ttl_s']
+                )
+    return _cache
@@ -0,0 +1,470 @@
+"""
+Client LLM : transport HTTP Ollama avec keep-alive, délais et concurrence bornée
+
+Toutes les fonctions qui interrogent le modèle (génération d'exercices,
+vérification des réponses, peuplement du cache hors ligne) passent par
+obtenir_client_llm().chat(messages).
+
+Backends (LLM_BACKEND) :
+- 'ollama' : API REST d'Ollama (/api/chat) via http.client ; les connexions
+  sont gardées ouvertes et réutilisées (pool de LLM_POOL_SIZE connexions)
+- 'simule' : réponses déterministes calculées localement, sans modèle ;
+  permet de tester en charge toute l'API sur une machine sans GPU
+
+Chaque appel a une échéance (LLM_TIMEOUT_S) qui couvre l'attente d'une
+place (LLM_MAX_CONCURRENCY appels simultanés au plus) et l'appel HTTP.
+
+Chaque appel est mesuré (durée, attente, premier jeton, jetons, résultat) :
+voir metriques_llm.
+"""
+
+import hashlib
+import http.client
+import json
+import os
+import queue
+import re
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+from urllib.parse import urlsplit
+
+from modules.core.metriques_llm import mesurer_appel_llm
+
+
+CONFIG_LLM = {
+    'backend': os.getenv('LLM_BACKEND', 'ollama'),
+    'modele': os.getenv('LLM_MODEL', 'qwen2.5-coder:14b'),
+    'hote': os.getenv('OLLAMA_HOST', 'http://localhost:11434'),
+    'timeout_s': float(os.getenv('LLM_TIMEOUT_S', '120')),
+    'concurrence_max': int(os.getenv('LLM_MAX_CONCURRENCY', '4')),
+    'taille_pool': int(os.getenv('LLM_POOL_SIZE', '4')),
+    'latence_simulee_ms': float(os.getenv('LLM_STUB_LATENCY_MS', '0'))
+}
+
+
+class ErreurLLM(Exception):
+    """Échec d'un appel au LLM (connexion, réponse invalide...)"""
+
+
+class DelaiLLMDepasse(ErreurLLM):
+    """L'échéance de l'appel est dépassée"""
+
+
+# ============================================================================
+# BACKENDS
+# ============================================================================
+
+class BackendOllama:
+    """
+    Transport HTTP vers Ollama avec un pool de connexions keep-alive
+
+    Args:
+        hote: URL du serveur (ex: http://localhost:11434)
+        taille_pool: Nombre de connexions inactives conservées
+    """
+
+    nom = 'ollama'
+
+    def __init__(self, hote: str, taille_pool: int = 4):
+        url = urlsplit(hote if '://' in hote else f'http://{hote}')
+        self.https = url.scheme == 'https'
+        self.hote = url.hostname or 'localhost'
+        self.port = url.port or (443 if self.https else 11434)
+        self.prefixe = url.path.rstrip('/')
+        self._pool: 'queue.LifoQueue[http.client.HTTPConnection]' = queue.LifoQueue(maxsize=max(1, taille_pool))
+        self._stats_lock = threading.Lock()
+        self._stats = {'connexions_ouvertes': 0, 'connexions_reutilisees': 0}
+
+    def _nouvelle_connexion(self, timeout: float) -> http.client.HTTPConnection:
+        classe = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        with self._stats_lock:
+            self._stats['connexions_ouvertes'] += 1
+        return classe(self.hote, self.port, timeout=timeout)
+
+    def _prendre(self, timeout: float):
+        """Connexion du pool (réutilisée=True) ou nouvelle connexion"""
+        try:
+            connexion = self._pool.get_nowait()
+        except queue.Empty:
+            return self._nouvelle_connexion(timeout), False
+        connexion.timeout = timeout
+        if connexion.sock is not None:
+            connexion.sock.settimeout(timeout)
+        with self._stats_lock:
+            self._stats['connexions_reutilisees'] += 1
+        return connexion, True
+
+    def _rendre(self, connexion: http.client.HTTPConnection):
+        try:
+            self._pool.put_nowait(connexion)
+        except queue.Full:
+            connexion.close()
+
+    def _envoyer(self, modele: str, messages: List[Dict[str, str]], echeance: float, flux: bool):
+        """POST /api/chat ; retourne (connexion, réponse) dont le corps reste à lire"""
+        corps = json.dumps({'model': modele, 'messages': messages, 'stream': flux}).encode('utf-8')
+        for tentative in range(2):
+            restant = echeance - time.monotonic()
+            if restant <= 0:
+                raise DelaiLLMDepasse("échéance dépassée avant l'appel HTTP")
+            connexion, reutilisee = self._prendre(restant)
+            try:
+                if connexion.sock is None:
+                    connexion.connect()
+                    # En-têtes et corps partent en deux send() : sans TCP_NODELAY,
+                    # Nagle + ACK retardé ajoutent ~40 ms par appel en keep-alive
+                    connexion.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                connexion.request('POST', self.prefixe + '/api/chat', body=corps,
+                                  headers={'Content-Type': 'application/json'})
+                reponse = connexion.getresponse()
+            except TimeoutError as e:
+                connexion.close()
+                raise DelaiLLMDepasse(str(e)) from e
+            except (OSError, http.client.HTTPException) as e:
+                connexion.close()
+                # Connexion keep-alive fermée par le serveur entre deux appels : on réessaie
+                if reutilisee and tentative == 0:
+                    continue
+                raise ErreurLLM(f"Ollama injoignable ({self.hote}:{self.port}): {e}") from e
+
+            if reponse.status != 200:
+                contenu = self._lire(connexion, reponse, reponse.read)
+                connexion.close()
+                raise ErreurLLM(f"Ollama a répondu {reponse.status}: {contenu[:200]!r}")
+            return connexion, reponse
+        raise ErreurLLM("Ollama injoignable")
+
+    def _lire(self, connexion, reponse, lecture, echeance: Optional[float] = None):
+        """Lecture du corps avec l'échéance comme timeout socket"""
+        try:
+            if echeance is not None and connexion.sock is not None:
+                restant = echeance - time.monotonic()
+                if restant <= 0:
+                    raise TimeoutError("échéance dépassée pendant la réponse")
+                connexion.sock.settimeout(restant)
+            return lecture()
+        except TimeoutError as e:
+            connexion.close()
+            raise DelaiLLMDepasse(str(e)) from e
+        except (OSError, http.client.HTTPException) as e:
+            connexion.close()
+            raise ErreurLLM(f"Réponse Ollama interrompue: {e}") from e
+
+    def _liberer(self, connexion, reponse):
+        """Remet la connexion dans le pool une fois la réponse entièrement lue"""
+        if reponse.will_close:
+            connexion.close()
+        else:
+            self._rendre(connexion)
+
+    @staticmethod
+    def _compter_jetons(donnees: Dict[str, Any], mesure: Dict[str, Any]):
+        """Jetons du prompt et de la réponse (dernier objet renvoyé par Ollama)"""
+        if 'prompt_eval_count' in donnees:
+            mesure['jetons_prompt'] = donnees['prompt_eval_count']
+        if 'eval_count' in donnees:
+            mesure['jetons_reponse'] = donnees['eval_count']
+
+    def chat(self, modele: str, messages: List[Dict[str, str]], echeance: float,
+             mesure: Dict[str, Any]) -> str:
+        connexion, reponse = self._envoyer(modele, messages, echeance, flux=False)
+        contenu = self._lire(connexion, reponse, reponse.read, echeance)
+        self._liberer(connexion, reponse)
+        try:
+            donnees = json.loads(contenu)
+            texte = donnees['message']['content']
+        except (ValueError, KeyError, TypeError) as e:
+            raise ErreurLLM(f"Réponse Ollama invalide: {e}") from e
+        self._compter_jetons(donnees, mesure)
+        if 'prompt_eval_duration' in donnees:
+            # Sans flux, le premier jeton n'est pas observable : estimation
+            # du serveur (chargement du modèle + lecture du prompt), en ns
+            mesure['premier_jeton_ms'] = round(
+                (donnees.get('load_duration', 0) + donnees['prompt_eval_duration']) / 1e6, 1
+            )
+        return texte
+
+    def chat_flux(self, modele: str, messages: List[Dict[str, str]], echeance: float,
+                  mesure: Dict[str, Any]) -> Iterator[str]:
+        """Fragments de texte au fil de la génération (réponse NDJSON d'Ollama)"""
+        connexion, reponse = self._envoyer(modele, messages, echeance, flux=True)
+        termine = False
+        try:
+            while True:
+                ligne = self._lire(connexion, reponse, reponse.readline, echeance)
+                if not ligne:
+                    break
+                if not ligne.strip():
+                    continue
+                try:
+                    morceau = json.loads(ligne)
+                except ValueError as e:
+                    raise ErreurLLM(f"Fragment Ollama invalide: {e}") from e
+                if morceau.get('error'):
+                    raise ErreurLLM(f"Ollama: {morceau['error']}")
+                texte = morceau.get('message', {}).get('content', '')
+                if texte:
+                    yield texte
+                if morceau.get('done'):
+                    self._compter_jetons(morceau, mesure)
+                    termine = True
+                    break
+        finally:
+            if termine and self._lire(connexion, reponse, reponse.read, echeance) == b'':
+                self._liberer(connexion, reponse)
+            else:
+                # Flux abandonné (client déconnecté, erreur) : connexion inutilisable
+                connexion.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return dict(self._stats, connexions_inactives=self._pool.qsize())
+
+
+class BackendSimule:
+    """
+    Backend sans modèle : réponse déterministe (hash du prompt)
+
+    Reconnaît les prompts de l'application : génération d'un exercice ou
+    d'un lot (JSON au format demandé) et correction (CORRECT / INCORRECT).
+
+    Args:
+        latence_ms: Latence simulée par appel
+    """
+
+    nom = 'simule'
+
+    def __init__(self, latence_ms: float = 0.0):
+        self.latence_ms = latence_ms
+
+    @staticmethod
+    def _exercice(graine: str, type_ex: str) -> Dict[str, Any]:
+        numero = int(graine[:8], 16) % 1000
+        if type_ex == 'qcm':
+            return {
+                "enonce": f"Question simulée {graine[:8]} : combien vaut {numero} + 1 ?",
+                "choix": [str(numero), str(numero + 1), str(numero + 2), str(numero - 1)],
+                "reponse_correcte": str(numero + 1),
+                "explication": f"{numero} + 1 = {numero + 1}",
+                "indice": "Ajoutez un"
+            }
+        return {
+            "enonce": f"Exercice simulé {graine[:8]} : affichez le nombre {numero}.",
+            "solution": f"print({numero})",
+            "utilise_input": False,
+            "cas_test": [{"inputs": [], "output_attendu": str(numero)}],
+            "mots_cles": ["print"]
+        }
+
+    def _attendre(self, duree_s: float, echeance: float):
+        if time.monotonic() + duree_s > echeance:
+            raise DelaiLLMDepasse("latence simulée supérieure à l'échéance")
+        time.sleep(duree_s)
+
+    def _repondre(self, modele: str, messages: List[Dict[str, str]]) -> str:
+        prompt = messages[-1]['content'] if messages else ''
+        graine = hashlib.sha256(f"{modele}\n{prompt}".encode('utf-8')).hexdigest()
+
+        if 'RÉPONSE DE L' in prompt:
+            if int(graine[-1], 16) % 2 == 0:
+                return "CORRECT : Bravo !"
+            return "INCORRECT : La réponse ne correspond pas à l'énoncé. Indice : relisez l'énoncé"
+
+        type_ex = re.search(r'EXEMPLE POUR CE TYPE \((\w+)\)', prompt)
+        type_ex = type_ex.group(1) if type_ex else 'code'
+        lot = re.search(r'tableau JSON de (\d+) objets', prompt)
+        if lot:
+            exercices = [
+                self._exercice(hashlib.sha256(f"{graine}:{i}".encode()).hexdigest(), type_ex)
+                for i in range(int(lot.group(1)))
+            ]
+            return json.dumps(exercices, ensure_ascii=False)
+        if 'Crée un exercice' in prompt:
+            return json.dumps(self._exercice(graine, type_ex), ensure_ascii=False)
+        return f"Réponse simulée {graine[:12]}"
+
+    @staticmethod
+    def _compter_jetons(messages: List[Dict[str, str]], texte: str, mesure: Dict[str, Any]):
+        """Approximation : un jeton par mot"""
+        mesure['jetons_prompt'] = sum(len(message['content'].split()) for message in messages)
+        mesure['jetons_reponse'] = len(texte.split())
+
+    def chat(self, modele: str, messages: List[Dict[str, str]], echeance: float,
+             mesure: Dict[str, Any]) -> str:
+        if self.latence_ms:
+            self._attendre(self.latence_ms / 1000, echeance)
+        texte = self._repondre(modele, messages)
+        self._compter_jetons(messages, texte, mesure)
+        return texte
+
+    def chat_flux(self, modele: str, messages: List[Dict[str, str]], echeance: float,
+                  mesure: Dict[str, Any]) -> Iterator[str]:
+        """Même réponse que chat(), découpée en fragments de 8 caractères"""
+        texte = self._repondre(modele, messages)
+        self._compter_jetons(messages, texte, mesure)
+        fragments = [texte[i:i + 8] for i in range(0, len(texte), 8)] or ['']
+        for fragment in fragments:
+            if self.latence_ms:
+                self._attendre(self.latence_ms / 1000 / len(fragments), echeance)
+            yield fragment
+
+    def stats(self) -> Dict[str, Any]:
+        return {'latence_ms': self.latence_ms}
+
+
+# ============================================================================
+# CLIENT
+# ============================================================================
+
+class ClientLLM:
+    """
+    Appels au LLM avec modèle configuré, échéance et concurrence bornée
+
+    Args:
+        backend: BackendOllama, BackendSimule ou tout objet ayant
+                 chat(modele, messages, echeance, mesure) -> str et
+                 chat_flux(modele, messages, echeance, mesure) -> itérateur de str
+                 (mesure : dict où noter jetons_prompt et jetons_reponse)
+        modele: Nom du modèle
+        timeout_s: Échéance par défaut d'un appel (attente comprise)
+        concurrence_max: Nombre maximal d'appels simultanés
+    """
+
+    def __init__(self, backend, modele: str, timeout_s: float = 120.0, concurrence_max: int = 4):
+        self.backend = backend
+        self.modele = modele
+        self.timeout_s = timeout_s
+        self.concurrence_max = max(1, concurrence_max)
+        self._places = threading.BoundedSemaphore(self.concurrence_max)
+        self._stats_lock = threading.Lock()
+        self._stats = {'appels': 0, 'erreurs': 0, 'delais_depasses': 0, 'en_cours': 0}
+
+    @contextmanager
+    def _place(self, timeout: Optional[float], mesure: Dict[str, Any], debut: float):
+        """
+        Réserve une place d'appel ; fournit l'échéance, compte erreurs et
+        délais et note l'attente et la durée totale dans la mesure
+        """
+        echeance = debut + (self.timeout_s if timeout is None else timeout)
+        place = self._places.acquire(timeout=max(0.0, echeance - time.monotonic()))
+        mesure['attente_ms'] = round((time.monotonic() - debut) * 1000, 1)
+        if not place:
+            mesure['duree_ms'] = mesure['attente_ms']
+            with self._stats_lock:
+                self._stats['delais_depasses'] += 1
+            raise DelaiLLMDepasse(f"aucune place libre parmi {self.concurrence_max} appels simultanés")
+        with self._stats_lock:
+            self._stats['appels'] += 1
+            self._stats['en_cours'] += 1
+        try:
+            yield echeance
+        except DelaiLLMDepasse:
+            with self._stats_lock:
+                self._stats['delais_depasses'] += 1
+            raise
+        except ErreurLLM:
+            with self._stats_lock:
+                self._stats['erreurs'] += 1
+            raise
+        finally:
+            mesure['duree_ms'] = round((time.monotonic() - debut) * 1000, 1)
+            with self._stats_lock:
+                self._stats['en_cours'] -= 1
+            self._places.release()
+
+    def chat(self, messages: List[Dict[str, str]], timeout: Optional[float] = None,
+             modele: Optional[str] = None, mesure: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Envoie une conversation au modèle et retourne le texte de la réponse
+
+        Args:
+            messages: [{'role': 'user', 'content': ...}, ...]
+            timeout: Échéance de cet appel en secondes (défaut: LLM_TIMEOUT_S)
+            modele: Modèle à utiliser (défaut: LLM_MODEL)
+            mesure: Mesure ouverte par l'appelant avec mesurer_appel_llm (qui
+                    y note le résultat de l'analyse) ; à défaut l'appel est
+                    mesuré sous l'opération 'chat'
+
+        Raises:
+            DelaiLLMDepasse: Échéance atteinte (attente d'une place comprise)
+            ErreurLLM: Serveur injoignable ou réponse invalide
+        """
+        if mesure is None:
+            with mesurer_appel_llm('chat') as mesure:
+                return self.chat(messages, timeout, modele, mesure)
+
+        debut = time.monotonic()
+        mesure['modele'] = modele = modele or self.modele
+        with self._place(timeout, mesure, debut) as echeance:
+            return self.backend.chat(modele, messages, echeance, mesure)
+
+    def chat_flux(self, messages: List[Dict[str, str]], timeout: Optional[float] = None,
+                  modele: Optional[str] = None, mesure: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+        """
+        Comme chat(), mais produit le texte au fil de la génération
+
+        La place d'appel est tenue jusqu'à la fin (ou l'abandon) de l'itération ;
+        l'échéance couvre tout le flux.
+        """
+        if mesure is None:
+            with mesurer_appel_llm('chat_flux') as mesure:
+                yield from self.chat_flux(messages, timeout, modele, mesure)
+            return
+
+        debut = time.monotonic()
+        mesure['modele'] = modele = modele or self.modele
+        with self._place(timeout, mesure, debut) as echeance:
+            for fragment in self.backend.chat_flux(modele, messages, echeance, mesure):
+                if fragment and 'premier_jeton_ms' not in mesure:
+                    mesure['premier_jeton_ms'] = round((time.monotonic() - debut) * 1000, 1)
+                yield fragment
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return dict(
+                self._stats,
+                backend=self.backend.nom if hasattr(self.backend, 'nom') else type(self.backend).__name__,
+                modele=self.modele,
+                transport=self.backend.stats() if hasattr(self.backend, 'stats') else {}
+            )
+
+
+def creer_client_llm(backend: Optional[str] = None) -> ClientLLM:
+    """Crée un client selon la configuration (LLM_BACKEND : ollama ou simule)"""
+    nom = backend or CONFIG_LLM['backend']
+    if nom == 'ollama':
+        transport = BackendOllama(CONFIG_LLM['hote'], CONFIG_LLM['taille_pool'])
+    elif nom == 'simule':
+        transport = BackendSimule(CONFIG_LLM['latence_simulee_ms'])
+    else:
+        raise ValueError(f"Backend LLM inconnu: {nom} (attendu: ollama, simule)")
+    return ClientLLM(
+        transport,
+        CONFIG_LLM['modele'],
+        timeout_s=CONFIG_LLM['timeout_s'],
+        concurrence_max=CONFIG_LLM['concurrence_max']
+    )
+
+
+_client: Optional[ClientLLM] = None
+_client_lock = threading.Lock()
+
+
+def obtenir_client_llm() -> ClientLLM:
+    """Retourne le client LLM global (créé au premier appel)"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = creer_client_llm()
+    return _client
+
+
+def definir_client_llm(client: ClientLLM):
+    """Remplace le client global (tests de charge, backend personnalisé)"""
+    global _client
+    with _client_lock:
+        _client = client
@@ -0,0 +1,90 @@
+"""
+Coalescence des appels identiques simultanés ("single flight")
+
+Si plusieurs threads demandent le même calcul coûteux en même temps (ex:
+30 élèves demandent le même exercice alors que la banque est vide), un seul
+exécute la fonction ; les autres attendent et reçoivent une copie du même
+résultat (ou la même exception).
+
+    vols = Coalesceur()
+    exercice = vols.executer(('python', 'Boucles', '2', 'code'), generer)
+"""
+
+import copy
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+
+class _Vol:
+    """Appel en cours pour une clé"""
+
+    def __init__(self):
+        self.termine = threading.Event()
+        self.resultat = None
+        self.erreur = None
+        self.attentes = 0
+
+
+class Coalesceur:
+    """
+    Exécute au plus un appel à la fois par clé et partage son résultat
+
+    Args:
+        copier: Si True, chaque appelant en attente reçoit une copie profonde
+                du résultat (les appelants peuvent le modifier sans effet de bord)
+    """
+
+    def __init__(self, copier: bool = True):
+        self.copier = copier
+        self._lock = threading.Lock()
+        self._vols: Dict[Hashable, _Vol] = {}
+        self._stats = {'emis': 0, 'coalesces': 0, 'erreurs': 0}
+
+    def executer(self, cle: Hashable, fonction: Callable[[], Any]) -> Any:
+        """
+        Exécute fonction() pour cette clé, ou attend l'appel déjà en cours
+
+        Args:
+            cle: Clé identifiant le calcul
+            fonction: Calcul à exécuter (sans argument)
+
+        Returns:
+            Le résultat de l'appel (partagé entre appelants simultanés)
+        """
+        with self._lock:
+            vol = self._vols.get(cle)
+            if vol is not None:
+                vol.attentes += 1
+                self._stats['coalesces'] += 1
+                meneur = False
+            else:
+                vol = _Vol()
+                self._vols[cle] = vol
+                self._stats['emis'] += 1
+                meneur = True
+
+        if not meneur:
+            vol.termine.wait()
+            if vol.erreur is not None:
+                raise vol.erreur
+            return copy.deepcopy(vol.resultat) if self.copier else vol.resultat
+
+        try:
+            vol.resultat = fonction()
+            return vol.resultat
+        except BaseException as e:
+            vol.erreur = e
+            with self._lock:
+                self._stats['erreurs'] += 1
+            raise
+        finally:
+            # Retirer la clé avant de réveiller : un appel arrivant après
+            # la fin déclenche un nouveau calcul
+            with self._lock:
+                del self._vols[cle]
+            vol.termine.set()
+
+    def stats(self) -> Dict[str, int]:
+        """Appels émis, appels coalescés (servis par un appel en cours), erreurs"""
+        with self._lock:
+            return dict(self._stats, en_cours=len(self._vols))
@@ -7,9 +7,13 @@ import json
 import os
 from datetime import datetime
 import shutil
+from modules.core.file_lock import safe_json_read, atomic_json_writer
+from modules.core.journal_progression import ecrire_snapshot
+from modules.core.stockage import obtenir_moteur_stockage
 
 
 DOSSIER_SAUVEGARDES = 'sauvegardes'
+FICHIER_PROGRESSION_LOCALE = 'progression_utilisateur.json'
 
 
 def initialiser_dossier_sauvegardes():
@@ -47,28 +51,39 @@ def exporter_progression(nom_sauvegarde=None):
         'fichiers': {}
     }
     
+    # Import local : progression importe des modules qui importent celui-ci
+    from modules.core.progression import charger_progression_fichier
+    
+    # Progression mono-utilisateur : snapshot + événements du journal
+    progression = charger_progression_fichier(os.path.abspath(FICHIER_PROGRESSION_LOCALE))
+    if progression is not None:
+        donnees['fichiers'][FICHIER_PROGRESSION_LOCALE] = progression
+    
     # Fichiers à sauvegarder
     fichiers_a_sauvegarder = [
-        'progression_utilisateur.json',
-        'banque_exercices.json',
         'utilisateurs.json',
         'domaines.json'
     ]
     
     for fichier in fichiers_a_sauvegarder:
         if os.path.exists(fichier):
-            with open(fichier, 'r', encoding='utf-8') as f:
-                donnees['fichiers'][fichier] = json.load(f)
+            # safe_json_read : le fichier peut être au format compact ou binaire
+            with safe_json_read(os.path.abspath(fichier)) as contenu:
+                donnees['fichiers'][fichier] = contenu
+    
+    # La banque est répartie en shards : l'exporter via le moteur de stockage
+    donnees['fichiers']['banque_exercices.json'] = obtenir_moteur_stockage().charger_banque()
     
-    # Sauvegarder les progressions des utilisateurs
+    # Sauvegarder les progressions des utilisateurs (snapshot + événements du journal)
     dossier_progressions = 'progressions'
     if os.path.exists(dossier_progressions):
         donnees['progressions_utilisateurs'] = {}
         for fichier in os.listdir(dossier_progressions):
             if fichier.endswith('.json'):
                 chemin = os.path.join(dossier_progressions, fichier)
-                with open(chemin, 'r', encoding='utf-8') as f:
-                    donnees['progressions_utilisateurs'][fichier] = json.load(f)
+                progression = charger_progression_fichier(os.path.abspath(chemin))
+                if progression is not None:
+                    donnees['progressions_utilisateurs'][fichier] = progression
     
     # Écrire la sauvegarde
     with open(chemin_sauvegarde, 'w', encoding='utf-8') as f:
@@ -117,8 +132,17 @@ def importer_progression(chemin_sauvegarde):
         # Restaurer les fichiers
         if 'fichiers' in donnees:
             for nom_fichier, contenu in donnees['fichiers'].items():
-                with open(nom_fichier, 'w', encoding='utf-8') as f:
-                    json.dump(contenu, f, indent=4, ensure_ascii=False)
+                if nom_fichier == 'banque_exercices.json':
+                    obtenir_moteur_stockage().sauvegarder_banque(contenu)
+                    print(f"Restaure : {nom_fichier}")
+                    continue
+                if nom_fichier == FICHIER_PROGRESSION_LOCALE:
+                    # Nouveau snapshot : l'ancien journal ne doit pas être rejoué dessus
+                    ecrire_snapshot(os.path.abspath(nom_fichier), contenu)
+                    print(f"Restaure : {nom_fichier}")
+                    continue
+                with atomic_json_writer(os.path.abspath(nom_fichier)) as write_data:
+                    write_data(contenu)
                 print(f"Restaure : {nom_fichier}")
         
         # Restaurer les progressions des utilisateurs
@@ -129,8 +153,8 @@ def importer_progression(chemin_sauvegarde):
             
             for nom_fichier, contenu in donnees['progressions_utilisateurs'].items():
                 chemin = os.path.join(dossier_progressions, nom_fichier)
-                with open(chemin, 'w', encoding='utf-8') as f:
-                    json.dump(contenu, f, indent=4, ensure_ascii=False)
+                # Nouveau snapshot : l'ancien journal ne doit pas être rejoué dessus
+                ecrire_snapshot(os.path.abspath(chemin), contenu)
                 print(f"Restaure : {chemin}")
         
         print("\nImport termine avec succes !")
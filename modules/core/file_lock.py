@@ -1,50 +1,861 @@
 """
-Module de verrouillage thread-safe pour les opérations sur fichiers JSON
+Module de verrouillage thread-safe et inter-processus pour les fichiers JSON
 Protection contre les race conditions et corruption de données
 """
 
+import atexit
 import json
+import marshal
 import os
 import threading
+import time
 import tempfile
 import shutil
+from collections import OrderedDict
 from contextlib import contextmanager
-from typing import Any, Dict
+from typing import Any, Dict, Optional, Tuple
 from datetime import datetime
 
-# Lock global pour chaque fichier (dict de locks par chemin de fichier)
-_file_locks: Dict[str, threading.Lock] = {}
+try:
+    import fcntl  # Verrous inter-processus (Linux/Mac)
+except ImportError:  # Windows : verrous limités au processus courant
+    fcntl = None
+
+
+
+class ReadWriteLock:
+    """
+    Verrou partagé/exclusif avec priorité aux écrivains
+    
+    - Plusieurs lecteurs peuvent tenir le verrou en même temps
+    - Un écrivain a l'accès exclusif
+    - Dès qu'un écrivain attend, les nouveaux lecteurs patientent
+      (évite la famine des écritures sous forte charge de lecture)
+    """
+    
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        # Threads qui tiennent ou attendent ce verrou (géré par le registre)
+        self._references = 0
+        self._lecteurs_actifs = 0
+        self._ecrivain_actif = False
+        self._ecrivains_en_attente = 0
+    
+    def acquire_read(self):
+        with self._condition:
+            while self._ecrivain_actif or self._ecrivains_en_attente:
+                self._condition.wait()
+            self._lecteurs_actifs += 1
+    
+    def release_read(self):
+        with self._condition:
+            self._lecteurs_actifs -= 1
+            if self._lecteurs_actifs == 0:
+                self._condition.notify_all()
+    
+    def acquire_write(self):
+        with self._condition:
+            self._ecrivains_en_attente += 1
+            try:
+                while self._ecrivain_actif or self._lecteurs_actifs:
+                    self._condition.wait()
+            finally:
+                self._ecrivains_en_attente -= 1
+            self._ecrivain_actif = True
+    
+    def release_write(self):
+        with self._condition:
+            self._ecrivain_actif = False
+            self._condition.notify_all()
+    
+    @contextmanager
+    def read_locked(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+    
+    @contextmanager
+    def write_locked(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+# Registre des locks lecture/écriture par chemin de fichier.
+# Chaque lock compte les threads qui le tiennent ou l'attendent ; un lock sans
+# référence passe dans _locks_inactifs (LRU) et est évincé au-delà de
+# FILE_LOCK_REGISTRY_MAX_IDLE, pour que le registre ne grossisse pas d'une
+# entrée par fichier (progression, export...) pendant toute la vie du processus.
+_file_locks: Dict[str, ReadWriteLock] = {}
+_locks_inactifs: 'OrderedDict[str, None]' = OrderedDict()
 _locks_registry_lock = threading.Lock()
+_locks_config = {
+    'max_inactifs': int(os.getenv('FILE_LOCK_REGISTRY_MAX_IDLE', '1024'))
+}
+_locks_stats_lock = threading.Lock()
+_locks_stats = {
+    'creations': 0,
+    'evictions': 0,
+    'acquisitions': 0,
+    'attente_totale_s': 0.0,
+    'attente_max_s': 0.0
+}
+
+# Cache de lecture : chemin absolu -> (signature, document sérialisé, taille)
+# La signature (st_mtime_ns, st_size, st_ino) invalide l'entrée dès que le
+# fichier change sur disque, y compris s'il est réécrit par un autre processus.
+# Le document est gardé au format marshal : chaque lecture en obtient une copie
+# indépendante environ 4x plus vite qu'un json.load du fichier.
+_cache_json: 'OrderedDict[str, Tuple[Tuple[int, int, int], bytes, int]]' = OrderedDict()
+_cache_lock = threading.Lock()
+_cache_config = {
+    'actif': os.getenv('JSON_CACHE_ENABLED', 'True') == 'True',
+    'max_octets': int(os.getenv('JSON_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+}
+_cache_stats = {
+    'hits': 0,
+    'misses': 0,
+    'evictions': 0,
+    'invalidations': 0,
+    'octets': 0
+}
+
 
+# Format de stockage : 'pretty' (indent=4, historique), 'compact' (JSON sans
+# espaces) ou 'binaire' (en-tête MAGIC_BINAIRE + marshal). La lecture détecte
+# le format automatiquement, les trois peuvent coexister sur disque.
+FORMATS_STOCKAGE = ('pretty', 'compact', 'binaire')
+MAGIC_BINAIRE = b'PQBIN1\n'
+_format_config = {
+    'format': os.getenv('JSON_STORAGE_FORMAT', 'pretty')
+}
 
-def _get_lock_for_file(filepath: str) -> threading.Lock:
+# Niveaux de durabilité des écritures :
+# - 'complete' : fsync du fichier + fsync du dossier (renommage durable)
+# - 'fsync'    : fsync du fichier uniquement
+# - 'os'       : tampons de l'OS (aucun fsync), pour les fichiers à faible valeur
+# Priorité : argument de l'appel > niveau déclaré pour le chemin > défaut global
+NIVEAUX_DURABILITE = ('complete', 'fsync', 'os')
+_durabilite_config = {
+    'defaut': os.getenv('JSON_DURABILITY_DEFAULT', 'complete')
+}
+_durabilite_par_chemin: Dict[str, str] = {}
+_durabilite_lock = threading.Lock()
+_durabilite_stats = {
+    niveau: {'ecritures': 0, 'fsyncs': 0, 'duree_ecriture_s': 0.0, 'duree_fsync_s': 0.0}
+    for niveau in NIVEAUX_DURABILITE
+}
+
+# Group commit : les écritures sur un même fichier dans une fenêtre courte
+# sont fusionnées en une seule écriture durable (une seule série fsync/replace)
+_group_commit_config = {
+    'actif': os.getenv('GROUP_COMMIT_ENABLED', 'False') == 'True',
+    'fenetre_ms': float(os.getenv('GROUP_COMMIT_WINDOW_MS', '20')),
+    'relache': os.getenv('GROUP_COMMIT_RELAXED', 'False') == 'True'
+}
+_group_commit_stats = {
+    'ecritures_demandees': 0,
+    'ecritures_disque': 0,
+    'erreurs': 0
+}
+_groupes_ecriture: Dict[str, '_GroupeEcriture'] = {}
+_groupes_lock = threading.Lock()
+
+
+def _acquerir_lock_fichier(filepath: str) -> ReadWriteLock:
     """
-    Obtient ou crée un lock thread-safe pour un fichier spécifique
+    Obtient ou crée le lock lecture/écriture d'un fichier et le référence
+    
+    Chaque appel doit être suivi de _liberer_lock_fichier.
     
     Args:
-        filepath: Chemin du fichier
+        filepath: Chemin absolu du fichier
         
     Returns:
-        threading.Lock: Lock dédié à ce fichier
+        ReadWriteLock: Lock dédié à ce fichier
     """
-    # Normaliser le chemin
-    filepath = os.path.abspath(filepath)
+    with _locks_registry_lock:
+        lock = _file_locks.get(filepath)
+        if lock is None:
+            lock = ReadWriteLock()
+            _file_locks[filepath] = lock
+            _locks_stats['creations'] += 1
+        elif lock._references == 0:
+            _locks_inactifs.pop(filepath, None)
+        lock._references += 1
+        return lock
+
+
+def _liberer_lock_fichier(filepath: str, lock: ReadWriteLock):
+    """Retire une référence ; un lock inutilisé devient évinçable (LRU)"""
+    with _locks_registry_lock:
+        lock._references -= 1
+        if lock._references > 0:
+            return
+        _locks_inactifs[filepath] = None
+        # Aucun thread ne tient ni n'attend un lock inactif : le supprimer
+        # est sans risque, il sera recréé au prochain accès
+        while len(_locks_inactifs) > _locks_config['max_inactifs']:
+            chemin, _ = _locks_inactifs.popitem(last=False)
+            del _file_locks[chemin]
+            _locks_stats['evictions'] += 1
+
+
+def configurer_registre_verrous(max_inactifs: int):
+    """
+    Configure le nombre de locks inutilisés conservés
     
+    Args:
+        max_inactifs: Taille max de la LRU des locks sans référence
+    """
     with _locks_registry_lock:
-        if filepath not in _file_locks:
-            _file_locks[filepath] = threading.Lock()
-        return _file_locks[filepath]
+        _locks_config['max_inactifs'] = max_inactifs
+        while len(_locks_inactifs) > max_inactifs:
+            chemin, _ = _locks_inactifs.popitem(last=False)
+            del _file_locks[chemin]
+            _locks_stats['evictions'] += 1
+
+
+def obtenir_stats_verrous() -> Dict[str, Any]:
+    """Retourne la taille du registre de locks et le temps d'attente cumulé"""
+    with _locks_registry_lock, _locks_stats_lock:
+        stats = dict(_locks_stats)
+        stats['taille'] = len(_file_locks)
+        stats['inactifs'] = len(_locks_inactifs)
+        stats['en_usage'] = len(_file_locks) - len(_locks_inactifs)
+        stats['max_inactifs'] = _locks_config['max_inactifs']
+    acquisitions = stats['acquisitions']
+    stats['attente_moyenne_ms'] = round(stats['attente_totale_s'] / acquisitions * 1000, 4) if acquisitions else 0.0
+    stats['attente_totale_ms'] = round(stats.pop('attente_totale_s') * 1000, 3)
+    stats['attente_max_ms'] = round(stats.pop('attente_max_s') * 1000, 3)
+    return stats
+
+
+def _enregistrer_attente(duree: float):
+    """Comptabilise le temps passé à attendre un verrou (thread + processus)"""
+    with _locks_stats_lock:
+        _locks_stats['acquisitions'] += 1
+        _locks_stats['attente_totale_s'] += duree
+        if duree > _locks_stats['attente_max_s']:
+            _locks_stats['attente_max_s'] = duree
 
 
 @contextmanager
-def atomic_json_writer(filepath: str):
+def verrou_fichier(filepath: str, exclusif: bool = True):
+    """
+    Verrouille un fichier pour le thread ET le processus courants
+    
+    1. ReadWriteLock par chemin (threads du même processus) : les lecteurs
+       s'exécutent en parallèle, les écrivains ont l'accès exclusif
+    2. fcntl.flock sur un fichier sidecar '<fichier>.lock' (autres processus,
+       ex: plusieurs workers gunicorn). Partagé en lecture, exclusif en écriture.
+    
+    Le sidecar est utilisé plutôt que le fichier lui-même car os.replace
+    change l'inode du fichier JSON à chaque écriture.
+    
+    Args:
+        filepath: Chemin absolu du fichier protégé
+        exclusif: True pour une écriture, False pour une lecture
+    """
+    filepath = os.path.abspath(filepath)
+    lock = _acquerir_lock_fichier(filepath)
+    debut = time.perf_counter()
+    try:
+        if exclusif:
+            lock.acquire_write()
+        else:
+            lock.acquire_read()
+    except BaseException:
+        _liberer_lock_fichier(filepath, lock)
+        raise
+    
+    fd = None
+    try:
+        if fcntl is not None:
+            os.makedirs(os.path.dirname(filepath), exist_ok=True)
+            fd = os.open(filepath + '.lock', os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(fd, fcntl.LOCK_EX if exclusif else fcntl.LOCK_SH)
+        _enregistrer_attente(time.perf_counter() - debut)
+        yield
+    finally:
+        if fd is not None:
+            # Fermer le descripteur libère le flock
+            os.close(fd)
+        if exclusif:
+            lock.release_write()
+        else:
+            lock.release_read()
+        _liberer_lock_fichier(filepath, lock)
+
+
+def _signature_fichier(filepath: str) -> Optional[Tuple[int, int, int]]:
+    """Retourne (st_mtime_ns, st_size, st_ino) ou None si le fichier n'existe pas"""
+    try:
+        st = os.stat(filepath)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def _cache_obtenir(filepath: str, signature: Tuple[int, int, int]):
+    """Cherche un document valide dans le cache (retourne (trouvé, copie))"""
+    if not _cache_config['actif']:
+        return False, None
+    with _cache_lock:
+        entree = _cache_json.get(filepath)
+        if entree is not None and entree[0] == signature:
+            _cache_json.move_to_end(filepath)
+            _cache_stats['hits'] += 1
+            blob = entree[1]
+        else:
+            _cache_stats['misses'] += 1
+            return False, None
+    # Désérialiser hors du lock : chaque appelant reçoit sa propre copie
+    return True, marshal.loads(blob)
+
+
+def _cache_stocker(filepath: str, signature: Tuple[int, int, int], donnees: Any):
+    """Ajoute un document au cache et applique l'éviction LRU"""
+    if not _cache_config['actif']:
+        return
+    try:
+        blob = marshal.dumps(donnees)
+    except ValueError:
+        return
+    taille = len(blob)
+    with _cache_lock:
+        if not _cache_config['actif'] or taille > _cache_config['max_octets']:
+            return
+        ancienne = _cache_json.pop(filepath, None)
+        if ancienne is not None:
+            _cache_stats['octets'] -= ancienne[2]
+        _cache_json[filepath] = (signature, blob, taille)
+        _cache_stats['octets'] += taille
+        while _cache_stats['octets'] > _cache_config['max_octets'] and _cache_json:
+            _, (_, _, taille_evincee) = _cache_json.popitem(last=False)
+            _cache_stats['octets'] -= taille_evincee
+            _cache_stats['evictions'] += 1
+
+
+def invalider_cache_json(filepath: Optional[str] = None):
+    """
+    Invalide le cache de lecture pour un fichier (ou tout le cache)
+    
+    Args:
+        filepath: Chemin du fichier, None pour vider tout le cache
+    """
+    with _cache_lock:
+        if filepath is None:
+            _cache_stats['invalidations'] += len(_cache_json)
+            _cache_json.clear()
+            _cache_stats['octets'] = 0
+            return
+        entree = _cache_json.pop(os.path.abspath(filepath), None)
+        if entree is not None:
+            _cache_stats['octets'] -= entree[2]
+            _cache_stats['invalidations'] += 1
+
+
+def configurer_cache_json(actif: Optional[bool] = None, max_octets: Optional[int] = None):
+    """
+    Configure le cache de lecture JSON
+    
+    Args:
+        actif: Active/désactive le cache (le désactiver le vide)
+        max_octets: Mémoire maximale occupée par les documents en cache
+    """
+    with _cache_lock:
+        if actif is not None:
+            _cache_config['actif'] = actif
+        if max_octets is not None:
+            _cache_config['max_octets'] = max_octets
+    if actif is False:
+        invalider_cache_json()
+    elif max_octets is not None:
+        # Réappliquer la limite immédiatement
+        with _cache_lock:
+            while _cache_stats['octets'] > _cache_config['max_octets'] and _cache_json:
+                _, (_, _, taille_evincee) = _cache_json.popitem(last=False)
+                _cache_stats['octets'] -= taille_evincee
+                _cache_stats['evictions'] += 1
+
+
+def obtenir_stats_cache_json() -> Dict[str, Any]:
+    """Retourne les compteurs du cache de lecture (hits, misses, taux, taille)"""
+    with _cache_lock:
+        stats = dict(_cache_stats)
+        stats['entrees'] = len(_cache_json)
+        stats['max_octets'] = _cache_config['max_octets']
+        stats['actif'] = _cache_config['actif']
+    total = stats['hits'] + stats['misses']
+    stats['taux_hit'] = round(stats['hits'] / total, 4) if total else 0.0
+    return stats
+
+
+def configurer_format_stockage(format_stockage: str):
+    """
+    Choisit le format utilisé pour les prochaines écritures
+    
+    Args:
+        format_stockage: 'pretty', 'compact' ou 'binaire'
+    """
+    if format_stockage not in FORMATS_STOCKAGE:
+        raise ValueError(f"Format de stockage inconnu: {format_stockage}")
+    _format_config['format'] = format_stockage
+
+
+def obtenir_format_stockage() -> str:
+    """Retourne le format utilisé pour les écritures"""
+    return _format_config['format']
+
+
+def serialiser_donnees(data: Any, format_stockage: Optional[str] = None) -> bytes:
+    """
+    Sérialise un document JSON dans le format de stockage demandé
+    
+    Args:
+        data: Document (types JSON uniquement)
+        format_stockage: None = format configuré
+    
+    Returns:
+        bytes: Contenu du fichier
+    """
+    format_stockage = format_stockage or _format_config['format']
+    if format_stockage == 'binaire':
+        # Version 4 : format marshal stable depuis Python 3.4
+        return MAGIC_BINAIRE + marshal.dumps(data, 4)
+    if format_stockage == 'compact':
+        texte = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+    elif format_stockage == 'pretty':
+        texte = json.dumps(data, indent=4, ensure_ascii=False)
+    else:
+        raise ValueError(f"Format de stockage inconnu: {format_stockage}")
+    return texte.encode('utf-8')
+
+
+def deserialiser_donnees(contenu: bytes) -> Any:
+    """
+    Désérialise un contenu de fichier, quel que soit son format
+    
+    Raises:
+        ValueError: Contenu corrompu (json.JSONDecodeError en hérite)
+    """
+    if contenu.startswith(MAGIC_BINAIRE):
+        try:
+            return marshal.loads(contenu[len(MAGIC_BINAIRE):])
+        except (EOFError, TypeError, ValueError) as e:
+            raise ValueError(f"Contenu binaire corrompu: {e}")
+    return json.loads(contenu.decode('utf-8'))
+
+
+def detecter_format_fichier(filepath: str) -> Optional[str]:
+    """Retourne 'binaire', 'pretty' ou 'compact' (None si le fichier n'existe pas)"""
+    try:
+        with open(filepath, 'rb') as f:
+            debut = f.read(4096)
+    except FileNotFoundError:
+        return None
+    if debut.startswith(MAGIC_BINAIRE):
+        return 'binaire'
+    return 'pretty' if b'\n' in debut.strip() else 'compact'
+
+
+def _lire_json(filepath: str, defaut_si_corrompu: bool = False) -> Any:
+    """
+    Lit un fichier JSON (lock déjà acquis) en passant par le cache
+    
+    En cas de fichier corrompu, tente une restauration depuis le backup.
+    
+    Args:
+        filepath: Chemin absolu du fichier
+        defaut_si_corrompu: Retourner {} au lieu de lever si pas de backup
+    """
+    # Une écriture groupée pas encore sur disque est la version la plus récente
+    groupe = _groupes_ecriture.get(filepath)
+    if groupe is not None:
+        en_attente = groupe.snapshot_en_attente()
+        if en_attente is not None:
+            return marshal.loads(en_attente)
+    
+    signature = _signature_fichier(filepath)
+    if signature is None:
+        return {}
+    
+    trouve, donnees = _cache_obtenir(filepath, signature)
+    if trouve:
+        return donnees
+    
+    try:
+        with open(filepath, 'rb') as f:
+            data = deserialiser_donnees(f.read())
+    except ValueError:
+        # Tenter de restaurer depuis le backup
+        backup_path = filepath + '.backup'
+        if os.path.exists(backup_path):
+            try:
+                with open(backup_path, 'rb') as f:
+                    data = deserialiser_donnees(f.read())
+            except:
+                raise IOError(f"Fichier JSON corrompu et backup invalide: {filepath}")
+            # Restaurer le fichier corrompu (copie + rename : d'autres
+            # lecteurs peuvent tenir le verrou partagé en même temps)
+            temp_path = f"{filepath}.restore_{os.getpid()}_{threading.get_ident()}"
+            shutil.copy2(backup_path, temp_path)
+            os.replace(temp_path, filepath)
+            invalider_cache_json(filepath)
+            return data
+        if defaut_si_corrompu:
+            return {}
+        raise IOError(f"Fichier JSON corrompu sans backup: {filepath}")
+    
+    _cache_stocker(filepath, signature, data)
+    return data
+
+
+def _conserver_backup(filepath: str):
+    """
+    Fait de la version actuelle du fichier le backup '<fichier>.backup'
+    
+    Un lien physique vers l'inode courant suffit : os.replace attribue un
+    nouvel inode au fichier, le backup garde donc l'ancienne génération
+    sans relire ni réécrire son contenu. Copie en dernier recours si le
+    système de fichiers ne supporte pas les liens physiques.
+    """
+    backup_path = filepath + '.backup'
+    try:
+        os.remove(backup_path)
+    except FileNotFoundError:
+        pass
+    try:
+        os.link(filepath, backup_path)
+    except (OSError, AttributeError):
+        shutil.copy2(filepath, backup_path)
+
+
+def _fsync_dossier(dossier: str):
+    """Rend durable le renommage en synchronisant l'entrée de répertoire (POSIX)"""
+    if os.name != 'posix':
+        return
+    fd = os.open(dossier, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def declarer_durabilite(filepath: str, niveau: str):
+    """
+    Déclare le niveau de durabilité des écritures d'un fichier
+    
+    Usage (au chargement d'un module) :
+        declarer_durabilite(FICHIER_NOTIFICATIONS, 'os')
+    
+    Args:
+        filepath: Chemin du fichier (relatif au répertoire courant ou absolu)
+        niveau: 'complete', 'fsync' ou 'os'
+    """
+    if niveau not in NIVEAUX_DURABILITE:
+        raise ValueError(f"Niveau de durabilité inconnu: {niveau}")
+    with _durabilite_lock:
+        _durabilite_par_chemin[os.path.abspath(filepath)] = niveau
+
+
+def configurer_durabilite(defaut: str):
+    """
+    Configure le niveau de durabilité par défaut
+    
+    Args:
+        defaut: 'complete', 'fsync' ou 'os'
+    """
+    if defaut not in NIVEAUX_DURABILITE:
+        raise ValueError(f"Niveau de durabilité inconnu: {defaut}")
+    _durabilite_config['defaut'] = defaut
+
+
+def _niveau_durabilite(filepath: str, durabilite: Optional[str] = None) -> str:
+    """Résout le niveau effectif (appel > chemin > défaut)"""
+    if durabilite is None:
+        durabilite = _durabilite_par_chemin.get(filepath, _durabilite_config['defaut'])
+    if durabilite not in NIVEAUX_DURABILITE:
+        raise ValueError(f"Niveau de durabilité inconnu: {durabilite}")
+    return durabilite
+
+
+def _enregistrer_ecriture(niveau: str, fsyncs: int, duree_fsync: float, duree: float):
+    with _durabilite_lock:
+        stats = _durabilite_stats[niveau]
+        stats['ecritures'] += 1
+        stats['fsyncs'] += fsyncs
+        stats['duree_fsync_s'] += duree_fsync
+        stats['duree_ecriture_s'] += duree
+
+
+def obtenir_stats_durabilite() -> Dict[str, Any]:
+    """Retourne, par niveau, le nombre d'écritures, de fsync et leurs latences"""
+    with _durabilite_lock:
+        resultat = {'defaut': _durabilite_config['defaut'], 'niveaux': {}}
+        for niveau, stats in _durabilite_stats.items():
+            ecritures = stats['ecritures']
+            resultat['niveaux'][niveau] = {
+                'ecritures': ecritures,
+                'fsyncs': stats['fsyncs'],
+                'latence_fsync_moyenne_ms': round(stats['duree_fsync_s'] / stats['fsyncs'] * 1000, 3) if stats['fsyncs'] else 0.0,
+                'latence_ecriture_moyenne_ms': round(stats['duree_ecriture_s'] / ecritures * 1000, 3) if ecritures else 0.0
+            }
+        resultat['chemins'] = {os.path.basename(c): n for c, n in _durabilite_par_chemin.items()}
+    return resultat
+
+
+def _ecrire_json_atomique(filepath: str, data: Any, format_stockage: Optional[str] = None,
+                          durabilite: Optional[str] = None):
+    """
+    Écrit un fichier JSON de manière atomique (lock déjà acquis)
+    
+    Temp file + os.replace, avec fsync du fichier et du dossier selon le
+    niveau de durabilité. La version précédente reste disponible dans
+    '<fichier>.backup' pour la restauration d'un fichier corrompu (_lire_json).
+    
+    Args:
+        filepath: Chemin absolu du fichier
+        data: Document à écrire
+        format_stockage: None = format configuré (JSON_STORAGE_FORMAT)
+        durabilite: 'complete', 'fsync', 'os' (None = niveau du chemin ou défaut)
+    """
+    niveau = _niveau_durabilite(filepath, durabilite)
+    debut = time.perf_counter()
+    fsyncs = 0
+    duree_fsync = 0.0
+    
+    # Créer le dossier parent si nécessaire
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    
+    # Écrire dans un fichier temporaire
+    temp_fd, temp_path = tempfile.mkstemp(
+        dir=os.path.dirname(filepath),
+        prefix='.tmp_',
+        suffix='.json'
+    )
+    
+    try:
+        with os.fdopen(temp_fd, 'wb') as f:
+            f.write(serialiser_donnees(data, format_stockage))
+            f.flush()
+            if niveau != 'os':
+                debut_fsync = time.perf_counter()
+                os.fsync(f.fileno())  # Force l'écriture sur disque
+                duree_fsync += time.perf_counter() - debut_fsync
+                fsyncs += 1
+        
+        # Conserver la génération précédente comme backup roulant, puis
+        # remplacer atomiquement (os.replace est atomique, sur Windows aussi)
+        if os.path.exists(filepath):
+            _conserver_backup(filepath)
+        os.replace(temp_path, filepath)
+        if niveau == 'complete' and os.name == 'posix':
+            debut_fsync = time.perf_counter()
+            _fsync_dossier(os.path.dirname(filepath))
+            duree_fsync += time.perf_counter() - debut_fsync
+            fsyncs += 1
+        
+    except Exception:
+        # Nettoyer le fichier temporaire en cas d'erreur
+        if os.path.exists(temp_path):
+            try:
+                os.remove(temp_path)
+            except:
+                pass
+        raise
+    finally:
+        # Le contenu a (peut-être) changé : l'entrée en cache n'est plus fiable
+        invalider_cache_json(filepath)
+    
+    _enregistrer_ecriture(niveau, fsyncs, duree_fsync, time.perf_counter() - debut)
+
+
+# ============================================================================
+# GROUP COMMIT
+# ============================================================================
+
+class _GroupeEcriture:
+    """
+    Écritures en attente pour un fichier
+    
+    Chaque soumission incrémente `version` et remplace le snapshot : seule la
+    dernière version est écrite à l'expiration de la fenêtre. Les appelants
+    bloquants attendent que `version_durable` atteigne leur version.
+    """
+    
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.snapshot: Optional[bytes] = None
+        self.version = 0
+        self.version_durable = 0
+        self.version_en_erreur = 0
+        self.erreur: Optional[Exception] = None
+        self.planifie = False
+    
+    def snapshot_en_attente(self) -> Optional[bytes]:
+        with self.condition:
+            return self.snapshot
+    
+    def marquer_durable(self, version: int):
+        """Une écriture directe a remplacé les versions <= version"""
+        with self.condition:
+            self.version_durable = max(self.version_durable, version)
+            if self.version == version:
+                self.snapshot = None
+            self.condition.notify_all()
+    
+    def attendre(self, version: int):
+        """Bloque jusqu'à ce que `version` soit sur disque (ou lève l'erreur d'écriture)"""
+        with self.condition:
+            while self.version_durable < version and self.version_en_erreur < version:
+                self.condition.wait()
+            if self.version_durable < version:
+                raise IOError(f"Erreur lors de l'écriture groupée: {self.erreur}")
+
+
+def _obtenir_groupe(filepath: str) -> _GroupeEcriture:
+    with _groupes_lock:
+        groupe = _groupes_ecriture.get(filepath)
+        if groupe is None:
+            groupe = _groupes_ecriture[filepath] = _GroupeEcriture()
+        return groupe
+
+
+def _version_groupee(filepath: str) -> int:
+    """Version groupée courante d'un fichier (0 si aucune écriture groupée)"""
+    groupe = _groupes_ecriture.get(filepath)
+    if groupe is None:
+        return 0
+    with groupe.condition:
+        return groupe.version
+
+
+def _ecriture_directe_terminee(filepath: str, version: int):
+    """Signale qu'une écriture directe inclut les écritures groupées <= version"""
+    groupe = _groupes_ecriture.get(filepath)
+    if groupe is not None and version:
+        groupe.marquer_durable(version)
+
+
+def _soumettre_ecriture_groupee(filepath: str, data: Any) -> Tuple[_GroupeEcriture, int]:
+    """Enregistre une écriture en attente et planifie le flush de la fenêtre"""
+    # Snapshot immédiat : l'appelant peut modifier `data` après l'appel
+    snapshot = marshal.dumps(data)
+    groupe = _obtenir_groupe(filepath)
+    with groupe.condition:
+        groupe.version += 1
+        version = groupe.version
+        groupe.snapshot = snapshot
+        _group_commit_stats['ecritures_demandees'] += 1
+        if not groupe.planifie:
+            groupe.planifie = True
+            timer = threading.Timer(
+                _group_commit_config['fenetre_ms'] / 1000.0,
+                _vider_groupe,
+                args=(filepath,)
+            )
+            timer.daemon = True
+            timer.start()
+    return groupe, version
+
+
+def _vider_groupe(filepath: str):
+    """Écrit la dernière version en attente d'un fichier (une seule écriture durable)"""
+    groupe = _obtenir_groupe(filepath)
+    with verrou_fichier(filepath, exclusif=True):
+        with groupe.condition:
+            groupe.planifie = False
+            snapshot, version = groupe.snapshot, groupe.version
+        if snapshot is None:
+            return  # Déjà remplacée par une écriture directe
+        
+        erreur = None
+        try:
+            _ecrire_json_atomique(filepath, marshal.loads(snapshot))
+        except Exception as e:
+            erreur = e
+        
+        with groupe.condition:
+            if erreur is None:
+                groupe.version_durable = max(groupe.version_durable, version)
+                _group_commit_stats['ecritures_disque'] += 1
+            else:
+                groupe.version_en_erreur = max(groupe.version_en_erreur, version)
+                groupe.erreur = erreur
+                _group_commit_stats['erreurs'] += 1
+            if groupe.version == version:
+                groupe.snapshot = None
+            groupe.condition.notify_all()
+    
+    if erreur is not None:
+        log_file_operation('group_commit', filepath, success=False, error=str(erreur))
+
+
+def vider_ecritures_groupees():
+    """Force l'écriture immédiate de toutes les écritures groupées en attente"""
+    with _groupes_lock:
+        chemins = list(_groupes_ecriture.keys())
+    for chemin in chemins:
+        _vider_groupe(chemin)
+
+
+# Ne pas perdre les écritures en durabilité relâchée à l'arrêt du processus
+atexit.register(vider_ecritures_groupees)
+
+
+def configurer_group_commit(actif: Optional[bool] = None, fenetre_ms: Optional[float] = None,
+                            relache: Optional[bool] = None):
+    """
+    Configure le mode group commit de atomic_json_writer
+    
+    Args:
+        actif: Active le regroupement des écritures par défaut
+        fenetre_ms: Durée de la fenêtre de regroupement (ms)
+        relache: Durabilité relâchée par défaut (retour sans attendre le disque)
+    """
+    if actif is not None:
+        _group_commit_config['actif'] = actif
+    if fenetre_ms is not None:
+        _group_commit_config['fenetre_ms'] = fenetre_ms
+    if relache is not None:
+        _group_commit_config['relache'] = relache
+    if actif is False:
+        vider_ecritures_groupees()
+
+
+def obtenir_stats_group_commit() -> Dict[str, Any]:
+    """Retourne les compteurs du group commit (écritures demandées, fsyncs économisés)"""
+    with _groupes_lock:
+        stats = dict(_group_commit_stats)
+        stats['fichiers_suivis'] = len(_groupes_ecriture)
+    stats['fsyncs_economises'] = max(0, stats['ecritures_demandees'] - stats['ecritures_disque'] - stats['erreurs'])
+    stats.update(_group_commit_config)
+    return stats
+
+
+@contextmanager
+def atomic_json_writer(filepath: str, group_commit: Optional[bool] = None,
+                       durabilite_relachee: Optional[bool] = None,
+                       durabilite: Optional[str] = None):
     """
     Context manager pour écriture atomique de fichiers JSON
     
     Garantit :
     - Aucune corruption même en cas d'erreur
     - Écriture atomique (temp file + rename)
-    - Thread-safety avec locks
+    - Thread-safety et verrou inter-processus (flock)
+    
+    Mode group commit (optionnel) : les écritures d'un même fichier dans la
+    fenêtre configurée sont fusionnées en une seule écriture durable. Par
+    défaut l'appelant attend que sa version soit sur disque ; en durabilité
+    relâchée il retourne immédiatement (les lectures du processus voient
+    quand même la nouvelle version).
     
     Usage:
         with atomic_json_writer('data.json') as writer:
@@ -53,78 +864,59 @@ def atomic_json_writer(filepath: str):
     
     Args:
         filepath: Chemin du fichier JSON
+        group_commit: Force/désactive le group commit (None = config globale)
+        durabilite_relachee: Ne pas attendre l'écriture disque (group commit uniquement)
+        durabilite: 'complete', 'fsync' ou 'os' (None = niveau déclaré pour le
+                    chemin ou défaut). En group commit, le niveau du chemin s'applique.
         
     Yields:
         Fonction d'écriture à appeler avec les données
     """
     filepath = os.path.abspath(filepath)
-    lock = _get_lock_for_file(filepath)
     
-    # Acquérir le lock
-    lock.acquire()
+    if group_commit is None:
+        group_commit = _group_commit_config['actif']
+    if durabilite_relachee is None:
+        durabilite_relachee = _group_commit_config['relache']
     
-    try:
+    if group_commit:
+        soumission = None
+        
+        def write_group(data: Any):
+            """Fonction interne d'écriture groupée"""
+            nonlocal soumission
+            soumission = _soumettre_ecriture_groupee(filepath, data)
+        
+        yield write_group
+        
+        if soumission is None:
+            raise IOError(f"Aucune donnée n'a été écrite dans {filepath}")
+        # Attendre hors de tout lock : le flush a besoin du verrou exclusif
+        if not durabilite_relachee:
+            groupe, version = soumission
+            groupe.attendre(version)
+        return
+    
+    # Acquérir le lock (threads + processus)
+    with verrou_fichier(filepath, exclusif=True):
         written = False
         
         def write_data(data: Any):
             """Fonction interne d'écriture atomique"""
             nonlocal written
             
-            # Créer le dossier parent si nécessaire
-            os.makedirs(os.path.dirname(filepath), exist_ok=True)
-            
-            # Écrire dans un fichier temporaire
-            temp_fd, temp_path = tempfile.mkstemp(
-                dir=os.path.dirname(filepath),
-                prefix='.tmp_',
-                suffix='.json',
-                text=True
-            )
-            
+            version = _version_groupee(filepath)
             try:
-                with os.fdopen(temp_fd, 'w', encoding='utf-8') as f:
-                    json.dump(data, f, indent=4, ensure_ascii=False)
-                    f.flush()
-                    os.fsync(f.fileno())  # Force l'écriture sur disque
-                
-                # Remplacer atomiquement l'ancien fichier
-                # Sur Windows, on doit supprimer l'ancien fichier d'abord
-                if os.path.exists(filepath):
-                    backup_path = filepath + '.backup'
-                    shutil.copy2(filepath, backup_path)
-                    try:
-                        os.replace(temp_path, filepath)
-                        # Supprimer le backup si succès
-                        if os.path.exists(backup_path):
-                            os.remove(backup_path)
-                    except Exception as e:
-                        # Restaurer depuis le backup en cas d'erreur
-                        if os.path.exists(backup_path):
-                            shutil.copy2(backup_path, filepath)
-                            os.remove(backup_path)
-                        raise e
-                else:
-                    os.replace(temp_path, filepath)
-                
+                _ecrire_json_atomique(filepath, data, durabilite=durabilite)
                 written = True
-                
             except Exception as e:
-                # Nettoyer le fichier temporaire en cas d'erreur
-                if os.path.exists(temp_path):
-                    try:
-                        os.remove(temp_path)
-                    except:
-                        pass
                 raise IOError(f"Erreur lors de l'écriture atomique de {filepath}: {str(e)}")
+            _ecriture_directe_terminee(filepath, version)
         
         yield write_data
         
         if not written:
             raise IOError(f"Aucune donnée n'a été écrite dans {filepath}")
-            
-    finally:
-        # Toujours libérer le lock
-        lock.release()
 
 
 @contextmanager
@@ -132,6 +924,9 @@ def safe_json_read(filepath: str):
     """
     Context manager pour lecture thread-safe de fichiers JSON
     
+    Les documents parsés sont mis en cache (validé par mtime/taille/inode) ;
+    chaque appel reçoit sa propre copie, modifiable sans effet sur le cache.
+    
     Usage:
         with safe_json_read('data.json') as data:
             print(data)
@@ -143,43 +938,26 @@ def safe_json_read(filepath: str):
         dict: Données JSON chargées
     """
     filepath = os.path.abspath(filepath)
-    lock = _get_lock_for_file(filepath)
-    
-    lock.acquire()
     
     try:
-        if not os.path.exists(filepath):
-            yield {}
-        else:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                yield data
-    except json.JSONDecodeError as e:
-        # Tenter de restaurer depuis le backup
-        backup_path = filepath + '.backup'
-        if os.path.exists(backup_path):
-            try:
-                with open(backup_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    # Restaurer le fichier corrompu
-                    shutil.copy2(backup_path, filepath)
-                    yield data
-            except:
-                raise IOError(f"Fichier JSON corrompu et backup invalide: {filepath}")
-        else:
-            raise IOError(f"Fichier JSON corrompu sans backup: {filepath}")
+        with verrou_fichier(filepath, exclusif=False):
+            data = _lire_json(filepath)
+    except IOError:
+        raise
     except Exception as e:
         raise IOError(f"Erreur lors de la lecture de {filepath}: {str(e)}")
-    finally:
-        lock.release()
+    
+    # Les données sont une copie privée : inutile de garder le lock
+    yield data
 
 
-def safe_json_update(filepath: str, update_func):
+def safe_json_update(filepath: str, update_func, durabilite: Optional[str] = None):
     """
     Met à jour un fichier JSON de manière thread-safe et atomique
     
     CRITIQUE : Cette fonction garde le lock pendant toute la durée
-    de la lecture + modification + écriture pour garantir l'atomicité
+    de la lecture + modification + écriture pour garantir l'atomicité,
+    y compris entre plusieurs processus (workers gunicorn/uwsgi)
     
     Usage:
         def update(data):
@@ -191,83 +969,30 @@ def safe_json_update(filepath: str, update_func):
     Args:
         filepath: Chemin du fichier JSON
         update_func: Fonction qui prend les données et retourne les données modifiées
+        durabilite: 'complete', 'fsync' ou 'os' (None = niveau du chemin ou défaut)
         
     Returns:
         dict: Données mises à jour
     """
     filepath = os.path.abspath(filepath)
-    lock = _get_lock_for_file(filepath)
     
-    # Acquérir le lock une seule fois pour toute l'opération
-    lock.acquire()
-    
-    try:
-        # 1. Lire les données actuelles
-        if not os.path.exists(filepath):
-            data = {}
-        else:
-            try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-            except json.JSONDecodeError:
-                # Tenter de restaurer depuis le backup
-                backup_path = filepath + '.backup'
-                if os.path.exists(backup_path):
-                    with open(backup_path, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                else:
-                    data = {}
+    # Acquérir le lock une seule fois pour toute l'opération (threads + processus)
+    with verrou_fichier(filepath, exclusif=True):
+        # 1. Lire les données actuelles (via le cache ou une écriture groupée en attente)
+        version = _version_groupee(filepath)
+        data = _lire_json(filepath, defaut_si_corrompu=True)
         
         # 2. Appliquer la fonction de mise à jour
         updated_data = update_func(data)
         
         # 3. Écrire atomiquement (sans lock car déjà acquis)
-        # Créer le dossier parent si nécessaire
-        os.makedirs(os.path.dirname(filepath), exist_ok=True)
-        
-        # Écrire dans un fichier temporaire
-        temp_fd, temp_path = tempfile.mkstemp(
-            dir=os.path.dirname(filepath),
-            prefix='.tmp_',
-            suffix='.json',
-            text=True
-        )
-        
         try:
-            with os.fdopen(temp_fd, 'w', encoding='utf-8') as f:
-                json.dump(updated_data, f, indent=4, ensure_ascii=False)
-                f.flush()
-                os.fsync(f.fileno())
-            
-            # Remplacer atomiquement
-            if os.path.exists(filepath):
-                backup_path = filepath + '.backup'
-                shutil.copy2(filepath, backup_path)
-                try:
-                    os.replace(temp_path, filepath)
-                    if os.path.exists(backup_path):
-                        os.remove(backup_path)
-                except Exception as e:
-                    if os.path.exists(backup_path):
-                        shutil.copy2(backup_path, filepath)
-                        os.remove(backup_path)
-                    raise e
-            else:
-                os.replace(temp_path, filepath)
-        
+            _ecrire_json_atomique(filepath, updated_data, durabilite=durabilite)
         except Exception as e:
-            if os.path.exists(temp_path):
-                try:
-                    os.remove(temp_path)
-                except:
-                    pass
             raise IOError(f"Erreur lors de l'écriture de {filepath}: {str(e)}")
+        _ecriture_directe_terminee(filepath, version)
         
         return updated_data
-    
-    finally:
-        # Toujours libérer le lock
-        lock.release()
 
 
 # Logs des opérations (pour debugging)
@@ -289,3 +1014,27 @@ def log_file_operation(operation: str, filepath: str, success: bool = True, erro
             f.write(json.dumps(log_entry, ensure_ascii=False) + '\n')
     except:
         pass  # Ne pas bloquer l'opération si le log échoue
+
+
+def convertir_fichier_json(filepath: str, format_stockage: str) -> Tuple[int, int]:
+    """
+    Réécrit un fichier existant dans un autre format de stockage
+    
+    Args:
+        filepath: Chemin du fichier
+        format_stockage: 'pretty', 'compact' ou 'binaire'
+    
+    Returns:
+        tuple: (taille_avant, taille_apres) en octets
+    """
+    if format_stockage not in FORMATS_STOCKAGE:
+        raise ValueError(f"Format de stockage inconnu: {format_stockage}")
+    filepath = os.path.abspath(filepath)
+    vider_ecritures_groupees()
+    with verrou_fichier(filepath, exclusif=True):
+        taille_avant = os.path.getsize(filepath)
+        data = _lire_json(filepath)
+        _ecrire_json_atomique(filepath, data, format_stockage)
+        taille_apres = os.path.getsize(filepath)
+    log_file_operation("CONVERSION_" + format_stockage.upper(), filepath)
+    return taille_avant, taille_apres
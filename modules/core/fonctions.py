@@ -1,11 +1,18 @@
 ## Fichier contenant toutes les fonctions utilitaires pour l'application d'apprentissage
 
-import ollama
 import random 
 import json
 import os
-from modules.core.progression import est_exercice_complete
-from modules.core.file_lock import atomic_json_writer, safe_json_read
+from modules.core.progression import (
+    charger_exercices_completes, est_dans_completes, contient_anciens_identifiants
+)
+from modules.core.stockage import obtenir_moteur_stockage
+from modules.core.pregeneration import signaler_demande
+from modules.core.coalescence import Coalesceur
+from modules.core.cache_verdicts import obtenir_cache_verdicts, cle_verdict
+from modules.core.client_llm import obtenir_client_llm
+from modules.core.metriques_llm import mesurer_appel_llm
+from modules.core.json_incremental import AnalyseurJSONIncremental
 try:
     from modules.core.domaines import obtenir_config_ia, obtenir_themes_domaine
 except ImportError:
@@ -17,20 +24,32 @@ except ImportError:
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 FICHIER_BANQUE = os.path.join(BASE_DIR, 'banque_exercices.json')
 
+# Générations IA identiques simultanées : un seul appel au LLM et une seule
+# écriture dans la banque, clé (domaine, theme, niveau, type_exercice)
+_generations_en_cours = Coalesceur()
+
+# Vérifications IA identiques simultanées (même clé de cache de verdict)
+_verifications_en_cours = Coalesceur()
+
 def charger_banque():
-    """Charge la banque d'exercices depuis le fichier JSON (thread-safe)"""
-    if not os.path.exists(FICHIER_BANQUE):
-        return {}
-    
-    with safe_json_read(FICHIER_BANQUE) as data:
-        return data
+    """Charge la banque d'exercices depuis le moteur de stockage (thread-safe)"""
+    return obtenir_moteur_stockage().charger_banque()
+
+def charger_banque_theme(cle_banque):
+    """Charge les exercices d'une seule clé "domaine:theme" (un seul shard lu)"""
+    return obtenir_moteur_stockage().charger_banque_theme(cle_banque)
 
 def sauvegarder_banque(banque):
-    """Sauvegarde la banque d'exercices dans le fichier JSON (atomique et thread-safe)"""
-    with atomic_json_writer(FICHIER_BANQUE) as writer:
-        writer(banque)
-        
-        
+    """Sauvegarde la banque d'exercices via le moteur de stockage (atomique et thread-safe)"""
+    obtenir_moteur_stockage().sauvegarder_banque(banque)
+
+
+def attribuer_identifiant(exercice):
+    """Génère un ID unique (hash de l'énoncé) si l'exercice n'en a pas"""
+    if 'id' not in exercice:
+        import hashlib
+        exercice['id'] = hashlib.md5(exercice['enonce'].encode()).hexdigest()[:10]
+    return exercice['id']
 
 
 def ajouter_exercice_banque(theme, niveau, exercice):
@@ -49,72 +68,169 @@ def ajouter_exercice_banque(theme, niveau, exercice):
         "exemple": "..."
     }
     """
-    banque = charger_banque()
-    
-    if theme not in banque:
-        banque[theme] = {"1": [], "2": [], "3": []}
-    
-    niveau_str = str(niveau)
-    if niveau_str not in banque[theme]:
-        banque[theme][niveau_str] = []
-    
-    # Générer un ID unique si pas présent
-    if 'id' not in exercice:
-        import hashlib
-        exercice['id'] = hashlib.md5(exercice['enonce'].encode()).hexdigest()[:10]
-    
-    # Vérifier si l'exercice existe déjà (par ID)
-    exercice_existe = any(ex.get('id') == exercice.get('id') for ex in banque[theme][niveau_str])
+    attribuer_identifiant(exercice)
     
-    if not exercice_existe:
-        banque[theme][niveau_str].append(exercice)
-        sauvegarder_banque(banque)
-        return True
-    return False
+    # Le moteur vérifie l'existence (par ID) et n'écrit que si nécessaire
+    return obtenir_moteur_stockage().ajouter_exercice(theme, str(niveau), exercice)
 
 
 def obtenir_exercice_par_id(exercice_id):
     """Récupère un exercice de la banque par son ID"""
-    banque = charger_banque()
-    
-    for theme in banque.values():
-        for niveau in theme.values():
-            for exercice in niveau:
-                if exercice.get('id') == exercice_id:
-                    return exercice
-    return None
+    return obtenir_moteur_stockage().obtenir_exercice_par_id(exercice_id)
 
 
 
+def tirer_exercice_non_complete(exercices, theme, niveau, completes):
+    """
+    Tire uniformément un exercice non complété (reservoir sampling)
+    
+    Un seul passage sur les candidats, sans construire la liste filtrée.
+    
+    Args:
+        exercices: Exercices du shard pour ce niveau
+        theme: Thème
+        niveau: Niveau
+        completes: Set retourné par charger_exercices_completes
+    
+    Returns:
+        tuple: (exercice choisi ou None si tous sont complétés, nombre de non complétés)
+    """
+    formats_anciens = contient_anciens_identifiants(completes)
+    choisi = None
+    disponibles = 0
+    for ex in exercices:
+        if est_dans_completes(completes, theme, niveau, ex, formats_anciens):
+            continue
+        disponibles += 1
+        # Le k-ième candidat remplace le choix courant avec une probabilité 1/k
+        if random.randrange(disponibles) == 0:
+            choisi = ex
+    return choisi, disponibles
+
+
 def generer_exercice(niveau, theme, domaine='python'):
     """Génère un exercice : d'abord depuis la banque (non complété), sinon via l'IA"""
     
-    banque = charger_banque()
-    niveau_str = str(niveau)
+    exercice = _exercice_depuis_banque(niveau, theme, domaine)
+    if exercice is not None:
+        print("[Exercice depuis la banque]")
+        return exercice
     
-    # Chercher dans la banque (structure : domaine -> theme -> niveau)
-    cle_banque = f"{domaine}:{theme}"
-    if cle_banque in banque and niveau_str in banque[cle_banque] and banque[cle_banque][niveau_str]:
-        exercices_disponibles = [
-            ex for ex in banque[cle_banque][niveau_str] 
-            if not est_exercice_complete(theme, niveau, str(ex))
-        ]
+    print("[Generation par IA...]")
+    return generer_exercice_ia(niveau, theme, domaine)
+
+
+def generer_exercice_flux(niveau, theme, domaine='python'):
+    """
+    Variante de generer_exercice qui produit des événements au fil de la génération
+    
+    Événements (dict avec une clé 'type') :
+    - {'type': 'source', 'source': 'banque' | 'ia'}
+    - {'type': 'token', 'texte': ...}           fragment brut du modèle
+    - {'type': 'champ', 'nom': ..., 'valeur': ...}  champ JSON complet (ex: enonce)
+    - {'type': 'exercice', 'exercice': ...}     exercice validé, ajouté à la banque
+    
+    La génération en flux n'est pas coalescée avec les appels simultanés.
+    """
+    exercice = _exercice_depuis_banque(niveau, theme, domaine)
+    if exercice is not None:
+        yield {'type': 'source', 'source': 'banque'}
+        yield {'type': 'exercice', 'exercice': exercice}
+        return
+    
+    yield {'type': 'source', 'source': 'ia'}
+    role, type_ex = _config_generation(domaine)
+    analyseur = AnalyseurJSONIncremental()
+    fragments = []
+    contenu = _prompt_generation(niveau, theme, role, type_ex)
+    with mesurer_appel_llm('generation_flux') as mesure:
+        for fragment in obtenir_client_llm().chat_flux([{'role': 'user', 'content': contenu}], mesure=mesure):
+            fragments.append(fragment)
+            yield {'type': 'token', 'texte': fragment}
+            for nom, valeur in analyseur.ajouter(fragment):
+                yield {'type': 'champ', 'nom': nom, 'valeur': valeur}
         
-        if exercices_disponibles:
-            exercice = random.choice(exercices_disponibles)
-            print("[Exercice depuis la banque]")
-            return exercice
+        exercice = _exercice_depuis_reponse(''.join(fragments).strip(), type_ex, mesure)
+    ajouter_exercice_banque(f"{domaine}:{theme}", niveau, exercice)
+    yield {'type': 'exercice', 'exercice': exercice}
+
+
+def _exercice_depuis_banque(niveau, theme, domaine):
+    """Exercice non complété tiré de la banque (None s'il n'y en a plus)"""
     
-    print("[Generation par IA...]")
+    niveau_str = str(niveau)
     
-    # Obtenir la config IA du domaine
+    # Chercher dans la banque (structure : domaine -> theme -> niveau)
+    # Seul le shard "domaine:theme" est lu
+    cle_banque = f"{domaine}:{theme}"
+    niveaux = charger_banque_theme(cle_banque)
+    exercice, disponibles = None, 0
+    if niveaux.get(niveau_str):
+        completes = charger_exercices_completes(domaine)
+        exercice, disponibles = tirer_exercice_non_complete(niveaux[niveau_str], theme, niveau, completes)
+    
+    # Stock inédit restant une fois cet exercice servi : la pré-génération
+    # réapprovisionne la banque en arrière-plan sous le seuil bas
+    signaler_demande(domaine, theme, niveau, max(disponibles - 1, 0))
+    return exercice
+
+
+def _config_generation(domaine):
+    """Rôle et type d'exercice de l'IA pour un domaine"""
     if obtenir_config_ia:
         config = obtenir_config_ia(domaine)
-        role = config.get('role', 'professeur')
-        type_ex = config.get('type_exercice', 'code')
-    else:
-        role = 'professeur de Python'
-        type_ex = 'code'
+        return config.get('role', 'professeur'), config.get('type_exercice', 'code')
+    return 'professeur de Python', 'code'
+
+
+def generer_exercice_ia(niveau, theme, domaine='python'):
+    """
+    Génère un exercice via l'IA et l'ajoute à la banque (appel synchrone au LLM)
+    
+    Les appels simultanés pour la même clé (domaine, theme, niveau,
+    type_exercice) attendent la génération en cours et en partagent le résultat.
+    """
+    
+    role, type_ex = _config_generation(domaine)
+    
+    cle = (domaine, theme, str(niveau), type_ex)
+    return _generations_en_cours.executer(
+        cle, lambda: _generer_exercice_llm(niveau, theme, domaine, role, type_ex)
+    )
+
+
+def generer_exercices_lot(niveau, theme, domaine='python', nombre=5):
+    """
+    Génère plusieurs exercices en un seul appel au LLM et les ajoute à la banque
+    
+    Le modèle renvoie un tableau JSON ; chaque exercice est validé
+    séparément (un exercice invalide n'invalide pas le lot), les doublons
+    (même ID) sont écartés et les exercices retenus sont insérés en une
+    seule écriture du shard.
+    
+    Args:
+        niveau: Niveau (1-3)
+        theme: Thème
+        domaine: Domaine
+        nombre: Nombre d'exercices demandés
+    
+    Returns:
+        dict: {'demandes', 'recus', 'valides', 'ajoutes', 'exercices'}
+    """
+    role, type_ex = _config_generation(domaine)
+    cle = (domaine, theme, str(niveau), type_ex, 'lot', nombre)
+    return _generations_en_cours.executer(
+        cle, lambda: _generer_lot_llm(niveau, theme, domaine, role, type_ex, nombre)
+    )
+
+
+def obtenir_stats_generation():
+    """Compteurs des générations IA : appels émis au LLM et appels coalescés"""
+    return _generations_en_cours.stats()
+
+
+def _prompt_generation(niveau, theme, role, type_ex, nombre=1):
+    """Prompt de génération d'un exercice, ou d'un tableau de `nombre` exercices"""
     
     # Adapter le prompt selon le type d'exercice
     if type_ex == 'code':
@@ -140,10 +256,16 @@ def generer_exercice(niveau, theme, domaine='python'):
   "mots_cles": ["hello", "how", "you"]
 }}'''
     
-    messages = [
-    {
-        'role': 'user',
-        'content' : f'''Tu es un {role}. Crée un exercice de niveau {niveau} (1=facile, 2=moyen, 3=difficile) sur le thème : {theme}
+    if nombre == 1:
+        demande = f"Crée un exercice de niveau {niveau} (1=facile, 2=moyen, 3=difficile) sur le thème : {theme}"
+        consigne = "Réponds UNIQUEMENT avec le JSON, rien d'autre."
+    else:
+        demande = (f"Crée {nombre} exercices DIFFÉRENTS de niveau {niveau} "
+                   f"(1=facile, 2=moyen, 3=difficile) sur le thème : {theme}")
+        consigne = (f"Réponds UNIQUEMENT avec un tableau JSON de {nombre} objets "
+                    f"[{{...}}, {{...}}] au format ci-dessus, rien d'autre.")
+    
+    return f'''Tu es un {role}. {demande}
 
 Format de réponse OBLIGATOIRE (JSON strict) :
 
@@ -168,46 +290,85 @@ POUR QCM:
 EXEMPLE POUR CE TYPE ({type_ex}):
 {exemple_format}
 
-Réponds UNIQUEMENT avec le JSON, rien d'autre.'''
+{consigne}'''
+
+
+def _extraire_json(texte):
+    """Parse la réponse du modèle (éventuellement entourée de ```)"""
+    if '```json' in texte:
+        texte = texte.split('```json')[1].split('```')[0].strip()
+    elif '```' in texte:
+        texte = texte.split('```')[1].split('```')[0].strip()
+    return json.loads(texte)
+
+
+def _construire_exercice(exercice_data, type_ex):
+    """Exercice de la banque à partir d'un objet JSON renvoyé par le modèle"""
+    # Différencier CODE et QCM
+    if type_ex == 'qcm':
+        return {
+            "type": "qcm",
+            "enonce": exercice_data.get('enonce', ''),
+            "choix": exercice_data.get('choix', []),
+            "reponse_correcte": exercice_data.get('reponse_correcte', ''),
+            "explication": exercice_data.get('explication', ''),
+            "indice": exercice_data.get('indice', '')
+        }
+    return {
+        "type": type_ex,
+        "enonce": exercice_data.get('enonce', ''),
+        "solution": exercice_data.get('solution', ''),
+        "utilise_input": exercice_data.get('utilise_input', False),
+        "cas_test": exercice_data.get('cas_test', []),
+        "mots_cles": exercice_data.get('mots_cles', [])
     }
-]
-    response = ollama.chat(model='qwen2.5-coder:14b', messages = messages)
-    exercice_ia = response['message']['content'].strip()
+
+
+def _exercice_valide(exercice):
+    """Vérifie qu'un exercice généré est exploitable (énoncé, solution ou choix, tests)"""
+    if not isinstance(exercice.get('enonce'), str) or not exercice['enonce'].strip():
+        return False
+    if exercice['type'] == 'qcm':
+        choix = exercice.get('choix')
+        return isinstance(choix, list) and len(choix) >= 2 and exercice.get('reponse_correcte') in choix
+    if not isinstance(exercice.get('solution'), str) or not exercice['solution'].strip():
+        return False
+    cas_test = exercice.get('cas_test')
+    return isinstance(cas_test, list) and all(isinstance(cas, dict) for cas in cas_test)
+
+
+def _appeler_llm_generation(contenu, mesure):
+    return obtenir_client_llm().chat([{'role': 'user', 'content': contenu}], mesure=mesure).strip()
+
+
+def _generer_exercice_llm(niveau, theme, domaine, role, type_ex):
+    """Appel au LLM, parsing de la réponse et ajout à la banque"""
+    
+    cle_banque = f"{domaine}:{theme}"
+    with mesurer_appel_llm('generation') as mesure:
+        # Compté à 0 tant que rien n'est produit : un appel en erreur coûte aussi
+        mesure['exercices'] = 0
+        exercice_ia = _appeler_llm_generation(_prompt_generation(niveau, theme, role, type_ex), mesure)
+        exercice = _exercice_depuis_reponse(exercice_ia, type_ex, mesure)
+        # Le repli (texte brut sans tests) ne compte pas comme exercice produit
+        mesure['exercices'] = 1 if mesure['resultat'] == 'analyse' else 0
+    
+    ajouter_exercice_banque(cle_banque, niveau, exercice)
     
-    # Parser le JSON
-    import json
+    return exercice
+
+
+def _exercice_depuis_reponse(exercice_ia, type_ex, mesure):
+    """Parse la réponse du modèle ; à défaut, exercice texte sans tests (résultat noté dans la mesure)"""
     try:
-        # Extraire le JSON si entouré de ```
-        if '```json' in exercice_ia:
-            exercice_ia = exercice_ia.split('```json')[1].split('```')[0].strip()
-        elif '```' in exercice_ia:
-            exercice_ia = exercice_ia.split('```')[1].split('```')[0].strip()
-        
-        exercice_data = json.loads(exercice_ia)
-        
-        # Différencier CODE et QCM
-        if type_ex == 'qcm':
-            exercice = {
-                "type": "qcm",
-                "enonce": exercice_data.get('enonce', ''),
-                "choix": exercice_data.get('choix', []),
-                "reponse_correcte": exercice_data.get('reponse_correcte', ''),
-                "explication": exercice_data.get('explication', ''),
-                "indice": exercice_data.get('indice', '')
-            }
-        else:
-            exercice = {
-                "type": type_ex,
-                "enonce": exercice_data.get('enonce', ''),
-                "solution": exercice_data.get('solution', ''),
-                "utilise_input": exercice_data.get('utilise_input', False),
-                "cas_test": exercice_data.get('cas_test', []),
-                "mots_cles": exercice_data.get('mots_cles', [])
-            }
-    except (json.JSONDecodeError, KeyError) as e:
+        exercice = _construire_exercice(_extraire_json(exercice_ia), type_ex)
+        mesure['resultat'] = 'analyse'
+        return exercice
+    except (json.JSONDecodeError, KeyError, AttributeError) as e:
         print(f"Erreur parsing JSON IA: {e}")
+        mesure['resultat'] = 'repli'
         # Fallback : exercice simple sans tests
-        exercice = {
+        return {
             "type": type_ex,
             "enonce": exercice_ia,
             "solution": "",
@@ -215,10 +376,59 @@ Réponds UNIQUEMENT avec le JSON, rien d'autre.'''
             "cas_test": [],
             "mots_cles": []
         }
+
+
+def _exercices_valides_lot(donnees, type_ex):
+    """Exercices valides d'une réponse de lot, avec ID, sans doublons"""
+    exercices = []
+    ids = set()
+    for exercice_data in donnees:
+        if not isinstance(exercice_data, dict):
+            continue
+        exercice = _construire_exercice(exercice_data, type_ex)
+        if not _exercice_valide(exercice):
+            continue
+        attribuer_identifiant(exercice)
+        if exercice['id'] in ids:
+            continue
+        ids.add(exercice['id'])
+        exercices.append(exercice)
+    return exercices
+
+
+def _generer_lot_llm(niveau, theme, domaine, role, type_ex, nombre):
+    """Appel au LLM pour un lot, validation individuelle et insertion groupée"""
     
-    ajouter_exercice_banque(cle_banque, niveau, exercice)
+    with mesurer_appel_llm('generation_lot') as mesure:
+        mesure['exercices'] = 0
+        reponse = _appeler_llm_generation(_prompt_generation(niveau, theme, role, type_ex, nombre), mesure)
+        try:
+            donnees = _extraire_json(reponse)
+            mesure['resultat'] = 'analyse'
+        except json.JSONDecodeError as e:
+            print(f"Erreur parsing JSON IA (lot): {e}")
+            mesure['resultat'] = 'repli'
+            donnees = []
+        if isinstance(donnees, dict):
+            # Un seul objet, ou {"exercices": [...]}
+            donnees = donnees.get('exercices', [donnees])
+        if not isinstance(donnees, list):
+            donnees = []
+        exercices = _exercices_valides_lot(donnees, type_ex)
+        # Exercices exploitables : coût par exercice comparable à 'generation'
+        mesure['exercices'] = len(exercices)
+    
+    ajoutes = 0
+    if exercices:
+        ajoutes = obtenir_moteur_stockage().ajouter_exercices(f"{domaine}:{theme}", str(niveau), exercices)
     
-    return exercice
+    return {
+        'demandes': nombre,
+        'recus': len(donnees),
+        'valides': len(exercices),
+        'ajoutes': ajoutes,
+        'exercices': exercices
+    }
 
 
 
@@ -276,58 +486,39 @@ def verifier_reponse_optimisee(exercice, code_utilisateur):
     if cas_test and len(cas_test) > 0:
         print("[Vérification automatique - SANS IA]")
         
-        # Prendre le premier cas de test
-        test = cas_test[0]
-        inputs_prevus = test.get('inputs', [])
-        output_attendu = test.get('output_attendu', '')
-        
         try:
-            # Exécuter le code avec les inputs mockés
-            resultat = executer_code_securise(code_utilisateur, inputs_prevus)
+            # Exécuter tous les cas de test en un seul job sandbox
+            resultat = executer_cas_test(code_utilisateur, cas_test)
             
-            if not resultat['success']:
-                # SANITISER l'erreur pour ne pas révéler la solution
-                erreur_brute = resultat.get('error', '')
-                # Retirer les chemins de fichiers et infos sensibles
-                erreur_sanitisee = erreur_brute.split('\n')[-1] if '\n' in erreur_brute else erreur_brute
-                return False, f"INCORRECT: Erreur d'exécution. {erreur_sanitisee}"
-            
-            output_utilisateur = resultat.get('output', '').strip()
+            if 'cas' not in resultat:
+                # Code refusé avant exécution (import dangereux, taille...)
+                return False, f"INCORRECT: Erreur d'exécution. {resultat.get('error', '')}"
             
-            # COMPARAISON INTELLIGENTE (tolérance ordre, espaces, casse)
-            output_attendu_norm = output_attendu.strip().lower()
-            output_utilisateur_norm = output_utilisateur.strip().lower()
-            
-            # Méthode 1 : Comparaison exacte (normalizée)
-            if output_attendu_norm == output_utilisateur_norm:
+            if resultat['success']:
+                if resultat['total'] > 1:
+                    return True, f"CORRECT: Bravo ! Votre code passe les {resultat['total']} cas de test."
                 return True, "CORRECT: Bravo ! Votre code fonctionne parfaitement."
             
-            # Méthode 2 : Comparaison par contenu (toutes les infos présentes)
-            # Extraire les nombres et mots importants
-            import re
-            nombres_attendus = set(re.findall(r'\d+\.?\d*', output_attendu_norm))
-            nombres_utilisateur = set(re.findall(r'\d+\.?\d*', output_utilisateur_norm))
+            # Premier cas en échec
+            numero, cas = next((i, cas) for i, cas in enumerate(resultat['cas'], 1) if not cas['reussi'])
+            precision = f" (cas {numero}/{resultat['total']})" if resultat['total'] > 1 else ""
             
-            mots_attendus = set(re.findall(r'\b[a-z]+\b', output_attendu_norm))
-            mots_utilisateur = set(re.findall(r'\b[a-z]+\b', output_utilisateur_norm))
+            if not cas['success']:
+                # SANITISER l'erreur pour ne pas révéler la solution
+                erreur_brute = cas['error']
+                # Retirer les chemins de fichiers et infos sensibles
+                erreur_sanitisee = erreur_brute.split('\n')[-1] if '\n' in erreur_brute else erreur_brute
+                return False, f"INCORRECT: Erreur d'exécution{precision}. {erreur_sanitisee}"
             
-            # Vérifier que tous les nombres et mots-clés importants sont présents
-            if nombres_attendus.issubset(nombres_utilisateur) and len(mots_attendus.intersection(mots_utilisateur)) >= len(mots_attendus) * 0.7:
-                return True, "CORRECT: Bravo ! Votre code produit le bon résultat."
+            # Vérifier les mots-clés si présents
+            mots_cles = exercice.get('mots_cles', [])
+            code_lower = code_utilisateur.lower()
+            mots_manquants = [mot for mot in mots_cles if mot.lower() not in code_lower]
             
-            # Méthode 3 : Vérifier si output contient les informations essentielles
-            if output_attendu_norm in output_utilisateur_norm or output_utilisateur_norm in output_attendu_norm:
-                return True, "CORRECT: Bravo ! Votre code fonctionne parfaitement."
+            if mots_manquants:
+                return False, f"INCORRECT: Votre code ne produit pas le résultat attendu{precision}. Indice : Utilisez {', '.join(mots_manquants[:2])}"
             else:
-                # Vérifier les mots-clés si présents
-                mots_cles = exercice.get('mots_cles', [])
-                code_lower = code_utilisateur.lower()
-                mots_manquants = [mot for mot in mots_cles if mot.lower() not in code_lower]
-                
-                if mots_manquants:
-                    return False, f"INCORRECT: Votre code ne produit pas le résultat attendu. Indice : Utilisez {', '.join(mots_manquants[:2])}"
-                else:
-                    return False, f"INCORRECT: Le résultat affiché n'est pas correct. Attendu: '{output_attendu}'"
+                return False, f"INCORRECT: Le résultat affiché n'est pas correct{precision}. Attendu: '{cas['output_attendu']}'"
                     
         except Exception as e:
             return False, f"INCORRECT: Erreur lors de l'exécution. {str(e)}"
@@ -359,8 +550,89 @@ def verifier_reponse_optimisee(exercice, code_utilisateur):
         return None, None  # Signal pour appeler verifier_reponse() classique
 
 
-def verifier_reponse(exercice, reponse_utilisateur, domaine='python'):
-    """ Cette fonction permet de verifier la reponse de l'utilisateur"""
+def verifier_reponse(exercice, reponse_utilisateur, domaine='python', exercice_id=None):
+    """
+    Cette fonction permet de verifier la reponse de l'utilisateur
+    
+    Le verdict de l'IA est mis en cache (cache_verdicts) : une réponse
+    identique aux espaces et commentaires près ne rappelle pas le LLM.
+    
+    Args:
+        exercice: Énoncé de l'exercice
+        reponse_utilisateur: Réponse de l'élève
+        domaine: Domaine
+        exercice_id: ID de l'exercice dans la banque (clé de cache plus stable que l'énoncé)
+    """
+    cache = obtenir_cache_verdicts()
+    if cache is None:
+        return _verifier_reponse_llm(exercice, reponse_utilisateur, domaine)
+    
+    cle = cle_verdict(exercice, reponse_utilisateur, domaine, exercice_id)
+    verdict = cache.obtenir(cle)
+    if verdict is not None:
+        return verdict
+    
+    def verifier():
+        verdict = _verifier_reponse_llm(exercice, reponse_utilisateur, domaine)
+        cache.enregistrer(cle, verdict)
+        return verdict
+    
+    return _verifications_en_cours.executer(cle, verifier)
+
+
+def obtenir_stats_cache_verdicts():
+    """Statistiques du cache de verdicts (dont le taux de succès), None si désactivé"""
+    cache = obtenir_cache_verdicts()
+    return cache.stats() if cache is not None else None
+
+
+def verifier_reponse_flux(exercice, reponse_utilisateur, domaine='python', exercice_id=None):
+    """
+    Variante de verifier_reponse qui produit des événements au fil de la correction
+    
+    Événements : {'type': 'source', 'source': 'cache' | 'ia'},
+    {'type': 'token', 'texte': ...} puis {'type': 'verdict', 'message': ...}.
+    Le verdict complet est mis en cache comme avec verifier_reponse.
+    """
+    cache = obtenir_cache_verdicts()
+    cle = cle_verdict(exercice, reponse_utilisateur, domaine, exercice_id) if cache is not None else None
+    verdict = cache.obtenir(cle) if cache is not None else None
+    if verdict is not None:
+        yield {'type': 'source', 'source': 'cache'}
+        yield {'type': 'verdict', 'message': verdict}
+        return
+    
+    yield {'type': 'source', 'source': 'ia'}
+    fragments = []
+    messages = _messages_verification(exercice, reponse_utilisateur, domaine)
+    with mesurer_appel_llm('verification_flux') as mesure:
+        for fragment in obtenir_client_llm().chat_flux(messages, mesure=mesure):
+            fragments.append(fragment)
+            yield {'type': 'token', 'texte': fragment}
+        verdict = ''.join(fragments)
+        mesure['resultat'] = _resultat_verdict(verdict)
+    
+    if cache is not None:
+        cache.enregistrer(cle, verdict)
+    yield {'type': 'verdict', 'message': verdict}
+
+
+def _verifier_reponse_llm(exercice, reponse_utilisateur, domaine):
+    """Demande le verdict au LLM"""
+    with mesurer_appel_llm('verification') as mesure:
+        verdict = obtenir_client_llm().chat(_messages_verification(exercice, reponse_utilisateur, domaine), mesure=mesure)
+        mesure['resultat'] = _resultat_verdict(verdict)
+    return verdict
+
+
+def _resultat_verdict(verdict):
+    """'analyse' si le verdict suit le format demandé, 'repli' sinon (compté comme incorrect)"""
+    debut = verdict.strip().lstrip('*"\'').upper()
+    return 'analyse' if debut.startswith(('CORRECT', 'INCORRECT')) else 'repli'
+
+
+def _messages_verification(exercice, reponse_utilisateur, domaine):
+    """Prompt de correction pour le domaine"""
     
     # Obtenir la config IA du domaine
     if obtenir_config_ia:
@@ -406,8 +678,7 @@ Réponse (15 mots max) :
     }
 ]
     
-    correction = ollama.chat(model='qwen2.5-coder:14b', messages = messages)
-    return correction['message']['content']
+    return messages
     
 
 
@@ -527,9 +798,8 @@ def mode_sujet_libre():
 
 # ==================== VALIDATION SÉCURISÉE DU CODE ====================
 
-import signal
-from contextlib import redirect_stdout, redirect_stderr
-from io import StringIO
+from modules.core.cache_compilation import verdict_en_cache
+from modules.core.sandbox import executer_appels_en_sandbox, executer_en_sandbox, executer_lot_en_sandbox
 
 # ============================================================================
 # SECURITY NOTE: Software Sandbox Active (Blacklist-based)
@@ -541,7 +811,9 @@ from io import StringIO
 # Current protections:
 # - Blocked imports: os, sys, subprocess, socket, file operations
 # - Blocked functions: eval(), exec(), compile(), open(), __import__()
-# - Execution timeout: 2 seconds default
+# - Execution timeout: 2 seconds default, in a pre-started worker process
+#   killed and replaced when it overruns (modules/core/sandbox.py)
+# - Worker limits: RLIMIT_CPU per job, RLIMIT_AS (SANDBOX_MEMORY_MB)
 # - Memory limit: 50KB code size
 # - Recursion limit: 100 levels
 # ============================================================================
@@ -555,14 +827,6 @@ IMPORTS_INTERDITS = [
     'pickle', 'shelve', 'tempfile', 'glob', 'fnmatch'
 ]
 
-class TimeoutException(Exception):
-    """Exception levée en cas de timeout"""
-    pass
-
-def timeout_handler(signum, frame):
-    """Handler pour le timeout (Linux/Mac uniquement)"""
-    raise TimeoutException("Timeout : Le code prend trop de temps")
-
 def verifier_code_dangereux(code):
     """
     Vérifie si le code contient des imports ou instructions dangereux
@@ -603,41 +867,23 @@ def verifier_code_dangereux(code):
     
     return True, ""
 
-def executer_code_securise(code, timeout_secondes=2, test_inputs=None):
+def _refuser_code(code):
     """
-    Exécute du code Python de manière sécurisée avec restrictions renforcées
-    
-    ⚠️ SECURITY NOTICE:
-    This is a SOFTWARE SANDBOX using blacklist filtering. While suitable for
-    educational purposes with trusted users, production deployment requires
-    hardware-level isolation (Docker containers). See ROADMAP_V2.md.
-    
-    AMÉLIORATIONS DE SÉCURITÉ v2.0 :
-    - Timeout strict réduit à 2 secondes par défaut
-    - Gestion améliorée des timeouts avec cleanup
-    - Capture spécifique des erreurs de mémoire
-    - Messages d'erreur plus clairs et sécurisés
-    - Support pour input() simulé avec valeurs de test
-    
-    Args:
-        code (str): Le code Python à exécuter
-        timeout_secondes (int): Temps maximum d'exécution (défaut 2s)
-        test_inputs (list): Liste de valeurs à retourner pour input() (défaut ["30", "175.5"])
+    Contrôles statiques avant exécution, verdict gardé dans le cache de
+    compilation (voir _controler_code)
     
     Returns:
-        dict: {
-            'success': bool,
-            'output': str (stdout),
-            'error': str (stderr ou message d'erreur),
-            'timeout': bool,
-            'execution_time': float (temps d'exécution en secondes)
-        }
+        dict: Résultat d'échec au format de executer_code_securise, ou None si le code est accepté
     """
-    import threading
-    import time
-    
-    start_time = time.time()
+    return verdict_en_cache(code, _controler_code)
+
+def _controler_code(code):
+    """
+    Contrôles statiques avant exécution (imports dangereux, taille, boucles)
     
+    Returns:
+        dict: Résultat d'échec au format de executer_code_securise, ou None si le code est accepté
+    """
     # Vérifier les imports dangereux
     safe, message = verifier_code_dangereux(code)
     if not safe:
@@ -671,173 +917,160 @@ def executer_code_securise(code, timeout_secondes=2, test_inputs=None):
             'execution_time': 0
         }
     
-    # Vérifier la profondeur de récursion
-    recursion_limit_changed = False
-    if 'def ' in code:
-        # Limiter la profondeur de récursion
-        import sys
-        old_limit = sys.getrecursionlimit()
-        sys.setrecursionlimit(100)  # Maximum 100 niveaux
-        recursion_limit_changed = True
+    return None
+
+def executer_code_securise(code, timeout_secondes=2, test_inputs=None):
+    """
+    Exécute du code Python de manière sécurisée avec restrictions renforcées
+    
+    ⚠️ SECURITY NOTICE:
+    This is a SOFTWARE SANDBOX using blacklist filtering. While suitable for
+    educational purposes with trusted users, production deployment requires
+    hardware-level isolation (Docker containers). See ROADMAP_V2.md.
+    
+    AMÉLIORATIONS DE SÉCURITÉ v2.0 :
+    - Timeout strict réduit à 2 secondes par défaut
+    - Gestion améliorée des timeouts avec cleanup
+    - Capture spécifique des erreurs de mémoire
+    - Messages d'erreur plus clairs et sécurisés
+    - Support pour input() simulé avec valeurs de test
+    - Exécution dans un processus du pool sandbox (RLIMIT_CPU/RLIMIT_AS),
+      tué et remplacé s'il dépasse l'échéance (voir modules/core/sandbox.py)
+    
+    Args:
+        code (str): Le code Python à exécuter
+        timeout_secondes (int): Temps maximum d'exécution (défaut 2s)
+        test_inputs (list): Liste de valeurs à retourner pour input() (défaut ["30", "175.5"])
+    
+    Returns:
+        dict: {
+            'success': bool,
+            'output': str (stdout),
+            'error': str (stderr ou message d'erreur),
+            'timeout': bool,
+            'execution_time': float (temps d'exécution en secondes)
+        }
+    """
+    import time
+    
+    start_time = time.time()
     
-    # Préparer la capture des outputs
-    stdout_capture = StringIO()
-    stderr_capture = StringIO()
+    refus = _refuser_code(code)
+    if refus is not None:
+        return refus
     
-    # Créer une fonction input() simulée avec des valeurs de test
     if test_inputs is None:
         test_inputs = ["30", "175.5"]  # Valeurs de test par défaut
-    input_index = [0]  # Liste pour pouvoir modifier dans la closure
-    
-    def mock_input(prompt=""):
-        """Fonction input() simulée qui retourne des valeurs prédéfinies"""
-        if prompt:
-            print(prompt, end='')
-        if input_index[0] < len(test_inputs):
-            value = test_inputs[input_index[0]]
-            input_index[0] += 1
-            print(value)  # Afficher la valeur comme si l'utilisateur l'avait saisie
-            return value
-        return ""
-    
-    # Créer un environnement restreint (whitelist de fonctions autorisées)
-    environnement = {
-        '__builtins__': {
-            'print': print,
-            'input': mock_input,  # Ajouter input() simulé
-            'len': len,
-            'range': range,
-            'str': str,
-            'int': int,
-            'float': float,
-            'bool': bool,
-            'list': list,
-            'dict': dict,
-            'tuple': tuple,
-            'set': set,
-            'True': True,
-            'False': False,
-            'None': None,
-            'sum': sum,
-            'max': max,
-            'min': min,
-            'abs': abs,
-            'round': round,
-            'enumerate': enumerate,
-            'zip': zip,
-            'map': map,
-            'filter': filter,
-            'sorted': sorted,
-            'reversed': reversed,
-            'any': any,
-            'all': all,
-            'type': type,
-            'isinstance': isinstance,
-            'chr': chr,
-            'ord': ord,
-            'pow': pow,
-            'divmod': divmod,
+    
+    # Exécution dans un worker du pool (tué et remplacé s'il dépasse l'échéance)
+    result = executer_en_sandbox(code, test_inputs, timeout_secondes)
+    
+    # Ajouter le temps d'exécution au résultat
+    result['execution_time'] = time.time() - start_time
+    
+    return result
+
+def executer_cas_test(code, cas_test, timeout_secondes=2):
+    """
+    Exécute le code pour tous les cas de test d'un exercice en un seul job sandbox
+    
+    Le code est contrôlé et compilé une fois, puis exécuté pour chaque
+    vecteur d'inputs (les grandes suites sont réparties entre les workers).
+    
+    Args:
+        code (str): Le code Python de l'élève
+        cas_test (list): [{'inputs': [...], 'output_attendu': str}, ...]
+        timeout_secondes (int): Temps maximum par cas
+    
+    Returns:
+        dict: {
+            'success': bool (tous les cas réussis),
+            'reussis': int,
+            'total': int,
+            'cas': list de {'inputs', 'output_attendu', 'success' (exécution sans
+                            erreur), 'output', 'error', 'timeout', 'reussi',
+                            'execution_time'},
+            'execution_time': float
         }
-    }
+        ou le résultat d'échec de executer_code_securise si le code est refusé
+    """
+    import time
+    
+    start_time = time.time()
+    
+    refus = _refuser_code(code)
+    if refus is not None:
+        return refus
+    
+    resultats = executer_lot_en_sandbox(code, [cas.get('inputs', []) for cas in cas_test], timeout_secondes)
     
-    # Variable pour stocker le résultat de l'exécution
-    result = {
-        'success': False, 
-        'output': '', 
-        'error': 'Execution Timeout', 
-        'timeout': True,
-        'execution_time': 0
+    details = []
+    for cas, resultat in zip(cas_test, resultats):
+        output_attendu = cas.get('output_attendu', '')
+        details.append({
+            'inputs': cas.get('inputs', []),
+            'output_attendu': output_attendu,
+            'success': resultat['success'],
+            'output': resultat['output'],
+            'error': resultat['error'],
+            'timeout': resultat['timeout'],
+            'reussi': resultat['success'] and sortie_correcte(output_attendu, resultat['output']),
+            'execution_time': resultat['execution_time']
+        })
+    
+    reussis = sum(1 for cas in details if cas['reussi'])
+    return {
+        'success': reussis == len(details),
+        'reussis': reussis,
+        'total': len(details),
+        'cas': details,
+        'execution_time': time.time() - start_time
     }
+
+def sortie_correcte(output_attendu, output_utilisateur):
+    """
+    Compare la sortie du code à la sortie attendue (tolérance ordre, espaces, casse)
     
-    execution_exception = None
+    Returns:
+        bool: True si la sortie est acceptée
+    """
+    import re
     
-    def execute_code():
-        """Fonction qui exécute le code dans un thread"""
-        nonlocal result, execution_exception
-        try:
-            with redirect_stdout(stdout_capture), redirect_stderr(stderr_capture):
-                exec(code, environnement)
-            
-            result = {
-                'success': True,
-                'output': stdout_capture.getvalue(),
-                'error': stderr_capture.getvalue(),
-                'timeout': False,
-                'execution_time': 0  # Sera mis à jour après
-            }
-        except RecursionError as e:
-            execution_exception = e
-            result = {
-                'success': False,
-                'output': stdout_capture.getvalue(),
-                'error': 'RecursionError: Recursion trop profonde (maximum 100 niveaux)',
-                'timeout': False,
-                'execution_time': 0
-            }
-        except MemoryError as e:
-            execution_exception = e
-            result = {
-                'success': False,
-                'output': stdout_capture.getvalue(),
-                'error': 'MemoryError: Memoire insuffisante - Votre code consomme trop de RAM',
-                'timeout': False,
-                'execution_time': 0
-            }
-        except KeyboardInterrupt:
-            result = {
-                'success': False,
-                'output': stdout_capture.getvalue(),
-                'error': 'Execution interrompue',
-                'timeout': True,
-                'execution_time': 0
-            }
-        except Exception as e:
-            execution_exception = e
-            result = {
-                'success': False,
-                'output': stdout_capture.getvalue(),
-                'error': f'Erreur d\'execution : {type(e).__name__}: {str(e)}',
-                'timeout': False,
-                'execution_time': 0
-            }
-    
-    # Exécuter dans un thread avec timeout strict
-    thread = threading.Thread(target=execute_code, daemon=True)
-    thread.start()
-    thread.join(timeout=timeout_secondes)
-    
-    # Calculer le temps d'exécution
-    execution_time = time.time() - start_time
-    
-    # Restaurer la limite de récursion si changée
-    if recursion_limit_changed:
-        import sys
-        sys.setrecursionlimit(old_limit)
-    
-    # Vérifier si le thread est toujours actif (timeout)
-    if thread.is_alive():
-        # Thread toujours actif = timeout
-        return {
-            'success': False,
-            'output': stdout_capture.getvalue(),
-            'error': f'Execution Timed Out: Votre code a depasse le temps maximum autorise ({timeout_secondes}s). Verifiez les boucles infinies.',
-            'timeout': True,
-            'execution_time': execution_time
-        }
+    output_attendu_norm = output_attendu.strip().lower()
+    output_utilisateur_norm = output_utilisateur.strip().lower()
     
-    # Ajouter le temps d'exécution au résultat
-    result['execution_time'] = execution_time
+    # Méthode 1 : Comparaison exacte (normalizée)
+    if output_attendu_norm == output_utilisateur_norm:
+        return True
     
-    return result
+    # Méthode 2 : Comparaison par contenu (toutes les infos présentes)
+    # Extraire les nombres et mots importants
+    nombres_attendus = set(re.findall(r'\d+\.?\d*', output_attendu_norm))
+    nombres_utilisateur = set(re.findall(r'\d+\.?\d*', output_utilisateur_norm))
+    
+    mots_attendus = set(re.findall(r'\b[a-z]+\b', output_attendu_norm))
+    mots_utilisateur = set(re.findall(r'\b[a-z]+\b', output_utilisateur_norm))
+    
+    # Vérifier que tous les nombres et mots-clés importants sont présents
+    if nombres_attendus.issubset(nombres_utilisateur) and len(mots_attendus.intersection(mots_utilisateur)) >= len(mots_attendus) * 0.7:
+        return True
+    
+    # Méthode 3 : Vérifier si output contient les informations essentielles
+    return output_attendu_norm in output_utilisateur_norm or output_utilisateur_norm in output_attendu_norm
 
-def verifier_avec_tests(code, tests):
+def verifier_avec_tests(code, tests, timeout_secondes=2):
     """
     Vérifie le code avec une liste de tests
     
+    Le code est compilé et exécuté une seule fois dans un worker de la
+    sandbox, puis chaque appel est évalué dans l'espace de noms obtenu,
+    avec sa propre échéance de timeout_secondes.
+    
     Args:
         code (str): Le code de l'utilisateur (doit définir des fonctions)
         tests (list): Liste de tuples (appel_fonction, resultat_attendu)
             Exemple: [("fonction(5)", 10), ("fonction(3)", 6)]
+        timeout_secondes (float): Échéance de l'exécution du code, puis de chaque appel
         
     Returns:
         dict: {
@@ -847,68 +1080,24 @@ def verifier_avec_tests(code, tests):
             'details': list
         }
     """
-    # Exécuter le code d'abord pour définir les fonctions
-    resultat = executer_code_securise(code)
+    appels = [(test_input, expected) for test_input, expected in tests]
     
-    if not resultat['success']:
+    # Les expressions d'appel passent par le même filtre que le code
+    refus = _refuser_code(code) or _refuser_code('\n'.join(test_input for test_input, _ in appels))
+    if refus is None:
+        resultat = executer_appels_en_sandbox(code, appels, timeout_secondes)
+        refus = None if resultat['corps']['success'] else resultat['corps']
+    
+    if refus is not None:
         return {
             'success': False,
             'tests_reussis': 0,
             'tests_total': len(tests),
-            'details': [{'erreur': resultat['error']}]
+            'details': [{'erreur': refus['error']}]
         }
     
-    # Récupérer l'environnement avec les fonctions définies
-    env = resultat.get('environnement', {})
-    
-    # Exécuter chaque test
-    tests_reussis = 0
-    details = []
-    
-    for i, (test_input, expected) in enumerate(tests):
-        try:
-            # Créer le code de test qui évalue l'expression
-            code_test = code + f"\n__test_result__ = {test_input}"
-            resultat_test = executer_code_securise(code_test)
-            
-            if resultat_test['success']:
-                # Récupérer le résultat du test
-                result = resultat_test.get('environnement', {}).get('__test_result__')
-                
-                if result == expected:
-                    tests_reussis += 1
-                    details.append({
-                        'test': i + 1,
-                        'input': test_input,
-                        'expected': expected,
-                        'got': result,
-                        'success': True
-                    })
-                else:
-                    details.append({
-                        'test': i + 1,
-                        'input': test_input,
-                        'expected': expected,
-                        'got': result,
-                        'success': False,
-                        'error': f'Attendu: {expected}, Obtenu: {result}'
-                    })
-            else:
-                details.append({
-                    'test': i + 1,
-                    'input': test_input,
-                    'expected': expected,
-                    'success': False,
-                    'error': resultat_test['error']
-                })
-        except Exception as e:
-            details.append({
-                'test': i + 1,
-                'input': test_input,
-                'expected': expected,
-                'success': False,
-                'error': f'Exception lors du test: {str(e)}'
-            })
+    details = resultat['details']
+    tests_reussis = sum(1 for detail in details if detail['success'])
     
     return {
         'success': tests_reussis == len(tests),
@@ -917,7 +1106,7 @@ def verifier_avec_tests(code, tests):
         'details': details
     }
 
-def tester_fonction(code, nom_fonction, tests):
+def tester_fonction(code, nom_fonction, tests, timeout_secondes=2):
     """
     Teste une fonction définie dans le code avec plusieurs cas de test
     
@@ -926,19 +1115,21 @@ def tester_fonction(code, nom_fonction, tests):
         nom_fonction (str): Le nom de la fonction à tester
         tests (list): Liste de tuples (args, expected)
             Exemple: [((5,), 25), ((3,), 9)] pour tester carre(5) et carre(3)
+        timeout_secondes (float): Échéance de l'exécution du code, puis de chaque appel
     
     Returns:
         dict: Résultat des tests avec détails
     """
     # Convertir les tests au format attendu par verifier_avec_tests
+    # (repr : une chaîne reste une chaîne, ex: compter("abc"))
     tests_formatte = []
     for args, expected in tests:
         if isinstance(args, tuple):
-            args_str = ', '.join(str(arg) for arg in args)
+            args_str = ', '.join(repr(arg) for arg in args)
         else:
-            args_str = str(args)
+            args_str = repr(args)
         appel = f"{nom_fonction}({args_str})"
         tests_formatte.append((appel, expected))
     
-    return verifier_avec_tests(code, tests_formatte)
+    return verifier_avec_tests(code, tests_formatte, timeout_secondes)
 
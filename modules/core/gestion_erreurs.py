@@ -128,10 +128,11 @@ def verifier_fichier_json(chemin_fichier, creer_si_absent=False, contenu_defaut=
     
     # Vérifier que c'est un JSON valide
     try:
-        with open(chemin_fichier, 'r', encoding='utf-8') as f:
-            json.load(f)
+        from modules.core.file_lock import deserialiser_donnees
+        with open(chemin_fichier, 'rb') as f:
+            deserialiser_donnees(f.read())
         return True
-    except json.JSONDecodeError as e:
+    except ValueError as e:
         log_erreur(f"JSON invalide dans {chemin_fichier}", e)
         return False
     except Exception as e:
@@ -233,14 +234,17 @@ def verifier_integrite_systeme():
     
     # Vérifier les fichiers JSON
     verifier_fichier_json('progression_utilisateur.json', creer_si_absent=True)
-    verifier_fichier_json('banque_exercices.json', creer_si_absent=False)
+    if os.path.exists(os.path.join('banque', 'manifest.json')):
+        verifier_fichier_json(os.path.join('banque', 'manifest.json'), creer_si_absent=False)
+    else:
+        verifier_fichier_json('banque_exercices.json', creer_si_absent=False)
     
-    # Vérifier Ollama (optionnel, ne pas bloquer)
-    try:
-        import ollama
-        log_info("Module ollama disponible")
-    except ImportError:
-        log_avertissement("Module ollama non disponible (IA desactivee)", afficher=True)
+    # Client LLM (optionnel, ne pas bloquer)
+    from modules.core.client_llm import CONFIG_LLM
+    if CONFIG_LLM['backend'] == 'simule':
+        log_avertissement("Backend LLM simule (reponses deterministes, sans modele)", afficher=True)
+    else:
+        log_info(f"Backend LLM {CONFIG_LLM['backend']} ({CONFIG_LLM['hote']}, modele {CONFIG_LLM['modele']})")
     
     if problemes:
         log_erreur("Problemes detectes lors de la verification:")
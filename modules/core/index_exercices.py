@@ -0,0 +1,295 @@
+"""
+Index persistant des exercices de la banque JSON : id -> emplacement
+
+Sans index, obtenir_exercice_par_id charge toute la banque et parcourt
+chaque thème/niveau. L'index associe à chaque id :
+    [cle_banque, niveau, position, offset, longueur]
+où offset/longueur délimitent l'exercice en octets dans banque_exercices.json.
+Une recherche devient : os.stat + seek + lecture de l'exercice seul.
+
+L'index est validé par la signature (mtime_ns, taille, inode) du fichier de
+la banque : toute réécriture, y compris par un autre processus, le rend
+périmé et il est reconstruit. Il est sauvegardé à côté de la banque
+('<banque>.index.json') pour éviter un parcours complet au démarrage.
+
+Format binaire (JSON_STORAGE_FORMAT=binaire) : pas d'offset possible,
+l'index ne garde que (cle_banque, niveau, position).
+"""
+
+import json
+import os
+import re
+import threading
+from json.decoder import scanstring
+from typing import Any, Dict, List, Optional, Tuple
+
+from modules.core.file_lock import (
+    atomic_json_writer, safe_json_read, deserialiser_donnees,
+    declarer_durabilite, log_file_operation, MAGIC_BINAIRE
+)
+
+_ESPACES = re.compile(r'[ \t\n\r]*')
+
+
+def _signature(st: os.stat_result) -> List[int]:
+    return [st.st_mtime_ns, st.st_size, st.st_ino]
+
+
+def _reparer(texte: Any) -> Any:
+    """Chaîne lue en latin-1 -> chaîne UTF-8 d'origine"""
+    if not isinstance(texte, str):
+        return texte
+    try:
+        return texte.encode('latin-1').decode('utf-8')
+    except (UnicodeEncodeError, UnicodeDecodeError):
+        return texte
+
+
+class _Parcours:
+    """
+    Parcours de la banque {cle: {niveau: [exercice, ...]}} qui relève la
+    position en octets de chaque exercice
+
+    Le contenu est décodé en latin-1 (1 caractère = 1 octet) : les indices
+    de la chaîne sont donc directement des offsets dans le fichier.
+    """
+
+    def __init__(self, contenu: bytes):
+        self.texte = contenu.decode('latin-1')
+        self.decodeur = json.JSONDecoder()
+        self.entrees: Dict[str, list] = {}
+
+    def _sauter(self, i: int) -> int:
+        return _ESPACES.match(self.texte, i).end()
+
+    def _attendre(self, i: int, caractere: str) -> int:
+        i = self._sauter(i)
+        if self.texte[i:i + 1] != caractere:
+            raise ValueError(f"'{caractere}' attendu à l'offset {i}")
+        return i + 1
+
+    def _objet(self, i: int, traiter_valeur) -> int:
+        """Parcourt un objet JSON ; traiter_valeur(cle, i) retourne la fin de la valeur"""
+        i = self._sauter(self._attendre(i, '{'))
+        if self.texte[i:i + 1] == '}':
+            return i + 1
+        while True:
+            i = self._attendre(i, '"')
+            cle, i = scanstring(self.texte, i)
+            i = self._attendre(i, ':')
+            i = traiter_valeur(_reparer(cle), self._sauter(i))
+            i = self._sauter(i)
+            if self.texte[i:i + 1] == ',':
+                i += 1
+                continue
+            if self.texte[i:i + 1] == '}':
+                return i + 1
+            raise ValueError(f"',' ou '}}' attendu à l'offset {i}")
+
+    def _ignorer(self, i: int) -> int:
+        _, fin = self.decodeur.raw_decode(self.texte, i)
+        return fin
+
+    def _theme(self, cle_banque: str, i: int) -> int:
+        if self.texte[i:i + 1] != '{':
+            return self._ignorer(i)
+        return self._objet(i, lambda niveau, j: self._niveau(cle_banque, niveau, j))
+
+    def _niveau(self, cle_banque: str, niveau: str, i: int) -> int:
+        if self.texte[i:i + 1] != '[':
+            return self._ignorer(i)
+        i = self._sauter(i + 1)
+        if self.texte[i:i + 1] == ']':
+            return i + 1
+        position = 0
+        while True:
+            i = self._sauter(i)
+            exercice, fin = self.decodeur.raw_decode(self.texte, i)
+            if isinstance(exercice, dict) and exercice.get('id') is not None:
+                # Premier exercice rencontré pour un id, comme le parcours linéaire
+                self.entrees.setdefault(
+                    _reparer(exercice['id']), [cle_banque, niveau, position, i, fin - i]
+                )
+            position += 1
+            i = self._sauter(fin)
+            if self.texte[i:i + 1] == ',':
+                i += 1
+                continue
+            if self.texte[i:i + 1] == ']':
+                return i + 1
+            raise ValueError(f"',' ou ']' attendu à l'offset {i}")
+
+    def executer(self, cle_banque: Optional[str] = None) -> Dict[str, list]:
+        """Banque complète, ou shard {niveau: [...]} d'une seule clé si cle_banque est donnée"""
+        if cle_banque is None:
+            self._objet(0, self._theme)
+        else:
+            self._theme(cle_banque, self._sauter(0))
+        return self.entrees
+
+
+def _indexer_document(banque: Dict[str, Any]) -> Dict[str, list]:
+    """Index sans offsets à partir de la banque chargée"""
+    entrees: Dict[str, list] = {}
+    for cle_banque, niveaux in banque.items():
+        if not isinstance(niveaux, dict):
+            continue
+        for niveau, exercices in niveaux.items():
+            if not isinstance(exercices, list):
+                continue
+            for position, exercice in enumerate(exercices):
+                if isinstance(exercice, dict) and exercice.get('id') is not None:
+                    entrees.setdefault(exercice['id'], [cle_banque, niveau, position, None, None])
+    return entrees
+
+
+class IndexExercices:
+    """
+    Index id -> emplacement pour un fichier de banque JSON
+
+    Args:
+        chemin_banque: Fichier indexé
+        chemin_index: Fichier de l'index (défaut: '<banque>.index.json')
+        cle_banque: Si donnée, le fichier est le shard {niveau: [...]} de cette clé
+    """
+
+    def __init__(self, chemin_banque: str, chemin_index: Optional[str] = None,
+                 cle_banque: Optional[str] = None):
+        self.cle_banque = cle_banque
+        self.chemin_banque = os.path.abspath(chemin_banque)
+        self.chemin_index = chemin_index or os.path.splitext(self.chemin_banque)[0] + '.index.json'
+        self._lock = threading.Lock()
+        self._signature: Optional[List[int]] = None
+        self._entrees: Dict[str, list] = {}
+        # Reconstructible à tout moment : pas de fsync
+        declarer_durabilite(self.chemin_index, 'os')
+
+    # ------------------------------------------------------------------
+    # Construction
+    # ------------------------------------------------------------------
+
+    def _banque(self, contenu: Dict[str, Any]) -> Dict[str, Any]:
+        """Contenu du fichier vu comme une banque {cle: {niveau: [...]}}"""
+        return contenu if self.cle_banque is None else {self.cle_banque: contenu}
+
+    def _signature_banque(self) -> Optional[List[int]]:
+        try:
+            return _signature(os.stat(self.chemin_banque))
+        except OSError:
+            return None
+
+    def _charger_persiste(self, signature: List[int]) -> bool:
+        """Charge l'index sauvegardé s'il correspond à la banque actuelle"""
+        if not os.path.exists(self.chemin_index):
+            return False
+        try:
+            with safe_json_read(self.chemin_index) as donnees:
+                if donnees.get('signature') != signature:
+                    return False
+                self._entrees = donnees.get('entrees', {})
+                self._signature = signature
+                return True
+        except (IOError, ValueError):
+            return False
+
+    def _reconstruire(self):
+        """Parcourt la banque et sauvegarde le nouvel index (lock de l'index tenu)"""
+        try:
+            with open(self.chemin_banque, 'rb') as f:
+                signature = _signature(os.fstat(f.fileno()))
+                contenu = f.read()
+        except FileNotFoundError:
+            self._entrees, self._signature = {}, None
+            return
+
+        if contenu.startswith(MAGIC_BINAIRE):
+            entrees = _indexer_document(self._banque(deserialiser_donnees(contenu)))
+        else:
+            try:
+                entrees = _Parcours(contenu).executer(self.cle_banque)
+            except (ValueError, IndexError):
+                # Structure inattendue : index sans offsets
+                entrees = _indexer_document(self._banque(deserialiser_donnees(contenu)))
+
+        self._entrees, self._signature = entrees, signature
+        try:
+            with atomic_json_writer(self.chemin_index) as writer:
+                writer({'signature': signature, 'entrees': entrees})
+        except IOError as e:
+            log_file_operation("INDEX_EXERCICES", self.chemin_index, success=False, error=str(e))
+
+    def verifier(self) -> bool:
+        """
+        Met l'index à jour si la banque a changé (au démarrage, après un ajout)
+
+        Returns:
+            bool: True si l'index a dû être rechargé ou reconstruit
+        """
+        with self._lock:
+            signature = self._signature_banque()
+            if signature is not None and signature == self._signature:
+                return False
+            if signature is None or not self._charger_persiste(signature):
+                self._reconstruire()
+            return True
+
+    # ------------------------------------------------------------------
+    # Recherche
+    # ------------------------------------------------------------------
+
+    def _entree(self, exercice_id: str) -> Tuple[Optional[list], Optional[List[int]]]:
+        self.verifier()
+        with self._lock:
+            return self._entrees.get(exercice_id), self._signature
+
+    def obtenir(self, exercice_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Retourne l'exercice d'id donné, ou None s'il n'existe pas
+
+        Args:
+            exercice_id: ID de l'exercice
+        """
+        for _ in range(2):
+            entree, signature = self._entree(exercice_id)
+            if entree is None:
+                return None
+            cle_banque, niveau, position, offset, longueur = entree
+
+            if offset is None:
+                with safe_json_read(self.chemin_banque) as contenu:
+                    return self._banque(contenu)[cle_banque][niveau][position]
+
+            try:
+                with open(self.chemin_banque, 'rb') as f:
+                    # Le descripteur reste sur l'inode lu même si la banque
+                    # est remplacée entre-temps (os.replace)
+                    if _signature(os.fstat(f.fileno())) == signature:
+                        f.seek(offset)
+                        exercice = json.loads(f.read(longueur).decode('utf-8'))
+                        if isinstance(exercice, dict) and exercice.get('id') == exercice_id:
+                            return exercice
+            except (OSError, ValueError):
+                pass
+            # Banque modifiée entre la vérification et la lecture : on recommence
+        
+        # Dernier recours : parcours complet de la banque
+        with safe_json_read(self.chemin_banque) as contenu:
+            for niveaux in self._banque(contenu).values():
+                for exercices in niveaux.values():
+                    for exercice in exercices:
+                        if exercice.get('id') == exercice_id:
+                            return exercice
+        return None
+
+    def identifiants(self) -> List[str]:
+        """IDs indexés (état de la dernière vérification)"""
+        with self._lock:
+            return list(self._entrees)
+
+    def stats(self) -> Dict[str, Any]:
+        """Nombre d'exercices indexés et fraîcheur de l'index"""
+        with self._lock:
+            return {
+                'exercices': len(self._entrees),
+                'a_jour': self._signature is not None and self._signature == self._signature_banque()
+            }
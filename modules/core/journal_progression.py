@@ -0,0 +1,441 @@
+"""
+Journal d'événements de progression (append-only)
+
+Chaque utilisateur possède, à côté de son document de progression, un
+journal '<progression>.journal.jsonl' : une ligne JSON par événement
+(exercice tenté, XP gagnée, révision SRS, streak, entrée d'historique).
+
+Le document de progression devient un snapshot : l'état courant est
+reconstruit à la lecture en rejouant le journal sur le snapshot. Enregistrer
+un événement coûte donc O(1) au lieu de réécrire tout l'historique.
+Au-delà de PROGRESSION_JOURNAL_MAX_BYTES, un thread de fond replie le
+journal dans un nouveau snapshot (compaction).
+
+Cohérence snapshot / journal :
+- la première ligne du journal est un en-tête {'generation': ...}
+- le snapshot porte la même valeur dans 'journal_generation'
+- un journal dont la génération ne correspond pas au snapshot est périmé
+  (crash entre l'écriture du snapshot et la remise à zéro du journal) :
+  il est ignoré puis réinitialisé, ses événements étant déjà dans le snapshot
+
+Une progression chargée porte 'journal_generation' et 'journal_evenements'
+(nombre d'événements rejoués). Ces clés internes sont retirées par
+sans_position_journal avant d'exposer la progression (API, exports). Quand elle est réécrite en entier
+(ecrire_snapshot avec rejouer_recents), les événements ajoutés au journal
+depuis le chargement sont rejoués avant l'écriture. Le journal remplacé par
+un snapshot est gardé en '.1' pour retrouver ceux qu'un autre snapshot
+(compaction, autre sauvegarde) a repliés entre-temps.
+"""
+
+import json
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+from modules.core.file_lock import verrou_fichier, log_file_operation
+from modules.core.stockage import obtenir_moteur_stockage
+
+
+FORMAT_DATE = '%Y-%m-%d %H:%M:%S'
+
+# Taille du journal (octets) au-delà de laquelle une compaction est planifiée
+SEUIL_COMPACTION = int(os.getenv('PROGRESSION_JOURNAL_MAX_BYTES', str(256 * 1024)))
+
+# Position dans le journal portée par une progression chargée
+CLES_POSITION_JOURNAL = ('journal_generation', 'journal_evenements')
+
+_compactions_en_cours = set()
+_compactions_lock = threading.Lock()
+
+
+def chemin_journal(fichier_progression):
+    """Retourne le chemin du journal associé à un fichier de progression"""
+    base = os.path.splitext(os.path.abspath(fichier_progression))[0]
+    return base + '.journal.jsonl'
+
+
+def chemin_journal_precedent(fichier_progression):
+    """Retourne le chemin du journal remplacé par le dernier snapshot"""
+    return chemin_journal(fichier_progression) + '.1'
+
+
+def sans_position_journal(progression):
+    """Copie de la progression sans les clés internes du journal (pour l'API et les exports)"""
+    if progression is None:
+        return None
+    return {cle: valeur for cle, valeur in progression.items() if cle not in CLES_POSITION_JOURNAL}
+
+
+def creer_evenement(type_evenement, **donnees):
+    """
+    Crée un événement horodaté
+
+    La date est figée dans l'événement pour que le rejeu soit déterministe
+    (ex: prochaine date de révision SRS).
+    """
+    evenement = {'type': type_evenement, 'date': datetime.now().strftime(FORMAT_DATE)}
+    evenement.update(donnees)
+    return evenement
+
+
+# ============================================================================
+# APPLICATION DES ÉVÉNEMENTS
+# ============================================================================
+
+def _domaine(progression, domaine):
+    """Retourne la progression d'un domaine en la créant si nécessaire"""
+    domaines = progression.setdefault('domaines', {})
+    if domaine not in domaines:
+        domaines[domaine] = {
+            'niveau': 1,
+            'exercices_reussis': 0,
+            'exercices_totaux': 0,
+            'themes': {},
+            'exercices_completes': [],
+            'badges': [],
+            'historique': []
+        }
+    return domaines[domaine]
+
+
+def _appliquer_exercice(progression, evenement):
+    """Exercice tenté : compteurs du domaine et du thème, niveau tous les 5 succès"""
+    prog_domaine = _domaine(progression, evenement['domaine'])
+    reussi = evenement['reussi']
+
+    prog_domaine['exercices_totaux'] = prog_domaine.get('exercices_totaux', 0) + 1
+    if reussi:
+        prog_domaine['exercices_reussis'] = prog_domaine.get('exercices_reussis', 0) + 1
+
+    themes = prog_domaine.setdefault('themes', {})
+    stats_theme = themes.setdefault(evenement['theme'], {'reussis': 0, 'totaux': 0})
+    stats_theme['totaux'] += 1
+    if reussi:
+        stats_theme['reussis'] += 1
+
+    if reussi and prog_domaine['exercices_reussis'] % 5 == 0:
+        prog_domaine['niveau'] = prog_domaine.get('niveau', 1) + 1
+
+
+def _appliquer_historique(progression, evenement):
+    """Entrée d'historique"""
+    progression.setdefault('historique', []).append(evenement['entree'])
+
+
+def _appliquer_xp(progression, evenement):
+    """XP gagnée : cumul et montée de niveau selon les seuils XP"""
+    from modules.core.xp_systeme import calculer_niveau
+
+    prog_domaine = _domaine(progression, evenement['domaine'])
+    prog_domaine['xp_total'] = prog_domaine.get('xp_total', 0) + evenement['xp']
+
+    nouveau_niveau = calculer_niveau(prog_domaine['xp_total'])
+    if nouveau_niveau > prog_domaine.get('niveau', 1):
+        prog_domaine['niveau'] = nouveau_niveau
+
+
+def _appliquer_revision(progression, evenement):
+    """Révision SRS : niveau SRS, prochaine date de révision, historique"""
+    from modules.core.repetition_espacee import INTERVALLES
+
+    prog_domaine = _domaine(progression, evenement['domaine'])
+    exercices = prog_domaine.setdefault('srs', {'exercices': {}}).setdefault('exercices', {})
+    date = datetime.strptime(evenement['date'], FORMAT_DATE)
+    reussi = evenement['reussi']
+    tentatives = evenement['tentatives']
+
+    entree = exercices.setdefault(evenement['identifiant'], {
+        'niveau_srs': 0,
+        'theme': evenement['theme'],
+        'niveau_exercice': evenement['niveau_exercice'],
+        'prochaine_revision': date.strftime('%Y-%m-%d'),
+        'historique': []
+    })
+
+    if reussi:
+        if tentatives <= 2:
+            entree['niveau_srs'] = min(entree['niveau_srs'] + 1, 7)
+        else:
+            # Réussi mais avec difficultés, on n'avance pas beaucoup
+            entree['niveau_srs'] = max(1, entree['niveau_srs'])
+    else:
+        entree['niveau_srs'] = max(0, entree['niveau_srs'] - 1)
+
+    intervalle = INTERVALLES.get(entree['niveau_srs'], 120)
+    entree['prochaine_revision'] = (date + timedelta(days=intervalle)).strftime('%Y-%m-%d')
+    entree['historique'].append({
+        'date': evenement['date'],
+        'reussi': reussi,
+        'tentatives': tentatives,
+        'niveau_srs': entree['niveau_srs']
+    })
+
+
+def _appliquer_streak(progression, evenement):
+    """Streak : valeurs absolues calculées au moment de l'événement"""
+    progression['streak_actuel'] = evenement['streak_actuel']
+    progression['streak_record'] = evenement['streak_record']
+    progression['derniere_connexion'] = evenement['derniere_connexion']
+
+
+_APPLICATEURS = {
+    'exercice': _appliquer_exercice,
+    'historique': _appliquer_historique,
+    'xp': _appliquer_xp,
+    'revision': _appliquer_revision,
+    'streak': _appliquer_streak,
+}
+
+
+def appliquer_evenement(progression, evenement):
+    """
+    Applique un événement à une progression (en place)
+
+    Args:
+        progression: Document de progression
+        evenement: Événement créé par creer_evenement
+
+    Returns:
+        dict: La progression modifiée
+    """
+    applicateur = _APPLICATEURS.get(evenement.get('type'))
+    if applicateur is None:
+        log_file_operation("JOURNAL_EVENEMENT_INCONNU", str(evenement.get('type')), success=False)
+    else:
+        applicateur(progression, evenement)
+    return progression
+
+
+# ============================================================================
+# LECTURE / ÉCRITURE DU JOURNAL
+# ============================================================================
+
+def _lire_journal(journal):
+    """
+    Lit un journal (verrou tenu par l'appelant)
+
+    Returns:
+        tuple: (existe, generation, evenements)
+    """
+    try:
+        with open(journal, 'r', encoding='utf-8') as f:
+            lignes = f.readlines()
+    except FileNotFoundError:
+        return False, None, []
+
+    generation = None
+    evenements = []
+    for i, ligne in enumerate(lignes):
+        ligne = ligne.strip()
+        if not ligne:
+            continue
+        try:
+            donnees = json.loads(ligne)
+        except json.JSONDecodeError:
+            # Dernière ligne tronquée par un crash pendant l'ajout
+            log_file_operation("JOURNAL_LIGNE_CORROMPUE", journal, success=False)
+            continue
+        if i == 0 and 'generation' in donnees and 'type' not in donnees:
+            generation = donnees['generation']
+        else:
+            evenements.append(donnees)
+    return True, generation, evenements
+
+
+def _reinitialiser_journal(journal, generation):
+    """Remplace le journal par un en-tête seul (verrou exclusif tenu par l'appelant)"""
+    with open(journal, 'w', encoding='utf-8') as f:
+        f.write(json.dumps({'generation': generation}) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _lire_sans_verrou(fichier, journal, moteur=None):
+    """
+    Lit snapshot + journal (verrou tenu par l'appelant)
+
+    Returns:
+        tuple: (snapshot ou None, evenements, journal_valide)
+    """
+    snapshot = (moteur or obtenir_moteur_stockage()).charger_progression(fichier)
+    existe, generation, evenements = _lire_journal(journal)
+    generation_snapshot = snapshot.get('journal_generation') if snapshot else None
+
+    if existe and generation != generation_snapshot:
+        return snapshot, [], False
+    return snapshot, evenements, True
+
+
+def lire_progression(fichier, moteur=None):
+    """
+    Lit le snapshot et les événements à rejouer
+
+    Args:
+        fichier: Fichier de progression de l'utilisateur
+        moteur: Moteur de stockage du snapshot (défaut : moteur actif)
+
+    Returns:
+        tuple: (snapshot ou None, liste des événements postérieurs)
+    """
+    journal = chemin_journal(fichier)
+    with verrou_fichier(journal, exclusif=False):
+        snapshot, evenements, valide = _lire_sans_verrou(fichier, journal, moteur)
+
+    if not valide:
+        # Journal périmé : ses événements sont déjà dans le snapshot
+        with verrou_fichier(journal, exclusif=True):
+            snapshot, evenements, valide = _lire_sans_verrou(fichier, journal, moteur)
+            if not valide:
+                log_file_operation("JOURNAL_PERIME", journal, success=False)
+                _reinitialiser_journal(journal, snapshot.get('journal_generation') if snapshot else None)
+    return snapshot, evenements
+
+
+def _ecrire_snapshot_sans_verrou(fichier, journal, progression, moteur=None):
+    """Écrit un nouveau snapshot puis vide le journal, gardé en .1 (verrou exclusif tenu)"""
+    generation = uuid.uuid4().hex
+    progression['journal_generation'] = generation
+    progression['journal_evenements'] = 0
+    (moteur or obtenir_moteur_stockage()).sauvegarder_progression(fichier, progression)
+    # Un crash ici laisse un journal d'ancienne génération, ignoré à la lecture
+    if os.path.exists(journal):
+        os.replace(journal, journal + '.1')
+    _reinitialiser_journal(journal, generation)
+
+
+def _evenements_depuis_chargement(fichier, journal, progression):
+    """
+    Événements ajoutés au journal depuis le chargement de la progression
+    (verrou exclusif tenu)
+    """
+    generation = progression.get('journal_generation')
+    deja_rejoues = progression.get('journal_evenements', 0)
+    snapshot, evenements, valide = _lire_sans_verrou(fichier, journal)
+    if not valide:
+        evenements = []
+    if (snapshot.get('journal_generation') if snapshot else None) == generation:
+        return evenements[deja_rejoues:]
+
+    # Snapshot réécrit depuis le chargement : les événements suivants du
+    # journal de la progression chargée sont dans le journal précédent
+    existe, generation_precedente, precedents = _lire_journal(journal + '.1')
+    if existe and generation_precedente == generation:
+        return precedents[deja_rejoues:] + evenements
+    log_file_operation("JOURNAL_EVENEMENTS_NON_REJOUES", journal, success=False)
+    return evenements
+
+
+def ecrire_snapshot(fichier, progression, rejouer_recents=False):
+    """
+    Remplace le snapshot et vide le journal
+
+    À utiliser quand la progression complète a été modifiée en mémoire.
+
+    Args:
+        fichier: Fichier de progression de l'utilisateur
+        progression: Document complet
+        rejouer_recents: True si la progression vient de charger_progression :
+                         les événements ajoutés au journal depuis son
+                         chargement (autre requête) sont rejoués avant
+                         l'écriture. False pour remplacer l'état (restauration)
+    """
+    journal = chemin_journal(fichier)
+    with verrou_fichier(journal, exclusif=True):
+        if rejouer_recents:
+            for evenement in _evenements_depuis_chargement(fichier, journal, progression):
+                appliquer_evenement(progression, evenement)
+        _ecrire_snapshot_sans_verrou(fichier, journal, progression)
+
+
+def enregistrer_evenement(fichier, evenement, reconstruire):
+    """
+    Ajoute un événement au journal (O(1), fsync de la ligne)
+
+    Args:
+        fichier: Fichier de progression de l'utilisateur
+        evenement: Événement créé par creer_evenement
+        reconstruire: fonction (snapshot, evenements) -> progression,
+                      utilisée par la compaction
+    """
+    journal = chemin_journal(fichier)
+    with verrou_fichier(journal, exclusif=True):
+        if not os.path.exists(journal):
+            snapshot = obtenir_moteur_stockage().charger_progression(fichier)
+            _reinitialiser_journal(journal, snapshot.get('journal_generation') if snapshot else None)
+
+        with open(journal, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(evenement, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+            taille = f.tell()
+
+    if taille > SEUIL_COMPACTION:
+        planifier_compaction(fichier, reconstruire)
+
+
+def supprimer_journal(fichier):
+    """Supprime le journal d'un utilisateur"""
+    journal = chemin_journal(fichier)
+    with verrou_fichier(journal, exclusif=True):
+        for chemin in (journal, journal + '.1'):
+            if os.path.exists(chemin):
+                os.remove(chemin)
+    try:
+        os.remove(journal + '.lock')
+    except OSError:
+        pass
+
+
+# ============================================================================
+# COMPACTION
+# ============================================================================
+
+def compacter_journal(fichier, reconstruire, moteur=None):
+    """
+    Replie le journal dans un nouveau snapshot
+
+    Args:
+        fichier: Fichier de progression de l'utilisateur
+        reconstruire: fonction (snapshot, evenements) -> progression
+        moteur: Moteur de stockage du snapshot (défaut : moteur actif)
+
+    Returns:
+        int: Nombre d'événements repliés
+    """
+    journal = chemin_journal(fichier)
+    with verrou_fichier(journal, exclusif=True):
+        snapshot, evenements, valide = _lire_sans_verrou(fichier, journal, moteur)
+        if not valide or not evenements:
+            return 0
+        progression = reconstruire(snapshot, evenements)
+        _ecrire_snapshot_sans_verrou(fichier, journal, progression, moteur)
+
+    log_file_operation("JOURNAL_COMPACTE", journal)
+    return len(evenements)
+
+
+def _executer_compaction(fichier, reconstruire):
+    try:
+        compacter_journal(fichier, reconstruire)
+    except Exception as e:
+        log_file_operation("JOURNAL_COMPACTION", fichier, success=False, error=str(e))
+    finally:
+        with _compactions_lock:
+            _compactions_en_cours.discard(fichier)
+
+
+def planifier_compaction(fichier, reconstruire):
+    """Lance une compaction en arrière-plan (une seule à la fois par fichier)"""
+    with _compactions_lock:
+        if fichier in _compactions_en_cours:
+            return
+        _compactions_en_cours.add(fichier)
+
+    thread = threading.Thread(
+        target=_executer_compaction,
+        args=(fichier, reconstruire),
+        name='compaction-journal',
+        daemon=True
+    )
+    thread.start()
@@ -0,0 +1,89 @@
+"""
+Analyse incrémentale d'un objet JSON reçu par fragments (flux du LLM)
+
+Le modèle écrit l'exercice champ par champ ; l'analyseur signale chaque
+champ de premier niveau dès que sa valeur est complète, sans attendre la
+fin de l'objet :
+
+    analyseur = AnalyseurJSONIncremental()
+    for fragment in flux:
+        for cle, valeur in analyseur.ajouter(fragment):
+            ...   # ex: ('enonce', "Écrivez une boucle...")
+
+Le texte qui précède la première accolade (ex: ```json) est ignoré.
+Chaque caractère n'est examiné qu'une fois.
+"""
+
+import json
+from typing import Any, List, Tuple
+
+
+class AnalyseurJSONIncremental:
+    """Détecte les paires clé/valeur complètes du premier objet JSON d'un flux"""
+
+    def __init__(self):
+        self.texte = ''
+        self._position = 0
+        self._profondeur = 0
+        self._dans_chaine = False
+        self._echappement = False
+        self._debut_cle = None
+        self._cle = None
+        self._debut_valeur = None
+        self.termine = False
+
+    def ajouter(self, fragment: str) -> List[Tuple[str, Any]]:
+        """
+        Ajoute un fragment et retourne les champs de premier niveau complétés
+
+        Returns:
+            list: [(cle, valeur), ...] dans l'ordre d'apparition
+        """
+        self.texte += fragment
+        champs = []
+        texte = self.texte
+        i = self._position
+        while i < len(texte) and not self.termine:
+            c = texte[i]
+            if self._profondeur == 0:
+                # Avant l'objet : préambule ignoré
+                if c == '{':
+                    self._profondeur = 1
+            elif self._dans_chaine:
+                if self._echappement:
+                    self._echappement = False
+                elif c == '\\':
+                    self._echappement = True
+                elif c == '"':
+                    self._dans_chaine = False
+                    if self._profondeur == 1 and self._cle is None and self._debut_valeur is None:
+                        self._cle = json.loads(texte[self._debut_cle:i + 1])
+            elif c == '"':
+                self._dans_chaine = True
+                if self._profondeur == 1 and self._cle is None:
+                    self._debut_cle = i
+            elif c in '{[':
+                self._profondeur += 1
+            elif c in '}]':
+                if self._profondeur == 1:
+                    self._terminer_valeur(texte, i, champs)
+                    self.termine = True
+                self._profondeur -= 1
+            elif self._profondeur == 1:
+                if c == ':' and self._cle is not None and self._debut_valeur is None:
+                    self._debut_valeur = i + 1
+                elif c == ',':
+                    self._terminer_valeur(texte, i, champs)
+            i += 1
+        self._position = i
+        return champs
+
+    def _terminer_valeur(self, texte: str, fin: int, champs: list):
+        if self._cle is not None and self._debut_valeur is not None:
+            try:
+                champs.append((self._cle, json.loads(texte[self._debut_valeur:fin])))
+            except ValueError:
+                # Valeur invalide : elle sera signalée par l'analyse complète
+                pass
+        self._cle = None
+        self._debut_valeur = None
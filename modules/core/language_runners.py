@@ -10,6 +10,8 @@ import shutil
 from pathlib import Path
 import re
 
+from modules.core.cache_resultats import executer_lot_memoise
+
 # Langages supportés par défaut
 LANGAGES_SUPPORTES = {
     'python': {
@@ -119,10 +121,20 @@ def executer_code_langage(code, langage, inputs=None, domaine='python'):
             'execution_time': 0
         }
     
-    # Exécuter selon le langage
+    # Python : la sandbox consulte elle-même le cache de résultats
     if langage == 'python':
         return executer_python(code, inputs)
-    elif langage == 'javascript':
+    
+    # Autres langages : résultat en cache si le code est déterministe (opt-in)
+    return executer_lot_memoise(
+        code, [inputs], langage,
+        lambda liste_inputs: [_executer_selon_langage(code, langage, liste_inputs[0])]
+    )[0]
+
+
+def _executer_selon_langage(code, langage, inputs):
+    """Exécute le code avec le runner du langage (hors Python)"""
+    if langage == 'javascript':
         return executer_javascript(code, inputs)
     elif langage == 'java':
         return executer_java(code, inputs)
@@ -171,7 +183,7 @@ def verifier_coherence_domaine_langage(domaine, langage):
 def executer_python(code, inputs=None):
     """Exécute du code Python (ancien système)"""
     from modules.core.fonctions import executer_code_securise
-    return executer_code_securise(code, inputs)
+    return executer_code_securise(code, test_inputs=inputs)
 
 
 def executer_javascript(code, inputs=None):
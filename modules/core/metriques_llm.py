@@ -0,0 +1,256 @@
+"""
+Instrumentation des appels au LLM
+
+Chaque appel passé par ClientLLM produit une mesure :
+
+    {
+      "horodatage": "2025-01-01T12:00:00", "operation": "generation",
+      "modele": "qwen2.5-coder:14b", "resultat": "analyse",
+      "duree_ms": 5230.1, "attente_ms": 0.4, "premier_jeton_ms": 812.0,
+      "jetons_prompt": 612, "jetons_reponse": 180,
+      "exercices": 1, "duree_par_exercice_ms": 5230.1
+    }
+
+- duree_ms : temps total de l'appel, attente d'une place comprise
+- attente_ms : attente d'une place (LLM_MAX_CONCURRENCY appels simultanés)
+- premier_jeton_ms : premier fragment reçu en flux ; pour un appel sans flux,
+  estimation d'Ollama (chargement du modèle + lecture du prompt)
+- exercices : exercices exploitables produits par l'appel (générations
+  'generation' et 'generation_lot' uniquement)
+- duree_par_exercice_ms : duree_ms / exercices, calculé à l'enregistrement
+  quand l'appel a produit au moins un exercice
+- resultat : 'analyse' (réponse exploitée), 'repli' (réponse inexploitable,
+  ex: "Erreur parsing JSON IA"), 'ok' (appel sans analyse), 'erreur',
+  'delai' (échéance dépassée) ou 'abandon' (flux interrompu par le client)
+
+Les mesures sont agrégées par opération (percentiles sur les
+LLM_METRICS_SAMPLES dernières mesures). Pour les générations,
+cout_par_exercice_ms divise la durée de tous les appels, replis et erreurs
+compris, par le nombre d'exercices produits : c'est ce chiffre qui compare
+en pratique 'generation' et 'generation_lot'. Les mesures sont aussi
+ajoutées au journal JSON lines logs/llm_appels.jsonl, renommé en .1
+au-delà de LLM_METRICS_LOG_MAX_BYTES.
+
+    with mesurer_appel_llm('generation') as mesure:
+        texte = obtenir_client_llm().chat(messages, mesure=mesure)
+        mesure['resultat'] = 'analyse'
+"""
+
+import json
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, Optional
+
+from modules.core.file_lock import log_file_operation
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CONFIG_METRIQUES_LLM = {
+    'actif': os.getenv('LLM_METRICS_ENABLED', 'True') == 'True',
+    'journal': os.getenv('LLM_METRICS_LOG', os.path.join(BASE_DIR, 'logs', 'llm_appels.jsonl')),
+    'taille_max_octets': int(os.getenv('LLM_METRICS_LOG_MAX_BYTES', str(10 * 1024 * 1024))),
+    'echantillons': int(os.getenv('LLM_METRICS_SAMPLES', '1000'))
+}
+
+RESULTATS = ('analyse', 'repli', 'ok', 'erreur', 'delai', 'abandon')
+
+_DUREES = ('duree_ms', 'attente_ms', 'premier_jeton_ms', 'duree_par_exercice_ms')
+
+
+def _percentiles(valeurs) -> Optional[Dict[str, float]]:
+    if not valeurs:
+        return None
+    triees = sorted(valeurs)
+
+    def rang(p):
+        return triees[min(len(triees) - 1, int(p * len(triees)))]
+
+    return {
+        'moyenne': round(sum(triees) / len(triees), 1),
+        'p50': round(rang(0.50), 1),
+        'p95': round(rang(0.95), 1),
+        'max': round(triees[-1], 1)
+    }
+
+
+class _AgregatOperation:
+    """Compteurs et dernières durées d'une opération"""
+
+    def __init__(self, echantillons: int):
+        self.appels = 0
+        self.resultats = dict.fromkeys(RESULTATS, 0)
+        self.jetons_prompt = 0
+        self.jetons_reponse = 0
+        self.exercices = 0
+        # Durée des appels qui génèrent des exercices (clé 'exercices' présente)
+        self.duree_generation_ms = 0.0
+        self.durees = {nom: deque(maxlen=echantillons) for nom in _DUREES}
+
+    def ajouter(self, mesure: Dict[str, Any]):
+        self.appels += 1
+        resultat = mesure.get('resultat', 'ok')
+        self.resultats[resultat] = self.resultats.get(resultat, 0) + 1
+        self.jetons_prompt += mesure.get('jetons_prompt') or 0
+        self.jetons_reponse += mesure.get('jetons_reponse') or 0
+        if 'exercices' in mesure:
+            self.exercices += mesure['exercices']
+            self.duree_generation_ms += mesure.get('duree_ms') or 0.0
+        for nom in _DUREES:
+            if mesure.get(nom) is not None:
+                self.durees[nom].append(mesure[nom])
+
+    def resume(self) -> Dict[str, Any]:
+        analyses = self.resultats['analyse'] + self.resultats['repli']
+        return {
+            'appels': self.appels,
+            'resultats': dict(self.resultats),
+            'taux_repli': round(self.resultats['repli'] / analyses, 4) if analyses else 0.0,
+            'jetons_prompt': self.jetons_prompt,
+            'jetons_reponse': self.jetons_reponse,
+            'exercices': self.exercices,
+            'cout_par_exercice_ms': round(self.duree_generation_ms / self.exercices, 1) if self.exercices else None,
+            **{nom: _percentiles(valeurs) for nom, valeurs in self.durees.items()}
+        }
+
+
+class MetriquesLLM:
+    """
+    Agrégats par opération et journal JSON lines des appels au LLM
+
+    Args:
+        journal: Fichier JSON lines (None : pas de journal)
+        taille_max_octets: Taille au-delà de laquelle le journal est renommé en .1
+        echantillons: Nombre de dernières mesures gardées pour les percentiles
+    """
+
+    def __init__(self, journal: Optional[str] = None, taille_max_octets: int = 10 * 1024 * 1024,
+                 echantillons: int = 1000):
+        self.journal = os.path.abspath(journal) if journal else None
+        self.taille_max_octets = taille_max_octets
+        self.echantillons = max(1, echantillons)
+        self._lock = threading.Lock()
+        self._operations: Dict[str, _AgregatOperation] = {}
+        self._depuis = datetime.now().isoformat(timespec='seconds')
+
+    @contextmanager
+    def mesurer(self, operation: str) -> Iterator[Dict[str, Any]]:
+        """
+        Mesure d'un appel : le dict fourni est rempli par ClientLLM puis
+        enregistré à la sortie du bloc (résultat 'erreur', 'delai' ou
+        'abandon' si une exception en sort)
+        """
+        # Import local : client_llm importe ce module
+        from modules.core.client_llm import DelaiLLMDepasse
+
+        mesure = {'horodatage': datetime.now().isoformat(timespec='milliseconds'), 'operation': operation}
+        try:
+            yield mesure
+        except GeneratorExit:
+            mesure['resultat'] = 'abandon'
+            raise
+        except DelaiLLMDepasse as e:
+            mesure['resultat'] = 'delai'
+            mesure['erreur'] = str(e)[:200]
+            raise
+        except Exception as e:
+            mesure['resultat'] = 'erreur'
+            mesure['erreur'] = str(e)[:200]
+            raise
+        finally:
+            mesure.setdefault('resultat', 'ok')
+            self.enregistrer(mesure)
+
+    def enregistrer(self, mesure: Dict[str, Any]):
+        """Ajoute une mesure aux agrégats et au journal"""
+        if mesure.get('exercices') and mesure.get('duree_ms') is not None:
+            mesure['duree_par_exercice_ms'] = round(mesure['duree_ms'] / mesure['exercices'], 1)
+        with self._lock:
+            agregat = self._operations.get(mesure['operation'])
+            if agregat is None:
+                agregat = self._operations[mesure['operation']] = _AgregatOperation(self.echantillons)
+            agregat.ajouter(mesure)
+        if self.journal:
+            self._journaliser(mesure)
+
+    def _journaliser(self, mesure: Dict[str, Any]):
+        ligne = (json.dumps(mesure, ensure_ascii=False) + '\n').encode('utf-8')
+        try:
+            os.makedirs(os.path.dirname(self.journal), exist_ok=True)
+            # O_APPEND : une ligne écrite d'un seul write() n'est pas
+            # entrelacée avec celles des autres processus
+            fd = os.open(self.journal, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, ligne)
+                taille = os.fstat(fd).st_size
+            finally:
+                os.close(fd)
+            if taille > self.taille_max_octets:
+                os.replace(self.journal, self.journal + '.1')
+        except OSError as e:
+            log_file_operation("METRIQUES_LLM", self.journal, success=False, error=str(e))
+
+    def stats(self) -> Dict[str, Any]:
+        """Agrégats par opération et pour l'ensemble des appels"""
+        with self._lock:
+            operations = {nom: agregat.resume() for nom, agregat in self._operations.items()}
+            total = _AgregatOperation(self.echantillons)
+            for agregat in self._operations.values():
+                total.appels += agregat.appels
+                for resultat, nombre in agregat.resultats.items():
+                    total.resultats[resultat] = total.resultats.get(resultat, 0) + nombre
+                total.jetons_prompt += agregat.jetons_prompt
+                total.jetons_reponse += agregat.jetons_reponse
+                total.exercices += agregat.exercices
+                total.duree_generation_ms += agregat.duree_generation_ms
+                for nom in _DUREES:
+                    total.durees[nom].extend(agregat.durees[nom])
+            return {
+                'depuis': self._depuis,
+                'total': total.resume(),
+                'operations': operations,
+                'journal': self.journal
+            }
+
+    def reinitialiser(self):
+        """Remet les agrégats à zéro (le journal est conservé)"""
+        with self._lock:
+            self._operations.clear()
+            self._depuis = datetime.now().isoformat(timespec='seconds')
+
+
+# ============================================================================
+# MÉTRIQUES GLOBALES
+# ============================================================================
+
+_metriques: Optional[MetriquesLLM] = None
+_metriques_lock = threading.Lock()
+
+
+def obtenir_metriques_llm() -> Optional[MetriquesLLM]:
+    """Métriques globales, ou None si LLM_METRICS_ENABLED=False"""
+    global _metriques
+    if not CONFIG_METRIQUES_LLM['actif']:
+        return None
+    if _metriques is None:
+        with _metriques_lock:
+            if _metriques is None:
+                _metriques = MetriquesLLM(
+                    CONFIG_METRIQUES_LLM['journal'],
+                    taille_max_octets=CONFIG_METRIQUES_LLM['taille_max_octets'],
+                    echantillons=CONFIG_METRIQUES_LLM['echantillons']
+                )
+    return _metriques
+
+
+@contextmanager
+def mesurer_appel_llm(operation: str) -> Iterator[Dict[str, Any]]:
+    """Mesure d'un appel au LLM (dict non enregistré si les métriques sont désactivées)"""
+    metriques = obtenir_metriques_llm()
+    if metriques is None:
+        yield {'operation': operation}
+        return
+    with metriques.mesurer(operation) as mesure:
+        yield mesure
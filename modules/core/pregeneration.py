@@ -0,0 +1,253 @@
+"""
+Pré-génération en arrière-plan des exercices IA
+
+Quand la banque n'a plus d'exercice inédit pour un (domaine, theme, niveau),
+generer_exercice appelle le LLM de façon synchrone (plusieurs secondes).
+Ce module garde la banque approvisionnée à l'avance :
+
+- chaque appel à generer_exercice signale la demande et le stock restant
+  (exercices de la banque non encore complétés par l'utilisateur) ;
+- sous le seuil bas (PREGENERATION_LOW_WATER), la clé est mise en file et
+  des workers (PREGENERATION_WORKERS) génèrent jusqu'à atteindre
+  PREGENERATION_TARGET exercices inédits, par lots d'au plus
+  PREGENERATION_BATCH_SIZE exercices par appel au LLM ;
+- la file est servie par demande récente décroissante (compteur à
+  décroissance exponentielle, demi-vie PREGENERATION_DEMAND_HALF_LIFE_S) ;
+- après un échec (LLM indisponible), la clé n'est pas retentée avant
+  PREGENERATION_RETRY_DELAY_S secondes.
+
+Les workers appellent le LLM configuré par OLLAMA_HOST : on peut donc tester
+le pool contre un faux serveur local.
+"""
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from modules.core.file_lock import log_file_operation
+
+
+CONFIG_PREGENERATION = {
+    'actif': os.getenv('PREGENERATION_ENABLED', 'True') == 'True',
+    'workers': int(os.getenv('PREGENERATION_WORKERS', '2')),
+    'seuil_bas': int(os.getenv('PREGENERATION_LOW_WATER', '3')),
+    'cible': int(os.getenv('PREGENERATION_TARGET', '6')),
+    'lot_max': int(os.getenv('PREGENERATION_BATCH_SIZE', '5')),
+    'file_max': int(os.getenv('PREGENERATION_QUEUE_MAX', '256')),
+    'demi_vie_s': float(os.getenv('PREGENERATION_DEMAND_HALF_LIFE_S', '600')),
+    'delai_reessai_s': float(os.getenv('PREGENERATION_RETRY_DELAY_S', '30'))
+}
+
+Cle = Tuple[str, str, str]
+
+
+class PoolPregeneration:
+    """
+    File de clés (domaine, theme, niveau) à réapprovisionner et ses workers
+
+    Args:
+        generer: fonction (niveau, theme, domaine, nombre) qui génère jusqu'à
+                 `nombre` exercices, les ajoute à la banque et retourne le
+                 nombre ajouté
+        workers: Nombre de threads de génération
+        seuil_bas: Stock en dessous duquel une clé est mise en file
+        cible: Stock visé par le réapprovisionnement
+        lot_max: Nombre maximal d'exercices demandés par appel
+        file_max: Nombre maximal de clés en file (les moins demandées sont écartées)
+        demi_vie_s: Demi-vie du compteur de demande
+        delai_reessai_s: Attente après un échec de génération
+    """
+
+    def __init__(self, generer: Callable[[str, str, str, int], int], workers: int = 2,
+                 seuil_bas: int = 3, cible: int = 6, lot_max: int = 5, file_max: int = 256,
+                 demi_vie_s: float = 600.0, delai_reessai_s: float = 30.0):
+        self._generer = generer
+        self.nb_workers = max(1, workers)
+        self.seuil_bas = seuil_bas
+        self.cible = max(cible, seuil_bas)
+        self.lot_max = max(1, lot_max)
+        self.file_max = max(1, file_max)
+        self.demi_vie_s = demi_vie_s
+        self.delai_reessai_s = delai_reessai_s
+
+        self._condition = threading.Condition()
+        self._demande: Dict[Cle, list] = {}       # cle -> [score, instant]
+        self._stock: Dict[Cle, int] = {}          # dernier stock connu
+        self._file: set = set()
+        self._en_cours: set = set()
+        self._reessai: Dict[Cle, float] = {}      # cle -> instant minimal du prochain essai
+        self._threads = []
+        self._arret = False
+        self._stats = {'signalements': 0, 'lots': 0, 'generes': 0, 'echecs': 0, 'ecartes': 0}
+
+    # ------------------------------------------------------------------
+    # Demande
+    # ------------------------------------------------------------------
+
+    def _score(self, cle: Cle, maintenant: float) -> float:
+        """Demande récente (décroissance exponentielle), lock tenu"""
+        entree = self._demande.get(cle)
+        if entree is None:
+            return 0.0
+        score, instant = entree
+        return score * 0.5 ** ((maintenant - instant) / self.demi_vie_s)
+
+    def signaler(self, domaine: str, theme: str, niveau, stock: int):
+        """
+        Enregistre une demande et le stock inédit restant pour cette clé
+
+        Args:
+            domaine: Domaine
+            theme: Thème
+            niveau: Niveau
+            stock: Exercices de la banque encore inédits pour le demandeur
+        """
+        cle = (domaine, theme, str(niveau))
+        maintenant = time.monotonic()
+        with self._condition:
+            self._demande[cle] = [self._score(cle, maintenant) + 1.0, maintenant]
+            self._stock[cle] = stock
+            self._stats['signalements'] += 1
+            if stock < self.seuil_bas:
+                self._mettre_en_file(cle, maintenant)
+        self.demarrer()
+
+    def _mettre_en_file(self, cle: Cle, maintenant: float):
+        """Ajoute une clé à la file si elle n'y est pas déjà (lock tenu)"""
+        if cle in self._file or cle in self._en_cours:
+            return
+        if self._reessai.get(cle, 0.0) > maintenant:
+            return
+        if len(self._file) >= self.file_max:
+            moins_demandee = min(self._file, key=lambda c: self._score(c, maintenant))
+            if self._score(moins_demandee, maintenant) >= self._score(cle, maintenant):
+                self._stats['ecartes'] += 1
+                return
+            self._file.discard(moins_demandee)
+            self._stats['ecartes'] += 1
+        self._file.add(cle)
+        self._condition.notify()
+
+    # ------------------------------------------------------------------
+    # Workers
+    # ------------------------------------------------------------------
+
+    def _prochaine_cle(self) -> Optional[Tuple[Cle, int]]:
+        """Clé en file la plus demandée et taille du lot ; bloque tant que la file est vide"""
+        with self._condition:
+            while not self._file and not self._arret:
+                self._condition.wait()
+            if self._arret:
+                return None
+            maintenant = time.monotonic()
+            cle = max(self._file, key=lambda c: self._score(c, maintenant))
+            self._file.discard(cle)
+            self._en_cours.add(cle)
+            manquants = self.cible - self._stock.get(cle, 0)
+            return cle, min(self.lot_max, max(1, manquants))
+
+    def _travailler(self):
+        while True:
+            suivante = self._prochaine_cle()
+            if suivante is None:
+                return
+            cle, nombre = suivante
+            domaine, theme, niveau = cle
+            ajoutes = 0
+            try:
+                ajoutes = self._generer(niveau, theme, domaine, nombre)
+            except Exception as e:
+                log_file_operation("PREGENERATION", f"{domaine}:{theme}:{niveau}", success=False, error=str(e))
+
+            with self._condition:
+                self._en_cours.discard(cle)
+                maintenant = time.monotonic()
+                if ajoutes > 0:
+                    self._stats['lots'] += 1
+                    self._stats['generes'] += ajoutes
+                    self._stock[cle] = self._stock.get(cle, 0) + ajoutes
+                    if self._stock[cle] < self.cible:
+                        self._mettre_en_file(cle, maintenant)
+                else:
+                    self._stats['echecs'] += 1
+                    self._reessai[cle] = maintenant + self.delai_reessai_s
+
+    def demarrer(self):
+        """Lance les workers s'ils ne tournent pas encore"""
+        with self._condition:
+            if self._threads or self._arret:
+                return
+            for numero in range(self.nb_workers):
+                thread = threading.Thread(
+                    target=self._travailler,
+                    name=f'pregeneration-{numero}',
+                    daemon=True
+                )
+                self._threads.append(thread)
+                thread.start()
+
+    def arreter(self, timeout: float = 5.0):
+        """Arrête les workers (la génération en cours se termine)"""
+        with self._condition:
+            self._arret = True
+            self._file.clear()
+            self._condition.notify_all()
+            threads = list(self._threads)
+        for thread in threads:
+            thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        """Compteurs, file et stock connu par clé"""
+        maintenant = time.monotonic()
+        with self._condition:
+            return dict(
+                self._stats,
+                workers=len(self._threads),
+                en_file=len(self._file),
+                en_cours=len(self._en_cours),
+                stock={
+                    ':'.join(cle): {'stock': stock, 'demande': round(self._score(cle, maintenant), 3)}
+                    for cle, stock in self._stock.items()
+                }
+            )
+
+
+# ============================================================================
+# POOL GLOBAL
+# ============================================================================
+
+_pool: Optional[PoolPregeneration] = None
+_pool_lock = threading.Lock()
+
+
+def _generer_lot(niveau, theme, domaine, nombre):
+    # Import local : fonctions importe ce module
+    from modules.core.fonctions import generer_exercices_lot
+    return generer_exercices_lot(niveau, theme, domaine, nombre)['ajoutes']
+
+
+def obtenir_pool_pregeneration() -> PoolPregeneration:
+    """Retourne le pool global (créé au premier appel, workers lancés à la première demande)"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = PoolPregeneration(
+                    _generer_lot,
+                    workers=CONFIG_PREGENERATION['workers'],
+                    seuil_bas=CONFIG_PREGENERATION['seuil_bas'],
+                    cible=CONFIG_PREGENERATION['cible'],
+                    lot_max=CONFIG_PREGENERATION['lot_max'],
+                    file_max=CONFIG_PREGENERATION['file_max'],
+                    demi_vie_s=CONFIG_PREGENERATION['demi_vie_s'],
+                    delai_reessai_s=CONFIG_PREGENERATION['delai_reessai_s']
+                )
+    return _pool
+
+
+def signaler_demande(domaine: str, theme: str, niveau, stock: int):
+    """Signale une demande d'exercice et le stock inédit restant (sans effet si désactivé)"""
+    if not CONFIG_PREGENERATION['actif']:
+        return
+    obtenir_pool_pregeneration().signaler(domaine, theme, niveau, stock)
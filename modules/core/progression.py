@@ -1,7 +1,8 @@
-import json
-import os
 from datetime import datetime
-from modules.core.file_lock import atomic_json_writer, safe_json_read, safe_json_update
+from modules.core.journal_progression import (
+    lire_progression, ecrire_snapshot, enregistrer_evenement,
+    creer_evenement, appliquer_evenement, sans_position_journal
+)
 
 
 def obtenir_fichier_progression():
@@ -43,16 +44,45 @@ def initialiser_progression():
 
 
 def charger_progression():
-    """Charge la progression depuis le fichier JSON ou crée une nouvelle progression (thread-safe)"""
+    """Charge la progression (snapshot + rejeu du journal) ou crée une nouvelle progression (thread-safe)"""
     fichier = obtenir_fichier_progression()
-    if not os.path.exists(fichier):
-        return initialiser_progression()
+    snapshot, evenements = lire_progression(fichier)
+    return _reconstruire_progression(snapshot, evenements)
+
+
+def _reconstruire_progression(snapshot, evenements):
+    """Rejoue les événements du journal sur le snapshot"""
+    prog = snapshot if snapshot is not None else initialiser_progression()
+    
+    # Migration : si ancien format (sans domaines), migrer
+    if 'domaines' not in prog:
+        prog = migrer_vers_multi_domaines(prog)
+    
+    for evenement in evenements:
+        appliquer_evenement(prog, evenement)
     
-    with safe_json_read(fichier) as prog:
-        # Migration : si ancien format (sans domaines), migrer
-        if 'domaines' not in prog:
-            prog = migrer_vers_multi_domaines(prog)
-        return prog
+    # Position dans le journal : sauvegarder_progression rejoue les événements suivants
+    prog['journal_generation'] = snapshot.get('journal_generation') if snapshot else None
+    prog['journal_evenements'] = len(evenements)
+    return prog
+
+
+def charger_progression_fichier(fichier):
+    """
+    Progression complète (snapshot + rejeu du journal) d'un fichier donné,
+    ou None s'il n'existe pas. Sans la position dans le journal : le
+    résultat sert aux exports, pas à une réécriture.
+    """
+    snapshot, evenements = lire_progression(fichier)
+    if snapshot is None and not evenements:
+        return None
+    return sans_position_journal(_reconstruire_progression(snapshot, evenements))
+
+
+def journaliser_evenement(evenement):
+    """Ajoute un événement au journal de l'utilisateur actif (sans réécrire la progression)"""
+    fichier = obtenir_fichier_progression()
+    enregistrer_evenement(fichier, evenement, _reconstruire_progression)
 
 
 def migrer_vers_multi_domaines(ancienne_prog):
@@ -133,54 +163,37 @@ def obtenir_progression_domaine(domaine=None):
 
 
 def sauvegarder_progression(progression):
-    """Sauvegarde la progression dans le fichier JSON de manière atomique et thread-safe"""
+    """
+    Sauvegarde la progression complète (nouveau snapshot) de manière atomique et thread-safe
+    
+    La progression doit venir de charger_progression : les événements ajoutés
+    au journal depuis son chargement (autre requête) sont rejoués avant
+    l'écriture, puis le journal est vidé.
+    """
     fichier = obtenir_fichier_progression()
-    with atomic_json_writer(fichier) as writer:
-        writer(progression)
+    ecrire_snapshot(fichier, progression, rejouer_recents=True)
 
 
 
 def mettre_a_jour_progression(theme, reussi, domaine=None):
-    """Met à jour la progression après un exercice"""
+    """Met à jour la progression après un exercice (événement 'exercice' ajouté au journal)"""
     progression = charger_progression()
     
     # Obtenir le domaine actif
     if domaine is None:
         domaine = progression.get('domaine_actif', 'python')
     
-    # S'assurer que le domaine existe
-    if domaine not in progression['domaines']:
-        progression['domaines'][domaine] = {
-            'niveau': 1,
-            'exercices_reussis': 0,
-            'exercices_totaux': 0,
-            'themes': {},
-            'exercices_completes': [],
-            'badges': [],
-            'historique': []
-        }
-    
-    prog_domaine = progression['domaines'][domaine]
-    
-    # Mise à jour des compteurs du domaine
-    prog_domaine['exercices_totaux'] += 1
-    if reussi:
-        prog_domaine['exercices_reussis'] += 1
-    
-    # Mise à jour par thème
-    if theme not in prog_domaine['themes']:
-        prog_domaine['themes'][theme] = {'reussis': 0, 'totaux': 0}
+    niveau_avant = progression['domaines'].get(domaine, {}).get('niveau', 1)
     
-    prog_domaine['themes'][theme]['totaux'] += 1
-    if reussi:
-        prog_domaine['themes'][theme]['reussis'] += 1
+    evenement = creer_evenement('exercice', domaine=domaine, theme=theme, reussi=reussi)
+    appliquer_evenement(progression, evenement)
+    journaliser_evenement(evenement)
     
     # Augmentation du niveau tous les 5 exercices réussis
-    if prog_domaine['exercices_reussis'] % 5 == 0 and reussi:
-        prog_domaine['niveau'] += 1
+    prog_domaine = progression['domaines'][domaine]
+    if prog_domaine['niveau'] > niveau_avant:
         print(f"\nNIVEAU SUPÉRIEUR ! Vous êtes maintenant au niveau {prog_domaine['niveau']} !")
     
-    sauvegarder_progression(progression)
     return progression
 
 
@@ -223,6 +236,54 @@ def afficher_progression(domaine=None):
         
 
 
+def identifiant_completion(theme, niveau, exercice):
+    """
+    Identifiant stable d'un exercice complété
+    
+    Utilise l'id de l'exercice de la banque s'il existe ; sinon l'ancien
+    format basé sur le texte (50 premiers caractères).
+    """
+    if isinstance(exercice, dict) and exercice.get('id'):
+        return f"{theme}|{niveau}|id:{exercice['id']}"
+    return f"{theme}|{niveau}|{str(exercice)[:50]}"
+
+
+def charger_exercices_completes(domaine=None):
+    """
+    Charge une seule fois les exercices complétés d'un domaine
+    
+    Returns:
+        set: Identifiants (voir identifiant_completion), test d'appartenance en O(1)
+    """
+    progression = charger_progression()
+    
+    if domaine is None:
+        domaine = progression.get('domaine_actif', 'python')
+    
+    prog_domaine = progression['domaines'].get(domaine, {})
+    return set(prog_domaine.get('exercices_completes', []))
+
+
+def contient_anciens_identifiants(completes):
+    """True si le set contient des entrées au format texte (antérieures aux ids stables)"""
+    return any('|id:' not in identifiant for identifiant in completes)
+
+
+def est_dans_completes(completes, theme, niveau, exercice, formats_anciens=True):
+    """
+    Vérifie un exercice contre un set chargé par charger_exercices_completes
+    
+    Les entrées enregistrées avant les identifiants stables (texte tronqué)
+    restent reconnues, sauf si formats_anciens=False (voir
+    contient_anciens_identifiants) : on évite alors de calculer str(exercice).
+    """
+    if identifiant_completion(theme, niveau, exercice) in completes:
+        return True
+    if formats_anciens and isinstance(exercice, dict) and exercice.get('id'):
+        return f"{theme}|{niveau}|{str(exercice)[:50]}" in completes
+    return False
+
+
 def marquer_exercice_complete(theme, niveau, exercice, domaine=None):
     """Marque un exercice comme complété pour éviter de le reproposer"""
     progression = charger_progression()
@@ -235,8 +296,7 @@ def marquer_exercice_complete(theme, niveau, exercice, domaine=None):
     if 'exercices_completes' not in prog_domaine:
         prog_domaine['exercices_completes'] = []
     
-    exercice_str = str(exercice)[:50]
-    identifiant = f"{theme}|{niveau}|{exercice_str}"
+    identifiant = identifiant_completion(theme, niveau, exercice)
     
     if identifiant not in prog_domaine['exercices_completes']:
         prog_domaine['exercices_completes'].append(identifiant)
@@ -245,21 +305,8 @@ def marquer_exercice_complete(theme, niveau, exercice, domaine=None):
 
 
 def est_exercice_complete(theme, niveau, exercice, domaine=None):
-    """Vérifie si un exercice a déjà été complété"""
-    progression = charger_progression()
-    
-    if domaine is None:
-        domaine = progression.get('domaine_actif', 'python')
-    
-    prog_domaine = obtenir_progression_domaine(domaine)
-    
-    if 'exercices_completes' not in prog_domaine:
-        return False
-    
-    exercice_str = str(exercice)[:50]
-    identifiant = f"{theme}|{niveau}|{exercice_str}"
-    
-    return identifiant in prog_domaine['exercices_completes']
+    """Vérifie si un exercice a déjà été complété (un seul exercice ; pour un lot, voir charger_exercices_completes)"""
+    return est_dans_completes(charger_exercices_completes(domaine), theme, niveau, exercice)
     """Vérifie si un exercice a déjà été complété"""
     progression = charger_progression()
     
@@ -281,7 +328,9 @@ def mettre_a_jour_streak():
         progression['streak_actuel'] = 1
         progression['streak_record'] = 1
         progression['derniere_connexion'] = aujourd_hui
-        sauvegarder_progression(progression)
+        journaliser_evenement(creer_evenement(
+            'streak', streak_actuel=1, streak_record=1, derniere_connexion=aujourd_hui
+        ))
         return 1, True
     
     derniere_connexion = progression.get('derniere_connexion', aujourd_hui)
@@ -310,7 +359,12 @@ def mettre_a_jour_streak():
     # Mise à jour de la date
     progression['derniere_connexion'] = aujourd_hui
     
-    sauvegarder_progression(progression)
+    journaliser_evenement(creer_evenement(
+        'streak',
+        streak_actuel=progression['streak_actuel'],
+        streak_record=progression['streak_record'],
+        derniere_connexion=aujourd_hui
+    ))
     
     return progression['streak_actuel'], nouveau_streak
 
@@ -332,12 +386,7 @@ def afficher_streak():
 
 
 def ajouter_a_historique(theme, niveau, exercice, tentatives, reussi):
-    """Ajoute une entrée dans l'historique des exercices"""
-    progression = charger_progression()
-    
-    if 'historique' not in progression:
-        progression['historique'] = []
-    
+    """Ajoute une entrée dans l'historique des exercices (événement 'historique' ajouté au journal)"""
     # Extraire l'énoncé ou la question
     if isinstance(exercice, dict):
         exercice_text = exercice.get('question', exercice.get('enonce', str(exercice)[:50]))
@@ -353,8 +402,7 @@ def ajouter_a_historique(theme, niveau, exercice, tentatives, reussi):
         'reussi': reussi
     }
     
-    progression['historique'].append(entree)
-    sauvegarder_progression(progression)
+    journaliser_evenement(creer_evenement('historique', entree=entree))
 
 
 def afficher_historique():
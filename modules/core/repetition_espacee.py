@@ -3,8 +3,9 @@ Système de répétition espacée (Spaced Repetition System - SRS)
 Basé sur l'algorithme SM-2 simplifié
 """
 
-from datetime import datetime, timedelta
-from modules.core.progression import charger_progression, sauvegarder_progression, obtenir_domaine_actif, obtenir_progression_domaine
+from datetime import datetime
+from modules.core.progression import charger_progression, sauvegarder_progression, obtenir_domaine_actif, obtenir_progression_domaine, journaliser_evenement
+from modules.core.journal_progression import creer_evenement
 import json
 
 
@@ -78,56 +79,19 @@ def enregistrer_revision(theme, niveau_ex, exercice, reussi, tentatives, domaine
     if domaine is None:
         domaine = obtenir_domaine_actif()
     
-    initialiser_srs(domaine)
-    progression = charger_progression()
-    
     identifiant = obtenir_identifiant_exercice(theme, niveau_ex, exercice)
     
-    # Obtenir le SRS du domaine
-    prog_domaine = progression['domaines'][domaine]
-    
-    # Récupérer ou créer l'entrée SRS
-    if identifiant not in prog_domaine['srs']['exercices']:
-        prog_domaine['srs']['exercices'][identifiant] = {
-            'niveau_srs': 0,
-            'theme': theme,
-            'niveau_exercice': niveau_ex,
-            'prochaine_revision': datetime.now().strftime('%Y-%m-%d'),
-            'historique': []
-        }
-    
-    entree = prog_domaine['srs']['exercices'][identifiant]
-    
-    # Mettre à jour le niveau SRS
-    if reussi:
-        # Ajuster selon le nombre de tentatives
-        if tentatives == 1:
-            # Parfait, on avance de 1 niveau
-            entree['niveau_srs'] = min(entree['niveau_srs'] + 1, 7)
-        elif tentatives <= 2:
-            # Bien, on avance aussi
-            entree['niveau_srs'] = min(entree['niveau_srs'] + 1, 7)
-        else:
-            # Réussi mais avec difficultés, on n'avance pas beaucoup
-            entree['niveau_srs'] = max(1, entree['niveau_srs'])
-    else:
-        # Échec, on redescend
-        entree['niveau_srs'] = max(0, entree['niveau_srs'] - 1)
-    
-    # Calculer la prochaine date de révision
-    intervalle = INTERVALLES.get(entree['niveau_srs'], 120)
-    prochaine_date = datetime.now() + timedelta(days=intervalle)
-    entree['prochaine_revision'] = prochaine_date.strftime('%Y-%m-%d')
-    
-    # Ajouter à l'historique
-    entree['historique'].append({
-        'date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-        'reussi': reussi,
-        'tentatives': tentatives,
-        'niveau_srs': entree['niveau_srs']
-    })
-    
-    sauvegarder_progression(progression)
+    # Le calcul du niveau SRS et de la prochaine date est fait au rejeu
+    # de l'événement (journal_progression._appliquer_revision)
+    journaliser_evenement(creer_evenement(
+        'revision',
+        domaine=domaine,
+        identifiant=identifiant,
+        theme=theme,
+        niveau_exercice=niveau_ex,
+        reussi=reussi,
+        tentatives=tentatives
+    ))
 
 
 def obtenir_exercices_a_reviser(domaine=None):
@@ -0,0 +1,866 @@
+"""
+Pool de processus pré-lancés pour exécuter le code Python des élèves
+
+executer_code_securise exécutait le code avec exec() dans un thread du
+processus de l'API : un `while True:` ne pouvait pas être interrompu et
+consommait un cœur jusqu'au redémarrage du serveur.
+
+Le code est désormais exécuté dans des processus workers :
+- lancés à l'avance (SANDBOX_WORKERS) par `python -m modules.core.sandbox_worker` :
+  pas de démarrage d'interpréteur par exécution. Le worker n'importe que ce
+  module (ni l'application Flask ni le script principal du serveur) et ne
+  reçoit pas les variables d'environnement de l'API (secrets) ;
+- les jobs arrivent par un socket, un worker exécute un job à la fois ;
+- chaque worker tourne sous RLIMIT_AS (SANDBOX_MEMORY_MB) et, pour chaque
+  job, RLIMIT_CPU (durée du job + 1 s de CPU) ;
+- échéance douce : un timer (SIGALRM) interrompt le code à l'échéance et le
+  worker renvoie la sortie déjà produite ;
+- échéance dure : si le worker n'a pas répondu SANDBOX_KILL_GRACE_S après
+  l'échéance (code qui intercepte l'interruption, calcul en C...), il est
+  tué (SIGKILL) et remplacé en arrière-plan ;
+- un worker est recyclé après SANDBOX_MAX_JOBS_PER_WORKER jobs.
+
+Un job porte une liste de vecteurs d'inputs (les cas_test d'un exercice) :
+le code est compilé une fois puis exécuté pour chaque cas dans un
+environnement neuf, et le worker renvoie chaque résultat dès qu'il est
+prêt. À partir de 2 x SANDBOX_BATCH_SPLIT_MIN cas, les cas sont répartis
+entre plusieurs workers.
+
+Le code est compilé dans le processus de l'API via le cache de compilation
+(voir cache_compilation) et le worker reçoit le bytecode avec le code.
+
+Un job peut aussi porter des appels de fonction (tester_fonction) : le code
+est exécuté une fois, puis chaque expression d'appel est évaluée dans son
+espace de noms, sous sa propre échéance.
+
+Sur une plateforme sans resource (Windows), si SANDBOX_POOL_ENABLED vaut
+False, ou si les workers ne démarrent pas, le code est exécuté dans un
+thread comme auparavant.
+"""
+
+import marshal
+import os
+import queue
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager, redirect_stdout, redirect_stderr
+from io import StringIO
+from multiprocessing.connection import Connection
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from modules.core.cache_compilation import compiler_en_cache, message_erreur_compilation
+from modules.core.cache_resultats import executer_lot_memoise
+from modules.core.file_lock import log_file_operation
+
+try:
+    import resource
+except ImportError:
+    # Windows : pas de limites de ressources, exécution en thread
+    resource = None
+
+CONFIG_SANDBOX = {
+    'actif': os.getenv('SANDBOX_POOL_ENABLED', 'True') == 'True',
+    'workers': int(os.getenv('SANDBOX_WORKERS', str(max(2, os.cpu_count() or 1)))),
+    'memoire_mo': int(os.getenv('SANDBOX_MEMORY_MB', '256')),
+    'grace_s': float(os.getenv('SANDBOX_KILL_GRACE_S', '0.5')),
+    'jobs_max': int(os.getenv('SANDBOX_MAX_JOBS_PER_WORKER', '500')),
+    'cas_min_par_worker': int(os.getenv('SANDBOX_BATCH_SPLIT_MIN', '8'))
+}
+
+# Sortie renvoyée au plus (le reste est tronqué)
+TAILLE_SORTIE_MAX = 100000
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Seules variables d'environnement transmises aux workers
+VARIABLES_WORKER = ('PATH', 'LANG', 'LC_ALL', 'LC_CTYPE', 'TMPDIR')
+
+# Premier message d'un worker, une fois ses imports et limites en place
+MESSAGE_PRET = 'pret'
+DELAI_DEMARRAGE_WORKER_S = 15.0
+
+
+class DelaiSandboxDepasse(BaseException):
+    """
+    Échéance douce atteinte dans le worker
+
+    Dérive de BaseException : un `except Exception:` du code de l'élève ne
+    l'intercepte pas.
+    """
+
+
+# ============================================================================
+# EXÉCUTION (dans le worker, ou dans un thread en repli)
+# ============================================================================
+
+def _builtins_autorises(mock_input) -> Dict[str, Any]:
+    """Environnement restreint (whitelist de fonctions autorisées)"""
+    return {
+        'print': print,
+        'input': mock_input,  # input() simulé
+        'len': len,
+        'range': range,
+        'str': str,
+        'int': int,
+        'float': float,
+        'bool': bool,
+        'list': list,
+        'dict': dict,
+        'tuple': tuple,
+        'set': set,
+        'True': True,
+        'False': False,
+        'None': None,
+        'sum': sum,
+        'max': max,
+        'min': min,
+        'abs': abs,
+        'round': round,
+        'enumerate': enumerate,
+        'zip': zip,
+        'map': map,
+        'filter': filter,
+        'sorted': sorted,
+        'reversed': reversed,
+        'any': any,
+        'all': all,
+        'type': type,
+        'isinstance': isinstance,
+        'chr': chr,
+        'ord': ord,
+        'pow': pow,
+        'divmod': divmod,
+    }
+
+
+def message_delai(timeout_secondes) -> str:
+    return (f'Execution Timed Out: Votre code a depasse le temps maximum autorise '
+            f'({timeout_secondes}s). Verifiez les boucles infinies.')
+
+
+def resultat_delai(timeout_secondes) -> Dict[str, Any]:
+    return {'success': False, 'output': '', 'error': message_delai(timeout_secondes),
+            'timeout': True, 'execution_time': timeout_secondes}
+
+
+def resultat_occupe() -> Dict[str, Any]:
+    """Aucun worker libéré à temps : le code n'a pas été exécuté"""
+    return {'success': False, 'output': '',
+            'error': "Serveur occupe : aucun processus d'execution disponible, reessayez dans quelques instants",
+            'timeout': False, 'occupe': True, 'execution_time': 0.0}
+
+
+def resultat_non_execute() -> Dict[str, Any]:
+    return {'success': False, 'output': '', 'error': 'Non execute : un cas precedent a depasse le temps maximum',
+            'timeout': False, 'execution_time': 0.0}
+
+
+def _alarme(signum, frame):
+    raise DelaiSandboxDepasse()
+
+
+def _environnement(test_inputs: List[str]) -> Dict[str, Any]:
+    """Espace de noms neuf : builtins autorisés et input() simulé"""
+    input_index = [0]
+
+    def mock_input(prompt=""):
+        """Fonction input() simulée qui retourne des valeurs prédéfinies"""
+        if prompt:
+            print(prompt, end='')
+        if input_index[0] < len(test_inputs):
+            value = test_inputs[input_index[0]]
+            input_index[0] += 1
+            print(value)  # Afficher la valeur comme si l'utilisateur l'avait saisie
+            return value
+        return ""
+
+    return {'__builtins__': _builtins_autorises(mock_input)}
+
+
+@contextmanager
+def _limites(recursion_limitee: bool, timeout_secondes: Optional[float]):
+    """Limite de récursion et échéance douce le temps d'une exécution"""
+    # Limiter la profondeur de récursion (100 niveaux au-dessus de l'appelant)
+    ancienne_limite = sys.getrecursionlimit()
+    if recursion_limitee:
+        profondeur, frame = 0, sys._getframe()
+        while frame is not None:
+            profondeur, frame = profondeur + 1, frame.f_back
+        sys.setrecursionlimit(profondeur + 100)
+
+    alarme = (
+        timeout_secondes and hasattr(signal, 'setitimer')
+        and threading.current_thread() is threading.main_thread()
+    )
+    if alarme:
+        ancien_handler = signal.signal(signal.SIGALRM, _alarme)
+        signal.setitimer(signal.ITIMER_REAL, timeout_secondes)
+    try:
+        yield
+    finally:
+        if alarme:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, ancien_handler)
+        sys.setrecursionlimit(ancienne_limite)
+
+
+def _message_erreur(e: BaseException, timeout_secondes: Optional[float]) -> str:
+    """Message d'erreur présenté à l'élève"""
+    if isinstance(e, DelaiSandboxDepasse):
+        return message_delai(timeout_secondes)
+    if isinstance(e, RecursionError):
+        return 'RecursionError: Recursion trop profonde (maximum 100 niveaux)'
+    if isinstance(e, MemoryError):
+        return 'MemoryError: Memoire insuffisante - Votre code consomme trop de RAM'
+    if isinstance(e, KeyboardInterrupt):
+        return 'Execution interrompue'
+    return f'Erreur d\'execution : {type(e).__name__}: {str(e)}'
+
+
+def _executer_objet(code_objet, recursion_limitee: bool, environnement: Dict[str, Any],
+                    timeout_secondes: Optional[float]) -> Dict[str, Any]:
+    """Exécute un code déjà compilé dans l'espace de noms fourni"""
+    stdout_capture = StringIO()
+    stderr_capture = StringIO()
+    debut = time.perf_counter()
+
+    def resultat(success, error, timeout=False):
+        return {
+            'success': success,
+            'output': stdout_capture.getvalue()[:TAILLE_SORTIE_MAX],
+            'error': error,
+            'timeout': timeout,
+            'execution_time': time.perf_counter() - debut
+        }
+
+    try:
+        with _limites(recursion_limitee, timeout_secondes):
+            with redirect_stdout(stdout_capture), redirect_stderr(stderr_capture):
+                exec(code_objet, environnement)
+        return resultat(True, stderr_capture.getvalue()[:TAILLE_SORTIE_MAX])
+    except (Exception, DelaiSandboxDepasse, KeyboardInterrupt) as e:
+        return resultat(False, _message_erreur(e, timeout_secondes),
+                        timeout=isinstance(e, (DelaiSandboxDepasse, KeyboardInterrupt)))
+
+
+def _erreur_compilation(message: str) -> Dict[str, Any]:
+    return {'success': False, 'output': '', 'error': message, 'timeout': False, 'execution_time': 0.0}
+
+
+def _code_objet(code: str, bytecode: Optional[bytes]):
+    """Objet code : bytecode du cache de compilation (voir cache_compilation), sinon compile()"""
+    if bytecode is not None:
+        return marshal.loads(bytecode)
+    return compile(code, '<string>', 'exec')
+
+
+def executer_lot(code: str, liste_inputs: List[List[str]], timeout_secondes: Optional[float] = None,
+                 bytecode: Optional[bytes] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Compile le code une fois et l'exécute pour chaque vecteur d'inputs
+
+    Chaque exécution part d'un environnement neuf. Après un cas qui dépasse
+    l'échéance, les cas suivants ne sont pas exécutés.
+
+    Args:
+        code: Code Python (déjà passé au filtre de sécurité)
+        liste_inputs: Un vecteur de valeurs retournées par input() par cas
+        timeout_secondes: Échéance douce par cas (SIGALRM, thread principal uniquement)
+        bytecode: Code déjà compilé (marshal), sinon le code est compilé ici
+
+    Yields:
+        dict: {'success', 'output', 'error', 'timeout', 'execution_time'} par cas
+    """
+    try:
+        code_objet = _code_objet(code, bytecode)
+    except (SyntaxError, ValueError) as e:
+        for _ in liste_inputs:
+            yield _erreur_compilation(message_erreur_compilation(e))
+        return
+
+    recursion_limitee = 'def ' in code
+    interrompu = False
+    for test_inputs in liste_inputs:
+        if interrompu:
+            yield resultat_non_execute()
+            continue
+        resultat = _executer_objet(code_objet, recursion_limitee, _environnement(test_inputs), timeout_secondes)
+        interrompu = resultat['timeout']
+        yield resultat
+
+
+def executer_code(code: str, test_inputs: List[str], timeout_secondes: Optional[float] = None) -> Dict[str, Any]:
+    """Exécute le code pour un seul vecteur d'inputs (voir executer_lot)"""
+    return next(executer_lot(code, [test_inputs], timeout_secondes))
+
+
+_TYPES_TRANSPORTABLES = (int, float, str, bool, type(None))
+
+
+class _Repr(str):
+    """repr d'une valeur non transportable"""
+
+
+def _transportable(valeur: Any, profondeur: int = 0) -> Any:
+    """
+    Valeur renvoyée au parent telle quelle si elle n'est faite que de types
+    JSON (pas d'objet défini par l'élève à dépickler), sinon son repr
+    """
+    if type(valeur) in _TYPES_TRANSPORTABLES:
+        return valeur
+    if profondeur < 20:
+        if type(valeur) in (list, tuple):
+            elements = [_transportable(element, profondeur + 1) for element in valeur]
+            if all(not isinstance(element, _Repr) for element in elements):
+                return type(valeur)(elements)
+        elif type(valeur) is dict:
+            paires = [(_transportable(k, profondeur + 1), _transportable(v, profondeur + 1)) for k, v in valeur.items()]
+            if all(not isinstance(element, _Repr) for paire in paires for element in paire):
+                return dict(paires)
+    return _Repr(repr(valeur)[:1000])
+
+
+def _resultat_appel(numero: int, expression: str, attendu: Any, environnement: Dict[str, Any],
+                    recursion_limitee: bool, timeout_secondes: Optional[float]) -> Dict[str, Any]:
+    """Évalue une expression d'appel et la compare au résultat attendu, sous échéance"""
+    detail = {'test': numero, 'input': expression, 'expected': attendu}
+    debut = time.perf_counter()
+    try:
+        code_appel = compile(expression, '<test>', 'eval')
+        with _limites(recursion_limitee, timeout_secondes):
+            # Sortie de la fonction ignorée ; la comparaison peut appeler un
+            # __eq__ de l'élève : elle se fait aussi sous l'échéance
+            with redirect_stdout(StringIO()), redirect_stderr(StringIO()):
+                obtenu = eval(code_appel, environnement)
+                reussi = bool(obtenu == attendu)
+                obtenu = _transportable(obtenu)
+    except (Exception, DelaiSandboxDepasse, KeyboardInterrupt) as e:
+        detail.update(success=False, error=_message_erreur(e, timeout_secondes),
+                      timeout=isinstance(e, DelaiSandboxDepasse))
+    else:
+        detail.update(got=str(obtenu) if isinstance(obtenu, _Repr) else obtenu, success=reussi)
+        if not reussi:
+            detail['error'] = f'Attendu: {attendu}, Obtenu: {obtenu}'
+    detail['execution_time'] = time.perf_counter() - debut
+    return detail
+
+
+def detail_appel_en_echec(numero: int, expression: str, attendu: Any, erreur: str) -> Dict[str, Any]:
+    """Détail d'un appel non évalué"""
+    return {'test': numero, 'input': expression, 'expected': attendu, 'success': False,
+            'error': erreur, 'execution_time': 0.0}
+
+
+def executer_appels(code: str, appels: List[Tuple[str, Any]], timeout_secondes: Optional[float] = None,
+                    bytecode: Optional[bytes] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Compile et exécute le code une fois, puis évalue chaque appel dans son espace de noms
+
+    Args:
+        code: Code Python définissant les fonctions (déjà passé au filtre de sécurité)
+        appels: [(expression, resultat_attendu), ...] ex: [("carre(3)", 9)]
+        timeout_secondes: Échéance douce de l'exécution du code, puis de chaque appel
+        bytecode: Code déjà compilé (marshal), sinon le code est compilé ici
+
+    Yields:
+        dict: Le résultat de l'exécution du code (format de executer_lot), puis
+              un détail par appel {'test', 'input', 'expected', 'got', 'success',
+              'error', 'execution_time'}
+    """
+    try:
+        code_objet = _code_objet(code, bytecode)
+    except (SyntaxError, ValueError) as e:
+        corps = _erreur_compilation(message_erreur_compilation(e))
+    else:
+        environnement = _environnement([])
+        recursion_limitee = 'def ' in code
+        corps = _executer_objet(code_objet, recursion_limitee, environnement, timeout_secondes)
+    yield corps
+
+    for numero, (expression, attendu) in enumerate(appels, 1):
+        if not corps['success']:
+            yield detail_appel_en_echec(numero, expression, attendu, corps['error'])
+        else:
+            yield _resultat_appel(numero, expression, attendu, environnement, recursion_limitee, timeout_secondes)
+
+
+def _completer(resultats: list, total: int, echec: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Résultats reçus, puis l'échec du cas en cours, puis les cas non exécutés"""
+    if echec.get('occupe'):
+        # Rien n'a été exécuté : chaque cas reçoit le même refus
+        return [dict(echec) for _ in range(total)]
+    if len(resultats) < total:
+        resultats.append(echec)
+    resultats.extend(resultat_non_execute() for _ in range(total - len(resultats)))
+    return resultats
+
+
+def _en_thread(generateur: Iterator[Dict[str, Any]], total: int, timeout_secondes: float) -> List[Dict[str, Any]]:
+    """Repli sans processus : thread daemon abandonné à l'échéance (non interruptible)"""
+    resultats = []
+
+    def executer():
+        for resultat in generateur:
+            resultats.append(resultat)
+
+    thread = threading.Thread(target=executer, daemon=True)
+    thread.start()
+    thread.join(timeout=timeout_secondes * total)
+    if thread.is_alive():
+        return _completer(list(resultats), total, resultat_delai(timeout_secondes))
+    return resultats
+
+
+# ============================================================================
+# WORKER
+# ============================================================================
+
+def _limiter_cpu(secondes: float):
+    """RLIMIT_CPU du prochain job : CPU déjà consommé par le worker + budget"""
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    consomme = usage.ru_utime + usage.ru_stime
+    _, maximum = resource.getrlimit(resource.RLIMIT_CPU)
+    limite = int(consomme + secondes) + 1
+    if maximum != resource.RLIM_INFINITY:
+        limite = min(limite, maximum)
+    resource.setrlimit(resource.RLIMIT_CPU, (limite, maximum))
+
+
+# Types de job : générateur et nombre de messages renvoyés
+_JOBS = {
+    'programme': (executer_lot, lambda donnees: len(donnees)),
+    'appels': (executer_appels, lambda donnees: len(donnees) + 1)
+}
+
+
+def _boucle_worker(connexion, memoire_mo: int):
+    """
+    Processus worker : reçoit (type, code, bytecode, donnees, timeout) et
+    renvoie un message par cas, au fil de l'exécution
+    """
+    # Ctrl+C dans le terminal du serveur : c'est le parent qui arrête les workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if memoire_mo > 0:
+        octets = memoire_mo * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (octets, octets))
+    connexion.send(MESSAGE_PRET)
+    while True:
+        try:
+            job = connexion.recv()
+        except (EOFError, OSError):
+            return
+        if job is None:
+            return
+        type_job, code, bytecode, donnees, timeout_secondes = job
+        executer, nombre_messages = _JOBS[type_job]
+        total = nombre_messages(donnees)
+        _limiter_cpu(timeout_secondes * total)
+        envoyes = 0
+        try:
+            for resultat in executer(code, donnees, timeout_secondes, bytecode):
+                connexion.send(resultat)
+                envoyes += 1
+        except DelaiSandboxDepasse:
+            # Alarme arrivée entre la fin du code et son désarmement
+            connexion.send(resultat_delai(timeout_secondes))
+            envoyes += 1
+        for _ in range(envoyes, total):
+            connexion.send(resultat_non_execute())
+
+
+def _environnement_worker() -> Dict[str, str]:
+    """Environnement du worker : VARIABLES_WORKER et le chemin du projet"""
+    environnement = {nom: os.environ[nom] for nom in VARIABLES_WORKER if nom in os.environ}
+    environnement['PYTHONPATH'] = BASE_DIR
+    return environnement
+
+
+class _Worker:
+    """
+    Processus worker (python -m modules.core.sandbox_worker) et son
+    extrémité de socket
+
+    Le processus est lancé par le constructeur ; attendre_pret() attend
+    qu'il soit prêt à recevoir des jobs.
+    """
+
+    def __init__(self, memoire_mo: int):
+        parent, enfant = socket.socketpair()
+        try:
+            self.processus = subprocess.Popen(
+                [sys.executable, '-m', 'modules.core.sandbox_worker', str(enfant.fileno()), str(memoire_mo)],
+                cwd=BASE_DIR,
+                env=_environnement_worker(),
+                pass_fds=(enfant.fileno(),),
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL
+            )
+        except BaseException:
+            parent.close()
+            raise
+        finally:
+            enfant.close()
+        self.connexion = Connection(parent.detach())
+        self.jobs = 0
+
+    def attendre_pret(self, timeout_s: float):
+        """Attend MESSAGE_PRET ; tue le worker et lève RuntimeError s'il ne vient pas"""
+        try:
+            if self.connexion.poll(timeout_s) and self.connexion.recv() == MESSAGE_PRET:
+                return
+        except (EOFError, OSError):
+            pass
+        self.tuer()
+        raise RuntimeError(f"Le worker de la sandbox n'a pas demarre (code {self.processus.returncode})")
+
+    def en_vie(self) -> bool:
+        return self.processus.poll() is None
+
+    def code_sortie(self, attente_s: float) -> Optional[int]:
+        """Code de sortie (négatif : signal), None si le worker tourne encore après attente_s"""
+        try:
+            return self.processus.wait(attente_s)
+        except subprocess.TimeoutExpired:
+            return None
+
+    def tuer(self):
+        try:
+            self.processus.kill()
+            self.code_sortie(1.0)
+        finally:
+            self.connexion.close()
+
+    def arreter(self):
+        try:
+            self.connexion.send(None)
+        except OSError:
+            pass
+        if self.code_sortie(1.0) is None:
+            self.processus.kill()
+            self.code_sortie(1.0)
+        self.connexion.close()
+
+
+# ============================================================================
+# POOL
+# ============================================================================
+
+class PoolSandbox:
+    """
+    Workers d'exécution pré-lancés
+
+    Args:
+        workers: Nombre de processus
+        memoire_mo: RLIMIT_AS de chaque worker (0 : pas de limite)
+        grace_s: Délai après l'échéance avant de tuer le worker
+        jobs_max: Jobs exécutés par un worker avant son remplacement
+        cas_min_par_worker: Nombre minimal de cas par worker quand un lot est réparti
+    """
+
+    def __init__(self, workers: int = 2, memoire_mo: int = 256, grace_s: float = 0.5, jobs_max: int = 500,
+                 cas_min_par_worker: int = 8):
+        self.nb_workers = max(1, workers)
+        self.memoire_mo = memoire_mo
+        self.grace_s = grace_s
+        self.jobs_max = max(1, jobs_max)
+        self.cas_min_par_worker = max(1, cas_min_par_worker)
+        self._libres: 'queue.Queue[_Worker]' = queue.Queue()
+        self._lock = threading.Lock()
+        self._demarre = False
+        self._erreur: Optional[str] = None
+        self._arret = False
+        self._stats = {'jobs': 0, 'delais': 0, 'occupe': 0, 'tues': 0, 'crashs': 0, 'recycles': 0}
+
+    def demarrer(self):
+        """
+        Lance les workers (au premier job) et attend qu'ils soient prêts
+
+        Raises:
+            RuntimeError: Un worker n'a pas démarré ; le pool reste inutilisable
+        """
+        with self._lock:
+            if self._erreur is not None:
+                raise RuntimeError(self._erreur)
+            if self._demarre:
+                return
+            workers = []
+            try:
+                for _ in range(self.nb_workers):
+                    workers.append(_Worker(self.memoire_mo))
+                for worker in workers:
+                    worker.attendre_pret(DELAI_DEMARRAGE_WORKER_S)
+            except Exception as e:
+                for worker in workers:
+                    worker.tuer()
+                self._erreur = f"Demarrage du pool sandbox impossible : {e}"
+                raise RuntimeError(self._erreur) from e
+            self._demarre = True
+        for worker in workers:
+            self._libres.put(worker)
+
+    def _remplacer(self, worker: _Worker):
+        """Remplace un worker tué ou recyclé, hors du chemin de la requête"""
+        def remplacer():
+            worker.tuer()
+            if self._arret:
+                return
+            try:
+                nouveau = _Worker(self.memoire_mo)
+                nouveau.attendre_pret(DELAI_DEMARRAGE_WORKER_S)
+            except Exception as e:
+                log_file_operation("SANDBOX", "remplacement", success=False, error=str(e))
+                return
+            self._libres.put(nouveau)
+
+        threading.Thread(target=remplacer, name='sandbox-remplacement', daemon=True).start()
+
+    def _compter(self, cle: str):
+        with self._lock:
+            self._stats[cle] += 1
+
+    def _prendre(self, timeout_s: float) -> Optional[_Worker]:
+        """Worker libre et vivant ; None si aucun ne se libère à temps"""
+        echeance = time.monotonic() + timeout_s
+        while True:
+            try:
+                worker = self._libres.get(timeout=max(0.0, echeance - time.monotonic()))
+            except queue.Empty:
+                return None
+            if worker.en_vie():
+                return worker
+            # Worker mort entre deux jobs (OOM killer...) : on en prend un autre
+            self._compter('crashs')
+            self._remplacer(worker)
+
+    def _executer_job(self, type_job: str, code: str, bytecode: Optional[bytes], donnees: list,
+                      timeout_secondes: float) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """
+        Envoie un job à un worker et reçoit ses messages
+
+        Returns:
+            tuple: (messages reçus, None) ou (messages reçus avant l'échec,
+                   résultat d'échec du message en cours)
+        """
+        total = _JOBS[type_job][1](donnees)
+        # Tous les workers occupés : on attend une place, échéance comprise
+        worker = self._prendre(timeout_secondes + self.grace_s)
+        if worker is None:
+            self._compter('occupe')
+            return [], resultat_occupe()
+        self._compter('jobs')
+
+        resultats = []
+        try:
+            worker.connexion.send((type_job, code, bytecode, donnees, timeout_secondes))
+            while len(resultats) < total:
+                # L'échéance de chaque cas court à partir de la fin du précédent
+                if not worker.connexion.poll(timeout_secondes + self.grace_s):
+                    # Le code n'a pas rendu la main : seul SIGKILL l'arrête
+                    self._compter('tues')
+                    self._remplacer(worker)
+                    return resultats, resultat_delai(timeout_secondes)
+                resultats.append(worker.connexion.recv())
+        except (EOFError, OSError):
+            # Worker mort pendant le job : RLIMIT_CPU (SIGXCPU), mémoire, crash
+            code_sortie = worker.code_sortie(0.5)
+            hors_cpu = code_sortie == -signal.SIGXCPU
+            self._compter('delais' if hors_cpu else 'crashs')
+            self._remplacer(worker)
+            if hors_cpu:
+                return resultats, resultat_delai(timeout_secondes)
+            return resultats, {
+                'success': False,
+                'output': '',
+                'error': f"Execution interrompue : le processus d'execution s'est arrete (code {code_sortie})",
+                'timeout': False,
+                'execution_time': 0.0
+            }
+
+        if any(resultat.get('timeout') for resultat in resultats):
+            self._compter('delais')
+        worker.jobs += 1
+        if worker.jobs >= self.jobs_max:
+            self._compter('recycles')
+            self._remplacer(worker)
+        else:
+            self._libres.put(worker)
+        return resultats, None
+
+    def _programme(self, code: str, liste_inputs: List[List[str]], timeout_secondes: float,
+                   bytecode: Optional[bytes]) -> List[Dict[str, Any]]:
+        resultats, echec = self._executer_job('programme', code, bytecode, [list(inputs) for inputs in liste_inputs],
+                                              timeout_secondes)
+        return _completer(resultats, len(liste_inputs), echec) if echec else resultats
+
+    def executer_lot(self, code: str, liste_inputs: List[List[str]], timeout_secondes: float,
+                     bytecode: Optional[bytes] = None) -> List[Dict[str, Any]]:
+        """
+        Exécute le code pour chaque vecteur d'inputs
+
+        Un seul job (le code est compilé une fois), ou, à partir de
+        2 x cas_min_par_worker cas, un job par worker en parallèle.
+
+        Returns:
+            list: {'success', 'output', 'error', 'timeout', 'execution_time'} par cas
+        """
+        self.demarrer()
+        total = len(liste_inputs)
+        parts = min(self.nb_workers, total // self.cas_min_par_worker)
+        if parts <= 1:
+            return self._programme(code, liste_inputs, timeout_secondes, bytecode) if total else []
+
+        taille = -(-total // parts)
+        morceaux = [liste_inputs[i:i + taille] for i in range(0, total, taille)]
+        resultats = [None] * len(morceaux)
+
+        def executer(numero):
+            resultats[numero] = self._programme(code, morceaux[numero], timeout_secondes, bytecode)
+
+        threads = [threading.Thread(target=executer, args=(numero,), daemon=True) for numero in range(1, len(morceaux))]
+        for thread in threads:
+            thread.start()
+        executer(0)
+        for thread in threads:
+            thread.join()
+        return [resultat for morceau in resultats for resultat in morceau]
+
+    def executer(self, code: str, test_inputs: List[str], timeout_secondes: float,
+                 bytecode: Optional[bytes] = None) -> Dict[str, Any]:
+        """Exécute le code dans un worker libre"""
+        return self.executer_lot(code, [test_inputs], timeout_secondes, bytecode)[0]
+
+    def executer_appels(self, code: str, appels: List[Tuple[str, Any]], timeout_secondes: float,
+                        bytecode: Optional[bytes] = None) -> Dict[str, Any]:
+        """
+        Exécute le code une fois puis évalue chaque appel dans un worker
+
+        Returns:
+            dict: {'corps': résultat de l'exécution du code, 'details': un détail par appel}
+        """
+        self.demarrer()
+        messages, echec = self._executer_job('appels', code, bytecode, [list(appel) for appel in appels],
+                                             timeout_secondes)
+        return _resultat_appels(messages, echec, appels)
+
+    def arreter(self):
+        """Arrête les workers libres (les jobs en cours se terminent)"""
+        self._arret = True
+        while True:
+            try:
+                self._libres.get_nowait().arreter()
+            except queue.Empty:
+                return
+
+    def stats(self) -> Dict[str, Any]:
+        """Jobs, échéances dépassées, refus faute de worker libre, workers tués, crashs, recyclages"""
+        with self._lock:
+            return dict(self._stats, workers=self.nb_workers, libres=self._libres.qsize())
+
+
+# ============================================================================
+# POOL GLOBAL
+# ============================================================================
+
+_pool: Optional[PoolSandbox] = None
+_pool_lock = threading.Lock()
+
+
+def obtenir_pool_sandbox() -> Optional[PoolSandbox]:
+    """Pool global, ou None (SANDBOX_POOL_ENABLED=False ou plateforme sans resource)"""
+    global _pool
+    if not CONFIG_SANDBOX['actif'] or resource is None:
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = PoolSandbox(
+                    workers=CONFIG_SANDBOX['workers'],
+                    memoire_mo=CONFIG_SANDBOX['memoire_mo'],
+                    grace_s=CONFIG_SANDBOX['grace_s'],
+                    jobs_max=CONFIG_SANDBOX['jobs_max'],
+                    cas_min_par_worker=CONFIG_SANDBOX['cas_min_par_worker']
+                )
+    return _pool
+
+
+def _resultat_appels(messages: List[Dict[str, Any]], echec: Optional[Dict[str, Any]],
+                     appels: List[Tuple[str, Any]]) -> Dict[str, Any]:
+    """Résultat du code et détail de chaque appel, complétés après un échec"""
+    corps = messages[0] if messages else echec
+    details = []
+    for numero, (expression, attendu) in enumerate(appels, 1):
+        if numero < len(messages) and 'test' in messages[numero]:
+            details.append(messages[numero])
+        elif numero < len(messages) or (echec is not None and (numero == len(messages) or echec.get('occupe'))):
+            # Message de repli (alarme tardive, appel non exécuté) ou échec du job
+            # (serveur occupé : aucun appel n'a été exécuté)
+            message = messages[numero] if numero < len(messages) else echec
+            details.append(dict(detail_appel_en_echec(numero, expression, attendu, message['error']),
+                                timeout=message['timeout']))
+        else:
+            details.append(detail_appel_en_echec(numero, expression, attendu, resultat_non_execute()['error']))
+    return {'corps': corps, 'details': details}
+
+
+def executer_lot_en_sandbox(code: str, liste_inputs: List[List[str]], timeout_secondes: float) -> List[Dict[str, Any]]:
+    """
+    Exécute le code pour chaque vecteur d'inputs dans le pool, ou dans un thread en repli
+
+    Le code est compilé dans ce processus via le cache de compilation : une
+    erreur de syntaxe est rendue sans passer par un worker. Si le cache de
+    résultats est actif (voir cache_resultats), seuls les vecteurs d'inputs
+    absents du cache sont exécutés.
+    """
+    bytecode, erreur = compiler_en_cache(code)
+    if erreur is not None:
+        return [_erreur_compilation(erreur) for _ in liste_inputs]
+    return executer_lot_memoise(
+        code, liste_inputs, 'python',
+        lambda manquants: _executer_lot_compile(code, manquants, timeout_secondes, bytecode)
+    )
+
+
+def _executer_lot_compile(code: str, liste_inputs: List[List[str]], timeout_secondes: float,
+                          bytecode: bytes) -> List[Dict[str, Any]]:
+    pool = obtenir_pool_sandbox()
+    if pool is not None:
+        try:
+            return pool.executer_lot(code, liste_inputs, timeout_secondes, bytecode)
+        except Exception as e:
+            # Workers impossibles à lancer (limite de processus, démarrage en échec...) : repli
+            log_file_operation("SANDBOX", "pool", success=False, error=str(e))
+    return _en_thread(executer_lot(code, liste_inputs, bytecode=bytecode), len(liste_inputs), timeout_secondes)
+
+
+def executer_en_sandbox(code: str, test_inputs: List[str], timeout_secondes: float) -> Dict[str, Any]:
+    """Exécute le code pour un seul vecteur d'inputs (voir executer_lot_en_sandbox)"""
+    return executer_lot_en_sandbox(code, [test_inputs], timeout_secondes)[0]
+
+
+def executer_appels_en_sandbox(code: str, appels: List[Tuple[str, Any]], timeout_secondes: float) -> Dict[str, Any]:
+    """
+    Exécute le code une fois puis évalue chaque appel (voir executer_appels),
+    dans le pool ou dans un thread en repli
+
+    Returns:
+        dict: {'corps': résultat de l'exécution du code, 'details': un détail par appel}
+    """
+    bytecode, erreur = compiler_en_cache(code)
+    if erreur is not None:
+        return {
+            'corps': _erreur_compilation(erreur),
+            'details': [detail_appel_en_echec(numero, expression, attendu, erreur)
+                        for numero, (expression, attendu) in enumerate(appels, 1)]
+        }
+    pool = obtenir_pool_sandbox()
+    if pool is not None:
+        try:
+            return pool.executer_appels(code, appels, timeout_secondes, bytecode)
+        except Exception as e:
+            log_file_operation("SANDBOX", "pool", success=False, error=str(e))
+    return _resultat_appels(_en_thread(executer_appels(code, appels, bytecode=bytecode), len(appels) + 1,
+                                       timeout_secondes), None, appels)
@@ -0,0 +1,22 @@
+"""
+Point d'entrée d'un worker de la sandbox (voir sandbox.PoolSandbox)
+
+    python -m modules.core.sandbox_worker <descripteur du socket> <mémoire en Mo>
+
+Lancé par le pool avec un environnement réduit : le processus n'importe que
+la sandbox, jamais le script principal ni l'application Flask.
+"""
+
+import sys
+from multiprocessing.connection import Connection
+
+from modules.core.sandbox import _boucle_worker
+
+
+def main():
+    descripteur, memoire_mo = int(sys.argv[1]), int(sys.argv[2])
+    _boucle_worker(Connection(descripteur), memoire_mo)
+
+
+if __name__ == '__main__':
+    main()
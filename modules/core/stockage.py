@@ -0,0 +1,690 @@
+"""
+Moteurs de stockage pour les utilisateurs, les progressions et la banque d'exercices
+
+Deux moteurs sont disponibles :
+- json   : fichiers JSON via file_lock (comportement historique)
+- sqlite : base SQLite en mode WAL (écritures par ligne, lectures indexées)
+
+Le moteur est choisi via la variable d'environnement STORAGE_BACKEND.
+Migration one-shot des fichiers JSON existants :
+    python -m modules.core.stockage migrer
+Import de banque_exercices.json dans les shards (moteur json) :
+    python -m modules.core.stockage sharder
+Conversion du format des fichiers JSON (voir JSON_STORAGE_FORMAT) :
+    python -m modules.core.stockage convertir compact
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from modules.core.file_lock import atomic_json_writer, safe_json_read, safe_json_update, convertir_fichier_json
+from modules.core.banque_shards import BanqueShardee
+
+# Chemins absolus basés sur le répertoire backend
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+FICHIER_UTILISATEURS = os.path.join(BASE_DIR, 'utilisateurs.json')
+FICHIER_BANQUE = os.path.join(BASE_DIR, 'banque_exercices.json')
+DOSSIER_BANQUE = os.getenv('BANK_SHARDS_DIR', os.path.join(BASE_DIR, 'banque'))
+DOSSIER_PROGRESSIONS = os.path.join(BASE_DIR, 'progressions')
+FICHIER_SQLITE = os.getenv('STORAGE_SQLITE_PATH', os.path.join(BASE_DIR, 'pyquest.db'))
+
+MOTEURS_DISPONIBLES = ('json', 'sqlite')
+
+
+def cle_progression(fichier: str) -> str:
+    """
+    Calcule la clé d'une progression à partir de son chemin de fichier
+
+    Les chemins enregistrés dans utilisateurs.json peuvent provenir de Windows,
+    on ne garde donc que le nom du fichier sans extension.
+    """
+    nom = os.path.basename(fichier.replace('\\', '/'))
+    return os.path.splitext(nom)[0]
+
+
+class MoteurStockage:
+    """Interface commune des moteurs de stockage"""
+
+    nom = ''
+
+    def charger_utilisateurs(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def sauvegarder_utilisateurs(self, utilisateurs: Dict[str, Any]):
+        """Écrit un ensemble complet d'utilisateurs (initialisation, migration)"""
+        raise NotImplementedError
+
+    def ajouter_utilisateur(self, nom_utilisateur: str, donnees: Dict[str, Any]) -> bool:
+        """Ajoute un utilisateur s'il n'existe pas encore, retourne True si ajouté"""
+        raise NotImplementedError
+
+    def sauvegarder_utilisateur(self, nom_utilisateur: str, donnees: Dict[str, Any]):
+        """Crée ou remplace un seul utilisateur"""
+        raise NotImplementedError
+
+    def supprimer_utilisateur(self, nom_utilisateur: str) -> bool:
+        """Supprime un utilisateur (et le désactive s'il était actif), retourne True s'il existait"""
+        raise NotImplementedError
+
+    def definir_utilisateur_actif(self, nom_utilisateur: Optional[str]):
+        raise NotImplementedError
+
+    def obtenir_utilisateur(self, nom_utilisateur: str) -> Optional[Dict[str, Any]]:
+        return self.charger_utilisateurs()['utilisateurs'].get(nom_utilisateur)
+
+    def email_utilise(self, email: str) -> bool:
+        for user_data in self.charger_utilisateurs()['utilisateurs'].values():
+            if isinstance(user_data, dict) and user_data.get('email') == email:
+                return True
+        return False
+
+    def charger_progression(self, fichier: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def sauvegarder_progression(self, fichier: str, progression: Dict[str, Any]):
+        raise NotImplementedError
+
+    def supprimer_progression(self, fichier: str):
+        raise NotImplementedError
+
+    def charger_banque(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def sauvegarder_banque(self, banque: Dict[str, Any]):
+        raise NotImplementedError
+
+    def charger_banque_theme(self, cle_banque: str) -> Dict[str, Any]:
+        """Niveaux d'une seule clé "domaine:theme" ({} si absente)"""
+        return self.charger_banque().get(cle_banque, {})
+
+    def ajouter_exercice(self, cle_banque: str, niveau: str, exercice: Dict[str, Any]) -> bool:
+        """Ajoute un exercice s'il n'existe pas déjà (par ID), retourne True si ajouté"""
+        return self.ajouter_exercices(cle_banque, niveau, [exercice]) == 1
+
+    def ajouter_exercices(self, cle_banque: str, niveau: str, exercices: List[Dict[str, Any]]) -> int:
+        """Ajoute en une seule écriture les exercices absents (par ID), retourne le nombre ajouté"""
+        banque = self.charger_banque()
+        if cle_banque not in banque:
+            banque[cle_banque] = {"1": [], "2": [], "3": []}
+        if niveau not in banque[cle_banque]:
+            banque[cle_banque][niveau] = []
+
+        existants = {ex.get('id') for ex in banque[cle_banque][niveau]}
+        ajoutes = 0
+        for exercice in exercices:
+            if exercice.get('id') in existants:
+                continue
+            existants.add(exercice.get('id'))
+            banque[cle_banque][niveau].append(exercice)
+            ajoutes += 1
+
+        if ajoutes:
+            self.sauvegarder_banque(banque)
+        return ajoutes
+
+    def obtenir_exercice_par_id(self, exercice_id: str) -> Optional[Dict[str, Any]]:
+        for theme in self.charger_banque().values():
+            for niveau in theme.values():
+                for exercice in niveau:
+                    if exercice.get('id') == exercice_id:
+                        return exercice
+        return None
+
+    def preparer(self):
+        """Prépare les structures annexes au démarrage (index...)"""
+        pass
+
+
+class MoteurJSON(MoteurStockage):
+    """Moteur historique : un document JSON par fichier, via file_lock"""
+
+    nom = 'json'
+
+    def __init__(self):
+        # Banque répartie en un fichier par clé "domaine:theme"
+        self.banque = BanqueShardee(DOSSIER_BANQUE, FICHIER_BANQUE)
+
+    def preparer(self):
+        # Migration de l'ancienne banque et index id -> exercice
+        self.banque.preparer()
+
+    def charger_utilisateurs(self):
+        if not os.path.exists(FICHIER_UTILISATEURS):
+            return {'utilisateur_actif': None, 'utilisateurs': {}}
+
+        with safe_json_read(FICHIER_UTILISATEURS) as data:
+            # S'assurer que la structure est valide
+            if 'utilisateur_actif' not in data:
+                data['utilisateur_actif'] = None
+            if 'utilisateurs' not in data:
+                data['utilisateurs'] = {}
+            return data
+
+    def sauvegarder_utilisateurs(self, utilisateurs):
+        with atomic_json_writer(FICHIER_UTILISATEURS) as writer:
+            writer(utilisateurs)
+
+    def _modifier_utilisateurs(self, modifier):
+        """
+        Applique modifier(data) à utilisateurs.json sous verrou exclusif
+        (lecture + modification + écriture atomiques, voir safe_json_update)
+
+        Returns:
+            La valeur retournée par modifier
+        """
+        resultat = []
+
+        def appliquer(data):
+            data.setdefault('utilisateur_actif', None)
+            data.setdefault('utilisateurs', {})
+            resultat.append(modifier(data))
+            return data
+
+        safe_json_update(FICHIER_UTILISATEURS, appliquer)
+        return resultat[0]
+
+    def ajouter_utilisateur(self, nom_utilisateur, donnees):
+        def ajouter(data):
+            if nom_utilisateur in data['utilisateurs']:
+                return False
+            data['utilisateurs'][nom_utilisateur] = donnees
+            return True
+
+        return self._modifier_utilisateurs(ajouter)
+
+    def sauvegarder_utilisateur(self, nom_utilisateur, donnees):
+        def remplacer(data):
+            data['utilisateurs'][nom_utilisateur] = donnees
+
+        self._modifier_utilisateurs(remplacer)
+
+    def supprimer_utilisateur(self, nom_utilisateur):
+        def supprimer(data):
+            if data['utilisateur_actif'] == nom_utilisateur:
+                data['utilisateur_actif'] = None
+            return data['utilisateurs'].pop(nom_utilisateur, None) is not None
+
+        return self._modifier_utilisateurs(supprimer)
+
+    def definir_utilisateur_actif(self, nom_utilisateur):
+        def definir(data):
+            data['utilisateur_actif'] = nom_utilisateur
+
+        self._modifier_utilisateurs(definir)
+
+    def charger_progression(self, fichier):
+        if not os.path.exists(fichier):
+            return None
+
+        with safe_json_read(fichier) as prog:
+            return prog
+
+    def sauvegarder_progression(self, fichier, progression):
+        with atomic_json_writer(fichier) as writer:
+            writer(progression)
+
+    def supprimer_progression(self, fichier):
+        if os.path.exists(fichier):
+            os.remove(fichier)
+
+    def charger_banque(self):
+        return self.banque.charger()
+
+    def sauvegarder_banque(self, banque):
+        self.banque.sauvegarder(banque)
+
+    def charger_banque_theme(self, cle_banque):
+        return self.banque.charger_theme(cle_banque)
+
+    def ajouter_exercice(self, cle_banque, niveau, exercice):
+        return self.banque.ajouter(cle_banque, niveau, exercice)
+
+    def ajouter_exercices(self, cle_banque, niveau, exercices):
+        return self.banque.ajouter_plusieurs(cle_banque, niveau, exercices)
+
+    def obtenir_exercice_par_id(self, exercice_id):
+        return self.banque.obtenir_par_id(exercice_id)
+
+
+class MoteurSQLite(MoteurStockage):
+    """
+    Moteur SQLite en mode WAL
+
+    - utilisateurs : une ligne par utilisateur (email indexé)
+    - progressions : une ligne par progression
+    - exercices    : une ligne par exercice (id indexé)
+
+    Une connexion est ouverte par thread, les écritures se font dans des
+    transactions courtes et ne touchent que les lignes modifiées : un
+    utilisateur est ajouté, remplacé ou supprimé ligne par ligne.
+    """
+
+    nom = 'sqlite'
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS meta (
+            cle TEXT PRIMARY KEY,
+            valeur TEXT
+        );
+        CREATE TABLE IF NOT EXISTS utilisateurs (
+            nom TEXT PRIMARY KEY,
+            email TEXT,
+            donnees TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_utilisateurs_email ON utilisateurs(email);
+        CREATE TABLE IF NOT EXISTS progressions (
+            cle TEXT PRIMARY KEY,
+            donnees TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS niveaux_banque (
+            cle_banque TEXT NOT NULL,
+            niveau TEXT NOT NULL,
+            ordre INTEGER NOT NULL,
+            PRIMARY KEY (cle_banque, niveau)
+        );
+        CREATE TABLE IF NOT EXISTS exercices (
+            cle_banque TEXT NOT NULL,
+            niveau TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            id TEXT,
+            donnees TEXT NOT NULL,
+            PRIMARY KEY (cle_banque, niveau, position)
+        );
+        CREATE INDEX IF NOT EXISTS idx_exercices_id ON exercices(id);
+    """
+
+    def __init__(self, chemin: str = FICHIER_SQLITE):
+        self.chemin = os.path.abspath(chemin)
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_pret = False
+
+    def _connexion(self) -> sqlite3.Connection:
+        """Retourne la connexion du thread courant (créée à la demande)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.chemin), exist_ok=True)
+            # isolation_level=None : transactions gérées explicitement (BEGIN IMMEDIATE)
+            conn = sqlite3.connect(self.chemin, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA foreign_keys=ON')
+            with self._schema_lock:
+                if not self._schema_pret:
+                    conn.executescript(self.SCHEMA)
+                    self._schema_pret = True
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self):
+        """Ouvre une transaction en écriture (verrou pris immédiatement)"""
+        return _TransactionSQLite(self._connexion())
+
+    @staticmethod
+    def _encoder(donnees: Any) -> str:
+        return json.dumps(donnees, ensure_ascii=False, separators=(',', ':'))
+
+    # ------------------------------------------------------------------ #
+    # Utilisateurs
+    # ------------------------------------------------------------------ #
+
+    def charger_utilisateurs(self):
+        conn = self._connexion()
+        utilisateurs = {
+            nom: json.loads(donnees)
+            for nom, donnees in conn.execute('SELECT nom, donnees FROM utilisateurs ORDER BY rowid')
+        }
+        ligne = conn.execute("SELECT valeur FROM meta WHERE cle = 'utilisateur_actif'").fetchone()
+        actif = json.loads(ligne[0]) if ligne else None
+        return {'utilisateur_actif': actif, 'utilisateurs': utilisateurs}
+
+    @staticmethod
+    def _email(donnees: Any) -> Optional[str]:
+        return donnees.get('email') if isinstance(donnees, dict) else None
+
+    def _ecrire_utilisateur(self, conn: sqlite3.Connection, nom: str, donnees: Any):
+        conn.execute(
+            'INSERT INTO utilisateurs (nom, email, donnees) VALUES (?, ?, ?) '
+            'ON CONFLICT(nom) DO UPDATE SET email = excluded.email, donnees = excluded.donnees',
+            (nom, self._email(donnees), self._encoder(donnees))
+        )
+
+    def sauvegarder_utilisateurs(self, utilisateurs):
+        # Ajoute ou remplace les utilisateurs donnés, sans supprimer les autres
+        # lignes : une copie périmée ne doit pas effacer un compte créé entre-temps
+        with self._transaction() as conn:
+            for nom, donnees in utilisateurs.get('utilisateurs', {}).items():
+                self._ecrire_utilisateur(conn, nom, donnees)
+            conn.execute(
+                "INSERT OR REPLACE INTO meta (cle, valeur) VALUES ('utilisateur_actif', ?)",
+                (self._encoder(utilisateurs.get('utilisateur_actif')),)
+            )
+
+    def ajouter_utilisateur(self, nom_utilisateur, donnees):
+        with self._transaction() as conn:
+            curseur = conn.execute(
+                'INSERT INTO utilisateurs (nom, email, donnees) VALUES (?, ?, ?) ON CONFLICT(nom) DO NOTHING',
+                (nom_utilisateur, self._email(donnees), self._encoder(donnees))
+            )
+            return curseur.rowcount == 1
+
+    def sauvegarder_utilisateur(self, nom_utilisateur, donnees):
+        with self._transaction() as conn:
+            self._ecrire_utilisateur(conn, nom_utilisateur, donnees)
+
+    def supprimer_utilisateur(self, nom_utilisateur):
+        with self._transaction() as conn:
+            curseur = conn.execute('DELETE FROM utilisateurs WHERE nom = ?', (nom_utilisateur,))
+            conn.execute(
+                "UPDATE meta SET valeur = 'null' WHERE cle = 'utilisateur_actif' AND valeur = ?",
+                (self._encoder(nom_utilisateur),)
+            )
+            return curseur.rowcount == 1
+
+    def definir_utilisateur_actif(self, nom_utilisateur):
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO meta (cle, valeur) VALUES ('utilisateur_actif', ?)",
+                (self._encoder(nom_utilisateur),)
+            )
+
+    def obtenir_utilisateur(self, nom_utilisateur):
+        ligne = self._connexion().execute(
+            'SELECT donnees FROM utilisateurs WHERE nom = ?', (nom_utilisateur,)
+        ).fetchone()
+        return json.loads(ligne[0]) if ligne else None
+
+    def email_utilise(self, email):
+        ligne = self._connexion().execute(
+            'SELECT 1 FROM utilisateurs WHERE email = ? LIMIT 1', (email,)
+        ).fetchone()
+        return ligne is not None
+
+    # ------------------------------------------------------------------ #
+    # Progressions
+    # ------------------------------------------------------------------ #
+
+    def charger_progression(self, fichier):
+        ligne = self._connexion().execute(
+            'SELECT donnees FROM progressions WHERE cle = ?', (cle_progression(fichier),)
+        ).fetchone()
+        return json.loads(ligne[0]) if ligne else None
+
+    def sauvegarder_progression(self, fichier, progression):
+        with self._transaction() as conn:
+            conn.execute(
+                'INSERT INTO progressions (cle, donnees) VALUES (?, ?) '
+                'ON CONFLICT(cle) DO UPDATE SET donnees = excluded.donnees',
+                (cle_progression(fichier), self._encoder(progression))
+            )
+
+    def supprimer_progression(self, fichier):
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM progressions WHERE cle = ?', (cle_progression(fichier),))
+
+    # ------------------------------------------------------------------ #
+    # Banque d'exercices
+    # ------------------------------------------------------------------ #
+
+    def charger_banque(self):
+        conn = self._connexion()
+        banque: Dict[str, Dict[str, list]] = {}
+        for cle_banque, niveau in conn.execute(
+            'SELECT cle_banque, niveau FROM niveaux_banque ORDER BY rowid, ordre'
+        ):
+            banque.setdefault(cle_banque, {})[niveau] = []
+        for cle_banque, niveau, donnees in conn.execute(
+            'SELECT cle_banque, niveau, donnees FROM exercices ORDER BY cle_banque, niveau, position'
+        ):
+            banque.setdefault(cle_banque, {}).setdefault(niveau, []).append(json.loads(donnees))
+        return banque
+
+    def charger_banque_theme(self, cle_banque):
+        conn = self._connexion()
+        niveaux: Dict[str, list] = {}
+        for (niveau,) in conn.execute(
+            'SELECT niveau FROM niveaux_banque WHERE cle_banque = ? ORDER BY ordre', (cle_banque,)
+        ):
+            niveaux[niveau] = []
+        for niveau, donnees in conn.execute(
+            'SELECT niveau, donnees FROM exercices WHERE cle_banque = ? ORDER BY niveau, position',
+            (cle_banque,)
+        ):
+            niveaux.setdefault(niveau, []).append(json.loads(donnees))
+        return niveaux
+
+    def sauvegarder_banque(self, banque):
+        # Réécriture complète : réservée aux opérations d'administration,
+        # l'ajout courant passe par ajouter_exercice()
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM exercices')
+            conn.execute('DELETE FROM niveaux_banque')
+            for cle_banque, niveaux in banque.items():
+                for ordre, (niveau, exercices) in enumerate(niveaux.items()):
+                    conn.execute(
+                        'INSERT INTO niveaux_banque (cle_banque, niveau, ordre) VALUES (?, ?, ?)',
+                        (cle_banque, niveau, ordre)
+                    )
+                    conn.executemany(
+                        'INSERT INTO exercices (cle_banque, niveau, position, id, donnees) VALUES (?, ?, ?, ?, ?)',
+                        [
+                            (cle_banque, niveau, position, ex.get('id'), self._encoder(ex))
+                            for position, ex in enumerate(exercices)
+                        ]
+                    )
+
+    def ajouter_exercices(self, cle_banque, niveau, exercices):
+        with self._transaction() as conn:
+            # Créer la structure par défaut de la clé si elle est nouvelle
+            if not conn.execute(
+                'SELECT 1 FROM niveaux_banque WHERE cle_banque = ? LIMIT 1', (cle_banque,)
+            ).fetchone():
+                conn.executemany(
+                    'INSERT INTO niveaux_banque (cle_banque, niveau, ordre) VALUES (?, ?, ?)',
+                    [(cle_banque, n, i) for i, n in enumerate(("1", "2", "3"))]
+                )
+            conn.execute(
+                'INSERT OR IGNORE INTO niveaux_banque (cle_banque, niveau, ordre) '
+                'SELECT ?, ?, COALESCE(MAX(ordre) + 1, 0) FROM niveaux_banque WHERE cle_banque = ?',
+                (cle_banque, niveau, cle_banque)
+            )
+
+            position = conn.execute(
+                'SELECT COALESCE(MAX(position) + 1, 0) FROM exercices WHERE cle_banque = ? AND niveau = ?',
+                (cle_banque, niveau)
+            ).fetchone()[0]
+            ajoutes = 0
+            for exercice in exercices:
+                if conn.execute(
+                    'SELECT 1 FROM exercices WHERE id = ? AND cle_banque = ? AND niveau = ? LIMIT 1',
+                    (exercice.get('id'), cle_banque, niveau)
+                ).fetchone():
+                    continue
+                conn.execute(
+                    'INSERT INTO exercices (cle_banque, niveau, position, id, donnees) VALUES (?, ?, ?, ?, ?)',
+                    (cle_banque, niveau, position, exercice.get('id'), self._encoder(exercice))
+                )
+                position += 1
+                ajoutes += 1
+            return ajoutes
+
+    def obtenir_exercice_par_id(self, exercice_id):
+        ligne = self._connexion().execute(
+            'SELECT donnees FROM exercices WHERE id = ? LIMIT 1', (exercice_id,)
+        ).fetchone()
+        return json.loads(ligne[0]) if ligne else None
+
+
+class _TransactionSQLite:
+    """Context manager BEGIN IMMEDIATE / COMMIT / ROLLBACK"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.conn.execute('COMMIT')
+        else:
+            self.conn.execute('ROLLBACK')
+        return False
+
+
+# ============================================================================
+# SÉLECTION DU MOTEUR
+# ============================================================================
+
+_moteur: Optional[MoteurStockage] = None
+_moteur_lock = threading.Lock()
+
+
+def creer_moteur(nom: str) -> MoteurStockage:
+    """Instancie un moteur de stockage par son nom ('json' ou 'sqlite')"""
+    nom = (nom or 'json').strip().lower()
+    if nom == 'sqlite':
+        return MoteurSQLite()
+    if nom == 'json':
+        return MoteurJSON()
+    raise ValueError(f"Moteur de stockage inconnu: {nom} (valeurs possibles: {', '.join(MOTEURS_DISPONIBLES)})")
+
+
+def obtenir_moteur_stockage() -> MoteurStockage:
+    """Retourne le moteur de stockage actif (configuré par STORAGE_BACKEND)"""
+    global _moteur
+    if _moteur is None:
+        with _moteur_lock:
+            if _moteur is None:
+                _moteur = creer_moteur(os.getenv('STORAGE_BACKEND', 'json'))
+    return _moteur
+
+
+def definir_moteur_stockage(moteur: MoteurStockage):
+    """Remplace le moteur actif (tests, scripts d'administration)"""
+    global _moteur
+    with _moteur_lock:
+        _moteur = moteur
+
+
+# ============================================================================
+# MIGRATION JSON -> SQLITE
+# ============================================================================
+
+def migrer_json_vers_sqlite(chemin_sqlite: str = FICHIER_SQLITE) -> Dict[str, int]:
+    """
+    Importe les fichiers JSON existants dans une base SQLite (one-shot)
+
+    Les journaux d'événements des progressions sont d'abord repliés dans
+    leur snapshot JSON ; les données JSON ne sont pas modifiées autrement :
+    on peut revenir au moteur json tant que l'application n'a pas écrit dans
+    la base.
+
+    Args:
+        chemin_sqlite: Chemin de la base à créer/compléter
+
+    Returns:
+        dict: Nombre d'utilisateurs, de progressions et d'exercices importés
+    """
+    source = MoteurJSON()
+    cible = MoteurSQLite(chemin_sqlite)
+    stats = {'utilisateurs': 0, 'progressions': 0, 'exercices': 0}
+
+    utilisateurs = source.charger_utilisateurs()
+    cible.sauvegarder_utilisateurs(utilisateurs)
+    stats['utilisateurs'] = len(utilisateurs['utilisateurs'])
+
+    fichiers_progression = set()
+    if os.path.isdir(DOSSIER_PROGRESSIONS):
+        for nom_fichier in os.listdir(DOSSIER_PROGRESSIONS):
+            if nom_fichier.endswith('.json'):
+                fichiers_progression.add(os.path.join(DOSSIER_PROGRESSIONS, nom_fichier))
+
+    # Import local : journal_progression et progression importent ce module
+    from modules.core.journal_progression import compacter_journal
+    from modules.core.progression import _reconstruire_progression
+
+    for fichier in sorted(fichiers_progression):
+        # Replier le journal d'événements dans le snapshot JSON avant la copie
+        # (le snapshot et le journal vidé restent cohérents pour le moteur json)
+        compacter_journal(fichier, _reconstruire_progression, moteur=source)
+        progression = source.charger_progression(fichier)
+        if progression is not None:
+            cible.sauvegarder_progression(fichier, progression)
+            stats['progressions'] += 1
+
+    if os.path.exists(FICHIER_BANQUE) and not os.path.exists(source.banque.manifeste):
+        # Banque pas encore découpée en shards : la lire sans la migrer
+        with safe_json_read(FICHIER_BANQUE) as banque:
+            cible.sauvegarder_banque(banque)
+    else:
+        banque = source.charger_banque()
+        cible.sauvegarder_banque(banque)
+    stats['exercices'] = sum(
+        len(exercices) for niveaux in banque.values() for exercices in niveaux.values()
+    )
+
+    return stats
+
+
+def convertir_format_fichiers(format_stockage: str, chemins: Optional[List[str]] = None) -> Dict[str, Tuple[int, int]]:
+    """
+    Réécrit les fichiers JSON dans un autre format de stockage
+
+    Args:
+        format_stockage: 'pretty', 'compact' ou 'binaire'
+        chemins: Fichiers à convertir (None = utilisateurs, banque et progressions)
+
+    Returns:
+        dict: {chemin: (taille_avant, taille_apres)}
+    """
+    if chemins is None:
+        chemins = [FICHIER_UTILISATEURS, FICHIER_BANQUE]
+        if os.path.isdir(DOSSIER_BANQUE):
+            chemins += [
+                os.path.join(DOSSIER_BANQUE, nom)
+                for nom in sorted(os.listdir(DOSSIER_BANQUE))
+                if nom.endswith('.json') and not nom.endswith('.index.json')
+            ]
+        if os.path.isdir(DOSSIER_PROGRESSIONS):
+            chemins += [
+                os.path.join(DOSSIER_PROGRESSIONS, nom)
+                for nom in sorted(os.listdir(DOSSIER_PROGRESSIONS))
+                if nom.endswith('.json')
+            ]
+
+    resultat = {}
+    for chemin in chemins:
+        if os.path.exists(chemin):
+            resultat[chemin] = convertir_fichier_json(chemin, format_stockage)
+    return resultat
+
+
+if __name__ == '__main__':
+    if len(sys.argv) >= 2 and sys.argv[1] == 'migrer':
+        chemin = sys.argv[2] if len(sys.argv) >= 3 else FICHIER_SQLITE
+        resultat = migrer_json_vers_sqlite(chemin)
+        print(f"Migration terminée vers {chemin}")
+        for collection, nombre in resultat.items():
+            print(f"  {collection}: {nombre}")
+    elif len(sys.argv) >= 2 and sys.argv[1] == 'sharder':
+        source = sys.argv[2] if len(sys.argv) >= 3 else FICHIER_BANQUE
+        resultat = BanqueShardee(DOSSIER_BANQUE).migrer(source)
+        print(f"Banque importée dans {DOSSIER_BANQUE} ({len(resultat)} clés, "
+              f"{sum(resultat.values())} exercices ajoutés)")
+        for cle_banque, nombre in resultat.items():
+            print(f"  {cle_banque}: {nombre}")
+    elif len(sys.argv) >= 3 and sys.argv[1] == 'convertir':
+        resultat = convertir_format_fichiers(sys.argv[2], sys.argv[3:] or None)
+        print(f"Conversion terminée au format {sys.argv[2]}")
+        for chemin, (avant, apres) in resultat.items():
+            print(f"  {chemin}: {avant} -> {apres} octets")
+    else:
+        print("Usage: python -m modules.core.stockage migrer [chemin_sqlite]")
+        print("       python -m modules.core.stockage sharder [banque_exercices.json]")
+        print("       python -m modules.core.stockage convertir pretty|compact|binaire [fichiers...]")
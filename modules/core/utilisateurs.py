@@ -6,7 +6,8 @@ import json
 import os
 from datetime import datetime
 from modules.core.progression import initialiser_progression
-from modules.core.file_lock import atomic_json_writer, safe_json_read, safe_json_update
+from modules.core.stockage import obtenir_moteur_stockage
+from modules.core.journal_progression import supprimer_journal
 
 # Chemins absolus basés sur le répertoire backend
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -20,8 +21,8 @@ def initialiser_systeme_utilisateurs():
     if not os.path.exists(DOSSIER_PROGRESSIONS):
         os.makedirs(DOSSIER_PROGRESSIONS)
     
-    # Créer le fichier utilisateurs s'il n'existe pas
-    if not os.path.exists(FICHIER_UTILISATEURS):
+    # Créer le fichier utilisateurs s'il n'existe pas (le moteur SQLite crée son schéma seul)
+    if obtenir_moteur_stockage().nom == 'json' and not os.path.exists(FICHIER_UTILISATEURS):
         utilisateurs = {
             'utilisateur_actif': None,
             'utilisateurs': {}
@@ -31,22 +32,27 @@ def initialiser_systeme_utilisateurs():
 
 def charger_utilisateurs():
     """Charge la liste des utilisateurs de manière thread-safe"""
-    if not os.path.exists(FICHIER_UTILISATEURS):
-        return {'utilisateur_actif': None, 'utilisateurs': {}}
-    
-    with safe_json_read(FICHIER_UTILISATEURS) as data:
-        # S'assurer que la structure est valide
-        if 'utilisateur_actif' not in data:
-            data['utilisateur_actif'] = None
-        if 'utilisateurs' not in data:
-            data['utilisateurs'] = {}
-        return data
+    return obtenir_moteur_stockage().charger_utilisateurs()
 
 
 def sauvegarder_utilisateurs(utilisateurs):
     """Sauvegarde la liste des utilisateurs de manière atomique et thread-safe"""
-    with atomic_json_writer(FICHIER_UTILISATEURS) as writer:
-        writer(utilisateurs)
+    obtenir_moteur_stockage().sauvegarder_utilisateurs(utilisateurs)
+
+
+def sauvegarder_utilisateur(nom_utilisateur, donnees):
+    """Crée ou remplace un seul utilisateur, sans réécrire les autres comptes"""
+    obtenir_moteur_stockage().sauvegarder_utilisateur(nom_utilisateur, donnees)
+
+
+def obtenir_utilisateur(nom_utilisateur):
+    """Retourne les données d'un utilisateur (lecture indexée avec le moteur SQLite)"""
+    return obtenir_moteur_stockage().obtenir_utilisateur(nom_utilisateur)
+
+
+def email_deja_utilise(email):
+    """Vérifie si un email est déjà associé à un compte"""
+    return obtenir_moteur_stockage().email_utilise(email)
 
 
 def creer_utilisateur(nom_utilisateur, niveau=1, email='', password_hash='', role='user'):
@@ -63,15 +69,10 @@ def creer_utilisateur(nom_utilisateur, niveau=1, email='', password_hash='', rol
     Returns:
         dict: Données de l'utilisateur créé ou False si échec
     """
-    utilisateurs = charger_utilisateurs()
-    
-    # Vérifier si le nom existe déjà
-    if nom_utilisateur in utilisateurs['utilisateurs']:
-        print(f"\nErreur: L'utilisateur '{nom_utilisateur}' existe deja.")
-        return False
+    moteur = obtenir_moteur_stockage()
     
     # Créer le profil
-    utilisateurs['utilisateurs'][nom_utilisateur] = {
+    profil = {
         'nom': nom_utilisateur,
         'email': email,
         'password_hash': password_hash,
@@ -81,16 +82,17 @@ def creer_utilisateur(nom_utilisateur, niveau=1, email='', password_hash='', rol
         'fichier_progression': f'{DOSSIER_PROGRESSIONS}/{nom_utilisateur}.json'
     }
     
-    # Créer le fichier de progression
-    progression = initialiser_progression()
-    fichier_prog = utilisateurs['utilisateurs'][nom_utilisateur]['fichier_progression']
+    # Ajout d'une seule ligne : échoue si le nom existe déjà, même si le
+    # compte a été créé en parallèle par une autre requête
+    if not moteur.ajouter_utilisateur(nom_utilisateur, profil):
+        print(f"\nErreur: L'utilisateur '{nom_utilisateur}' existe deja.")
+        return False
     
-    with atomic_json_writer(fichier_prog) as writer:
-        writer(progression)
+    # Créer le fichier de progression
+    moteur.sauvegarder_progression(profil['fichier_progression'], initialiser_progression())
     
-    sauvegarder_utilisateurs(utilisateurs)
     print(f"\nUtilisateur '{nom_utilisateur}' cree avec succes !")
-    return utilisateurs['utilisateurs'][nom_utilisateur]
+    return profil
 
 
 def supprimer_utilisateur(nom_utilisateur):
@@ -103,9 +105,10 @@ def supprimer_utilisateur(nom_utilisateur):
     Returns:
         bool: True si suppression réussie, False sinon
     """
-    utilisateurs = charger_utilisateurs()
+    moteur = obtenir_moteur_stockage()
+    utilisateur = moteur.obtenir_utilisateur(nom_utilisateur)
     
-    if nom_utilisateur not in utilisateurs['utilisateurs']:
+    if utilisateur is None:
         print(f"\nErreur: L'utilisateur '{nom_utilisateur}' n'existe pas.")
         return False
     
@@ -116,18 +119,12 @@ def supprimer_utilisateur(nom_utilisateur):
         return False
     
     # Supprimer le fichier de progression
-    fichier_prog = utilisateurs['utilisateurs'][nom_utilisateur]['fichier_progression']
-    if os.path.exists(fichier_prog):
-        os.remove(fichier_prog)
-    
-    # Retirer de la liste
-    del utilisateurs['utilisateurs'][nom_utilisateur]
+    fichier_prog = utilisateur['fichier_progression']
+    moteur.supprimer_progression(fichier_prog)
+    supprimer_journal(fichier_prog)
     
-    # Si c'était l'utilisateur actif, le désactiver
-    if utilisateurs['utilisateur_actif'] == nom_utilisateur:
-        utilisateurs['utilisateur_actif'] = None
-    
-    sauvegarder_utilisateurs(utilisateurs)
+    # Retirer le compte (et le désactiver si c'était l'utilisateur actif)
+    moteur.supprimer_utilisateur(nom_utilisateur)
     print(f"\nUtilisateur '{nom_utilisateur}' supprime avec succes.")
     return True
 
@@ -142,16 +139,16 @@ def selectionner_utilisateur(nom_utilisateur):
     Returns:
         str: Chemin vers le fichier de progression, ou None
     """
-    utilisateurs = charger_utilisateurs()
+    moteur = obtenir_moteur_stockage()
+    utilisateur = moteur.obtenir_utilisateur(nom_utilisateur)
     
-    if nom_utilisateur not in utilisateurs['utilisateurs']:
+    if utilisateur is None:
         print(f"\nErreur: L'utilisateur '{nom_utilisateur}' n'existe pas.")
         return None
     
-    utilisateurs['utilisateur_actif'] = nom_utilisateur
-    sauvegarder_utilisateurs(utilisateurs)
+    moteur.definir_utilisateur_actif(nom_utilisateur)
     
-    return utilisateurs['utilisateurs'][nom_utilisateur]['fichier_progression']
+    return utilisateur['fichier_progression']
 
 
 def obtenir_utilisateur_actif():
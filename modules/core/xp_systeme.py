@@ -2,7 +2,8 @@
 Système de points d'expérience (XP) et de niveaux
 """
 
-from modules.core.progression import charger_progression, sauvegarder_progression, obtenir_domaine_actif, obtenir_progression_domaine
+from modules.core.progression import charger_progression, obtenir_domaine_actif, obtenir_progression_domaine, journaliser_evenement
+from modules.core.journal_progression import creer_evenement, appliquer_evenement
 
 # Configuration des points
 POINTS_PAR_TYPE = {
@@ -113,32 +114,19 @@ def ajouter_xp(xp_gagne, domaine=None):
     
     # Obtenir le domaine
     if domaine is None:
-        domaine = obtenir_domaine_actif()
-    
-    # Obtenir la progression du domaine
-    prog_domaine = obtenir_progression_domaine(domaine)
+        domaine = progression.get('domaine_actif', 'python')
     
-    # Initialiser l'XP si nécessaire
-    if 'xp_total' not in prog_domaine:
-        prog_domaine['xp_total'] = 0
+    niveau_avant = progression.get('domaines', {}).get(domaine, {}).get('niveau', 1)
     
-    niveau_avant = prog_domaine['niveau']
-    prog_domaine['xp_total'] += xp_gagne
+    # Événement 'xp' : appliqué en mémoire pour le résultat, ajouté au journal
+    evenement = creer_evenement('xp', domaine=domaine, xp=xp_gagne)
+    appliquer_evenement(progression, evenement)
+    journaliser_evenement(evenement)
     
     # Calculer le nouveau niveau
-    nouveau_niveau = calculer_niveau(prog_domaine['xp_total'])
+    nouveau_niveau = calculer_niveau(progression['domaines'][domaine]['xp_total'])
     niveau_monte = nouveau_niveau > niveau_avant
     
-    if niveau_monte:
-        prog_domaine['niveau'] = nouveau_niveau
-    
-    # Mettre à jour dans la structure principale (toujours, pas seulement si niveau monte)
-    if 'domaines' not in progression:
-        progression['domaines'] = {}
-    progression['domaines'][domaine] = prog_domaine
-    
-    sauvegarder_progression(progression)
-    
     return niveau_avant, nouveau_niveau, niveau_monte
 
 
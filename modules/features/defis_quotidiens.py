@@ -3,16 +3,19 @@ Système de défis quotidiens
 Génère des défis spécifiques par domaine avec récompenses bonus
 """
 
-import json
 import os
 from datetime import datetime, timedelta
 import random
 from modules.core.progression import charger_progression, sauvegarder_progression, obtenir_domaine_actif, obtenir_progression_domaine
 from modules.core.domaines import charger_domaines, obtenir_nom_domaine
+from modules.core.file_lock import safe_json_read, atomic_json_writer, declarer_durabilite
 
 
 FICHIER_DEFIS = 'defis_quotidiens.json'
 
+# Défis régénérés chaque jour : pas de fsync
+declarer_durabilite(FICHIER_DEFIS, 'os')
+
 # Types de défis
 TYPES_DEFIS = {
     'serie_victoires': {
@@ -52,8 +55,8 @@ def charger_defis():
     """Charge les défis depuis le fichier JSON"""
     if os.path.exists(FICHIER_DEFIS):
         try:
-            with open(FICHIER_DEFIS, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            with safe_json_read(os.path.abspath(FICHIER_DEFIS)) as donnees:
+                return donnees
         except:
             return {}
     return {}
@@ -61,8 +64,8 @@ def charger_defis():
 
 def sauvegarder_defis(defis):
     """Sauvegarde les défis dans le fichier JSON"""
-    with open(FICHIER_DEFIS, 'w', encoding='utf-8') as f:
-        json.dump(defis, f, indent=4, ensure_ascii=False)
+    with atomic_json_writer(os.path.abspath(FICHIER_DEFIS)) as write_data:
+        write_data(defis)
 
 
 def obtenir_date_aujourdhui():
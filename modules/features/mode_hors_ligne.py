@@ -7,18 +7,23 @@ import json
 import os
 import random
 from modules.core.domaines import charger_domaines, obtenir_themes_domaine
+from modules.core.file_lock import safe_json_read, atomic_json_writer, declarer_durabilite
 
 
 FICHIER_CACHE = 'cache_exercices.json'
 FICHIER_CONFIG_OFFLINE = 'config_offline.json'
 
+# Cache reconstructible : pas de fsync ; configuration : fsync du fichier
+declarer_durabilite(FICHIER_CACHE, 'os')
+declarer_durabilite(FICHIER_CONFIG_OFFLINE, 'fsync')
+
 
 def charger_cache():
     """Charge le cache d'exercices"""
     if os.path.exists(FICHIER_CACHE):
         try:
-            with open(FICHIER_CACHE, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            with safe_json_read(os.path.abspath(FICHIER_CACHE)) as donnees:
+                return donnees
         except:
             return {'exercices': []}
     return {'exercices': []}
@@ -26,16 +31,16 @@ def charger_cache():
 
 def sauvegarder_cache(cache):
     """Sauvegarde le cache d'exercices"""
-    with open(FICHIER_CACHE, 'w', encoding='utf-8') as f:
-        json.dump(cache, f, indent=4, ensure_ascii=False)
+    with atomic_json_writer(os.path.abspath(FICHIER_CACHE)) as write_data:
+        write_data(cache)
 
 
 def charger_config_offline():
     """Charge la configuration du mode hors ligne"""
     if os.path.exists(FICHIER_CONFIG_OFFLINE):
         try:
-            with open(FICHIER_CONFIG_OFFLINE, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            with safe_json_read(os.path.abspath(FICHIER_CONFIG_OFFLINE)) as donnees:
+                return donnees
         except:
             return {'mode_hors_ligne': False}
     return {'mode_hors_ligne': False}
@@ -45,8 +50,7 @@ def est_mode_hors_ligne():
     """Vérifie si le mode hors ligne est activé"""
     if os.path.exists(FICHIER_CONFIG_OFFLINE):
         try:
-            with open(FICHIER_CONFIG_OFFLINE, 'r', encoding='utf-8') as f:
-                config = json.load(f)
+            with safe_json_read(os.path.abspath(FICHIER_CONFIG_OFFLINE)) as config:
                 return config.get('mode_hors_ligne', False)
         except:
             return False
@@ -56,16 +60,16 @@ def est_mode_hors_ligne():
 def activer_mode_hors_ligne():
     """Active le mode hors ligne"""
     config = {'mode_hors_ligne': True}
-    with open(FICHIER_CONFIG_OFFLINE, 'w', encoding='utf-8') as f:
-        json.dump(config, f, indent=4, ensure_ascii=False)
+    with atomic_json_writer(os.path.abspath(FICHIER_CONFIG_OFFLINE)) as write_data:
+        write_data(config)
     print("\n✅ Mode hors ligne activé.")
 
 
 def desactiver_mode_hors_ligne():
     """Désactive le mode hors ligne"""
     config = {'mode_hors_ligne': False}
-    with open(FICHIER_CONFIG_OFFLINE, 'w', encoding='utf-8') as f:
-        json.dump(config, f, indent=4, ensure_ascii=False)
+    with atomic_json_writer(os.path.abspath(FICHIER_CONFIG_OFFLINE)) as write_data:
+        write_data(config)
     print("\n✅ Mode hors ligne désactivé.")
 
 
@@ -173,13 +177,11 @@ def generer_exercice_basique(domaine, theme, niveau):
     }
 
 
-def peupler_cache_automatique(nb_exercices_par_domaine=10):
-    """Génère automatiquement des exercices pour le cache"""
-    from fonctions import generer_exercice
-    import ollama
+def peupler_cache_automatique(nb_exercices_par_domaine=10, taille_lot=5):
+    """Génère automatiquement des exercices pour le cache (par lots : un appel IA par lot)"""
+    from modules.core.fonctions import generer_exercices_lot
     
     domaines_dict = charger_domaines()
-    cache = charger_cache()
     
     print(f"\n🔄 Génération de {nb_exercices_par_domaine} exercices par domaine...")
     print("Cela peut prendre quelques minutes.\n")
@@ -193,10 +195,12 @@ def peupler_cache_automatique(nb_exercices_par_domaine=10):
             for niveau in [1, 2, 3]:
                 for theme in themes[:3]:  # 3 thèmes par domaine
                     try:
-                        print(f"Génération: {domaine_id} - {theme} - Niveau {niveau}...")
-                        exercice = generer_exercice(niveau, theme, domaine_id)
-                        ajouter_au_cache(exercice, domaine_id, theme, niveau)
-                        total_generes += 1
+                        nombre = min(taille_lot, nb_exercices_par_domaine - total_generes)
+                        print(f"Génération: {domaine_id} - {theme} - Niveau {niveau} ({nombre} exercices)...")
+                        lot = generer_exercices_lot(niveau, theme, domaine_id, nombre)
+                        for exercice in lot['exercices']:
+                            ajouter_au_cache(exercice, domaine_id, theme, niveau)
+                        total_generes += len(lot['exercices'])
                         
                         if total_generes >= nb_exercices_par_domaine:
                             break
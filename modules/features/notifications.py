@@ -3,21 +3,24 @@ Système de notifications et rappels
 Gère les alertes pour streak, révisions SRS, défis, etc.
 """
 
-import json
 import os
 from datetime import datetime, timedelta
 from modules.core.progression import charger_progression
+from modules.core.file_lock import safe_json_read, atomic_json_writer, declarer_durabilite
 
 
 FICHIER_NOTIFICATIONS = 'notifications.json'
 
+# Notifications régénérables : pas de fsync
+declarer_durabilite(FICHIER_NOTIFICATIONS, 'os')
+
 
 def charger_notifications():
     """Charge les notifications"""
     if os.path.exists(FICHIER_NOTIFICATIONS):
         try:
-            with open(FICHIER_NOTIFICATIONS, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            with safe_json_read(os.path.abspath(FICHIER_NOTIFICATIONS)) as donnees:
+                return donnees
         except:
             return {'notifications': [], 'dernier_check': None}
     return {'notifications': [], 'dernier_check': None}
@@ -25,8 +28,8 @@ def charger_notifications():
 
 def sauvegarder_notifications(notifs):
     """Sauvegarde les notifications"""
-    with open(FICHIER_NOTIFICATIONS, 'w', encoding='utf-8') as f:
-        json.dump(notifs, f, indent=4, ensure_ascii=False)
+    with atomic_json_writer(os.path.abspath(FICHIER_NOTIFICATIONS)) as write_data:
+        write_data(notifs)
 
 
 def ajouter_notification(type_notif, titre, message, priorite='normale'):
@@ -3,15 +3,18 @@ Système de quêtes à long terme
 Objectifs qui se débloquent progressivement
 """
 
-import json
 import os
 from datetime import datetime
 from modules.core.progression import charger_progression, sauvegarder_progression, obtenir_domaine_actif, obtenir_progression_domaine
 from modules.core.domaines import charger_domaines, obtenir_nom_domaine
+from modules.core.file_lock import safe_json_read, atomic_json_writer, declarer_durabilite
 
 
 FICHIER_QUETES = 'quetes.json'
 
+# État des quêtes : fsync du fichier, sans fsync du dossier
+declarer_durabilite(FICHIER_QUETES, 'fsync')
+
 # Définition des quêtes
 QUETES_DISPONIBLES = {
     'premier_pas': {
@@ -129,8 +132,8 @@ def charger_quetes():
     """Charge l'état des quêtes"""
     if os.path.exists(FICHIER_QUETES):
         try:
-            with open(FICHIER_QUETES, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            with safe_json_read(os.path.abspath(FICHIER_QUETES)) as donnees:
+                return donnees
         except:
             return {}
     return {}
@@ -138,8 +141,8 @@ def charger_quetes():
 
 def sauvegarder_quetes(quetes):
     """Sauvegarde l'état des quêtes"""
-    with open(FICHIER_QUETES, 'w', encoding='utf-8') as f:
-        json.dump(quetes, f, indent=4, ensure_ascii=False)
+    with atomic_json_writer(os.path.abspath(FICHIER_QUETES)) as write_data:
+        write_data(quetes)
 
 
 def initialiser_quetes():
@@ -0,0 +1,113 @@
+"""
+Benchmark : octets lus et écrits par sauvegarde d'un fichier de progression
+
+Compare deux façons de garder '<fichier>.backup' avant os.replace :
+- lien     : lien physique vers l'inode courant (file_lock actuel)
+- copie    : copie complète du fichier avant chaque écriture (comportement
+             d'avant le backup roulant)
+
+Les octets sont lus dans /proc/self/io (rchar/wchar : octets passés par
+read()/write(), y compris depuis le cache de pages), donc Linux uniquement.
+Vérifie aussi qu'un fichier corrompu est restauré depuis la génération
+précédente.
+
+Usage (depuis la racine du dépôt) :
+    python scripts/bench_backup_ecriture.py [--sauvegardes 30] [--taille-mo 1]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+
+from modules.core import file_lock  # noqa: E402
+
+
+def compteurs_io() -> dict:
+    with open('/proc/self/io') as f:
+        return {cle: int(valeur) for cle, valeur in (ligne.split(':') for ligne in f)}
+
+
+def progression_factice(taille_octets: int) -> dict:
+    """Progression dont la sérialisation (format pretty) fait environ taille_octets"""
+    completes = []
+    progression = {
+        'domaine_actif': 'python',
+        'domaines': {'python': {'niveau': 12, 'exercices_completes': completes, 'themes': {}}}
+    }
+    # ~68 octets par entrée une fois indentée
+    for i in range(taille_octets // 68):
+        completes.append(f"boucles|{i % 10 + 1}|id:{i:016x}{'0' * 16}")
+    return progression
+
+
+def _backup_par_copie(filepath: str):
+    backup_path = filepath + '.backup'
+    if os.path.exists(backup_path):
+        os.remove(backup_path)
+    shutil.copy2(filepath, backup_path)
+
+
+def mesurer(fichier: str, progression: dict, sauvegardes: int) -> dict:
+    """Octets lus/écrits (moyenne par sauvegarde)"""
+    with file_lock.atomic_json_writer(fichier) as writer:
+        writer(progression)
+    avant = compteurs_io()
+    for i in range(sauvegardes):
+        progression['domaines']['python']['niveau'] = i
+        with file_lock.atomic_json_writer(fichier) as writer:
+            writer(progression)
+    apres = compteurs_io()
+    return {cle: (apres[cle] - avant[cle]) / sauvegardes for cle in ('rchar', 'wchar')}
+
+
+def verifier_restauration(fichier: str) -> bool:
+    """Deux écritures, corruption du fichier : la lecture doit rendre la première"""
+    for niveau in (1, 2):
+        with file_lock.atomic_json_writer(fichier) as writer:
+            writer({'niveau': niveau})
+    with open(fichier, 'w') as f:
+        f.write('{"niveau": ')
+    file_lock.invalider_cache_json(os.path.abspath(fichier))
+    with file_lock.safe_json_read(fichier) as data:
+        return data == {'niveau': 1}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sauvegardes', type=int, default=30)
+    parser.add_argument('--taille-mo', type=float, default=1.0)
+    args = parser.parse_args()
+
+    if not os.path.exists('/proc/self/io'):
+        sys.exit('/proc/self/io indisponible (Linux uniquement)')
+
+    progression = progression_factice(int(args.taille_mo * 1024 * 1024))
+    conserver_backup = file_lock._conserver_backup
+    with tempfile.TemporaryDirectory() as dossier:
+        os.chdir(dossier)
+        fichier = os.path.join(dossier, 'progression.json')
+        with file_lock.atomic_json_writer(fichier) as writer:
+            writer(progression)
+        taille = os.path.getsize(fichier) / 1e6
+
+        print(f"{args.sauvegardes} sauvegardes d'une progression de {taille:.2f} Mo")
+        for nom, conserver in (('copie', _backup_par_copie), ('lien', conserver_backup)):
+            file_lock._conserver_backup = conserver
+            octets = mesurer(fichier, progression, args.sauvegardes)
+            print(f"  {nom:<6} {octets['wchar'] / 1e6:6.2f} Mo écrits  {octets['rchar'] / 1e6:6.2f} Mo lus"
+                  f"  par sauvegarde")
+        file_lock._conserver_backup = conserver_backup
+
+        restauree = verifier_restauration(os.path.join(dossier, 'restauration.json'))
+        print(f"restauration depuis la génération précédente : {'OK' if restauree else 'ÉCHEC'}")
+        os.chdir(RACINE)
+    sys.exit(0 if restauree else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark : taille, sérialisation et lecture des formats de stockage
+
+Pour chaque format de file_lock (pretty, compact, binaire), mesure sur une
+progression de N entrées la taille sur disque, le temps de
+serialiser_donnees et celui de deserialiser_donnees. Vérifie aussi qu'un
+aller-retour de conversion pretty -> compact -> binaire -> pretty
+(convertir_fichier_json) rend le même document.
+
+Usage (depuis la racine du dépôt) :
+    python scripts/bench_formats_stockage.py [--entrees 6000] [--repetitions 20]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+
+from modules.core.file_lock import (  # noqa: E402
+    FORMATS_STOCKAGE, atomic_json_writer, convertir_fichier_json, deserialiser_donnees,
+    detecter_format_fichier, invalider_cache_json, safe_json_read, serialiser_donnees
+)
+
+
+def progression_factice(entrees: int) -> dict:
+    """Progression avec entrees exercices complétés et autant d'entrées d'historique"""
+    themes = ['variables', 'boucles', 'fonctions', 'listes', 'dictionnaires', 'classes']
+    progression = {
+        'domaine_actif': 'python',
+        'xp_total': entrees * 15,
+        'domaines': {
+            'python': {
+                'niveau': 12,
+                'exercices_reussis': entrees,
+                'exercices_totaux': entrees + entrees // 4,
+                'exercices_completes': [
+                    f"{themes[i % 6]}|{i % 10 + 1}|id:{i:032x}" for i in range(entrees)
+                ],
+                'historique': [
+                    {
+                        'date': f"2026-{i % 12 + 1:02d}-{i % 28 + 1:02d}T10:{i % 60:02d}:00",
+                        'theme': themes[i % 6],
+                        'niveau': i % 10 + 1,
+                        'reussi': i % 5 != 0,
+                        'xp': 10 + i % 20,
+                        'temps_s': round(12.5 + i % 90 * 1.5, 1)
+                    }
+                    for i in range(entrees)
+                ],
+                'badges': ['premier_pas', 'serie_7', 'centurion']
+            }
+        }
+    }
+    # Aller-retour JSON : mêmes objets que ceux lus depuis le disque
+    return json.loads(json.dumps(progression))
+
+
+def chronometrer(fonction, repetitions: int) -> float:
+    """Meilleur temps (ms) sur repetitions appels"""
+    meilleur = float('inf')
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        fonction()
+        meilleur = min(meilleur, time.perf_counter() - debut)
+    return meilleur * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--entrees', type=int, default=6000)
+    parser.add_argument('--repetitions', type=int, default=20)
+    args = parser.parse_args()
+
+    progression = progression_factice(args.entrees)
+    print(f"progression de {args.entrees} entrées, meilleur temps sur {args.repetitions} essais")
+    print(f"  {'format':<9} {'taille':>9} {'sérialiser':>11} {'lire':>9}")
+    for format_stockage in FORMATS_STOCKAGE:
+        contenu = serialiser_donnees(progression, format_stockage)
+        assert deserialiser_donnees(contenu) == progression
+        serialiser = chronometrer(lambda: serialiser_donnees(progression, format_stockage), args.repetitions)
+        lire = chronometrer(lambda: deserialiser_donnees(contenu), args.repetitions)
+        print(f"  {format_stockage:<9} {len(contenu) / 1e6:6.2f} Mo {serialiser:8.1f} ms {lire:6.1f} ms")
+
+    with tempfile.TemporaryDirectory() as dossier:
+        os.chdir(dossier)
+        fichier = os.path.join(dossier, 'progression.json')
+        with atomic_json_writer(fichier) as writer:
+            writer(progression)
+        conversions = []
+        for format_stockage in ('pretty', 'compact', 'binaire', 'pretty'):
+            convertir_fichier_json(fichier, format_stockage)
+            conversions.append(detecter_format_fichier(fichier))
+        invalider_cache_json(fichier)
+        with safe_json_read(fichier) as relu:
+            identique = relu == progression
+        os.chdir(RACINE)
+    print(f"conversions {' -> '.join(conversions)} : {'document identique' if identique else 'ÉCHEC'}")
+    sys.exit(0 if identique else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark : recherche d'un exercice par id, parcours complet contre index
+
+Génère une banque {cle: {niveau: [exercice, ...]}} de N exercices au format
+pretty, puis mesure :
+- le parcours complet (safe_json_read de la banque + recherche de l'id),
+  avec et sans le cache de lecture : comportement d'avant l'index ;
+- IndexExercices : construction (parcours des offsets), chargement de
+  l'index persisté par une nouvelle instance, recherche par id.
+
+Usage (depuis la racine du dépôt) :
+    python scripts/bench_index_exercices.py [--exercices 20000] [--recherches 200]
+(--exercices 100200 donne une banque d'environ 90 Mo)
+"""
+
+import argparse
+import hashlib
+import os
+import random
+import sys
+import tempfile
+import time
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+
+from modules.core.file_lock import atomic_json_writer, configurer_cache_json, safe_json_read  # noqa: E402
+from modules.core.index_exercices import IndexExercices  # noqa: E402
+
+
+def banque_factice(exercices: int) -> dict:
+    """Banque de 20 thèmes x 5 niveaux, énoncés de ~500 caractères"""
+    banque = {}
+    for i in range(exercices):
+        cle = f"python:Thème {i % 20}"
+        niveau = str(i // 20 % 5 + 1)
+        enonce = f"Exercice {i} : écrivez une fonction qui " + 'traite une liste de valeurs, ' * 16
+        banque.setdefault(cle, {}).setdefault(niveau, []).append({
+            'id': hashlib.md5(enonce.encode()).hexdigest()[:10],
+            'type': 'code',
+            'enonce': enonce,
+            'cas_test': [{'input': [str(i)], 'output': str(i * 2)}],
+            'solution': f"print(int(input()) * 2)  # {i}"
+        })
+    return banque
+
+
+def recherche_par_parcours(fichier: str, exercice_id: str):
+    with safe_json_read(fichier) as banque:
+        for niveaux in banque.values():
+            for exercices in niveaux.values():
+                for exercice in exercices:
+                    if exercice.get('id') == exercice_id:
+                        return exercice
+    return None
+
+
+def moyenne_ms(fonction, arguments: list) -> float:
+    debut = time.perf_counter()
+    for argument in arguments:
+        fonction(argument)
+    return (time.perf_counter() - debut) * 1000 / len(arguments)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--exercices', type=int, default=20000)
+    parser.add_argument('--recherches', type=int, default=200)
+    parser.add_argument('--recherches-parcours', type=int, default=10,
+                        help='Recherches par parcours complet (lentes)')
+    args = parser.parse_args()
+
+    banque = banque_factice(args.exercices)
+    ids = [ex['id'] for niveaux in banque.values() for exercices in niveaux.values() for ex in exercices]
+    ids_recherches = [random.choice(ids) for _ in range(args.recherches)]
+
+    with tempfile.TemporaryDirectory() as dossier:
+        os.chdir(dossier)
+        fichier = os.path.join(dossier, 'banque_exercices.json')
+        with atomic_json_writer(fichier) as writer:
+            writer(banque)
+        print(f"banque de {len(ids)} exercices, {os.path.getsize(fichier) / 1e6:.1f} Mo")
+
+        parcours = ids_recherches[:args.recherches_parcours]
+        recherche_par_parcours(fichier, ids[0])
+        for libelle, cache in (('cache de lecture', True), ('sans cache', False)):
+            configurer_cache_json(actif=cache)
+            duree = moyenne_ms(lambda i: recherche_par_parcours(fichier, i), parcours)
+            print(f"  parcours complet, {libelle:<17} {duree:9.2f} ms/recherche")
+        configurer_cache_json(actif=True)
+
+        index = IndexExercices(fichier)
+        debut = time.perf_counter()
+        index.verifier()
+        construction = time.perf_counter() - debut
+
+        index = IndexExercices(fichier)
+        debut = time.perf_counter()
+        index.verifier()
+        chargement = time.perf_counter() - debut
+
+        trouves = [index.obtenir(i) for i in ids_recherches]
+        duree = moyenne_ms(index.obtenir, ids_recherches)
+        print(f"  {'index':<35} {duree:9.3f} ms/recherche")
+        print(f"  construction de l'index {construction:.2f} s, "
+              f"chargement de l'index persisté {chargement:.2f} s")
+        os.chdir(RACINE)
+
+    corrects = sum(1 for i, ex in zip(ids_recherches, trouves) if ex and ex['id'] == i)
+    print(f"recherches par index correctes : {corrects}/{len(ids_recherches)}")
+    sys.exit(0 if corrects == len(ids_recherches) else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Benchmark : choix d'un exercice non complété dans la banque
+
+Un niveau de N candidats dont N-1 sont déjà complétés :
+- avant : pour chaque candidat, rechargement de la progression et recherche
+  de "theme|niveau|str(exercice)[:50]" dans la liste des complétés (ancien
+  est_exercice_complete), puis random.choice parmi les disponibles. Mesuré
+  sur un sous-ensemble de candidats puis extrapolé à N ;
+- après : charger_exercices_completes (un set, une seule lecture) puis
+  tirer_exercice_non_complete (reservoir sampling, un seul passage).
+
+Vérifie aussi l'uniformité du tirage sur 4 candidats non complétés.
+
+La progression est écrite dans un dossier temporaire (obtenir_fichier_progression
+est redirigé), aucune donnée du projet n'est modifiée.
+
+Usage (depuis la racine du dépôt) :
+    python scripts/bench_tirage_exercices.py [--candidats 5000] [--candidats-avant 300] [--tirages 20000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+
+from modules.core import progression as module_progression  # noqa: E402
+from modules.core.fonctions import tirer_exercice_non_complete  # noqa: E402
+from modules.core.journal_progression import ecrire_snapshot  # noqa: E402
+from modules.core.progression import (  # noqa: E402
+    charger_exercices_completes, charger_progression, identifiant_completion, initialiser_progression
+)
+
+THEME = 'Boucles'
+NIVEAU = '3'
+
+
+def candidats_factices(nombre: int) -> list:
+    return [
+        {'id': f"{i:010x}", 'type': 'code', 'enonce': f"Exercice {i} : affichez les {i} premiers carrés"}
+        for i in range(nombre)
+    ]
+
+
+def ecrire_progression(fichier: str, completes: list):
+    progression = initialiser_progression()
+    progression['domaines']['python']['exercices_completes'] = completes
+    ecrire_snapshot(fichier, progression)
+
+
+def _ancien_est_exercice_complete(theme, niveau, exercice):
+    progression = charger_progression()
+    identifiant = f"{theme}|{niveau}|{str(exercice)[:50]}"
+    return identifiant in progression['domaines']['python']['exercices_completes']
+
+
+def tirage_avant(candidats: list):
+    disponibles = [ex for ex in candidats if not _ancien_est_exercice_complete(THEME, NIVEAU, ex)]
+    return random.choice(disponibles) if disponibles else None
+
+
+def tirage_apres(candidats: list):
+    completes = charger_exercices_completes('python')
+    return tirer_exercice_non_complete(candidats, THEME, NIVEAU, completes)[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--candidats', type=int, default=5000)
+    parser.add_argument('--candidats-avant', type=int, default=300,
+                        help="Candidats mesurés pour l'ancien algorithme (extrapolé)")
+    parser.add_argument('--tirages', type=int, default=20000)
+    args = parser.parse_args()
+
+    candidats = candidats_factices(args.candidats)
+    restant = candidats[-1]
+
+    with tempfile.TemporaryDirectory() as dossier:
+        os.chdir(dossier)
+        fichier = os.path.join(dossier, 'progression.json')
+        module_progression.obtenir_fichier_progression = lambda: fichier
+
+        # Avant : complétés au format texte, tous les candidats mesurés le sont
+        ecrire_progression(fichier, [f"{THEME}|{NIVEAU}|{str(ex)[:50]}" for ex in candidats[:-1]])
+        sous_ensemble = candidats[:args.candidats_avant]
+        debut = time.perf_counter()
+        tirage_avant(sous_ensemble)
+        avant = (time.perf_counter() - debut) * 1000 * args.candidats / len(sous_ensemble)
+
+        # Après : complétés par id stable
+        ecrire_progression(fichier, [identifiant_completion(THEME, NIVEAU, ex) for ex in candidats[:-1]])
+        meilleur = float('inf')
+        for _ in range(5):
+            debut = time.perf_counter()
+            choisi = tirage_apres(candidats)
+            meilleur = min(meilleur, time.perf_counter() - debut)
+        apres = meilleur * 1000
+
+        # Uniformité : 4 candidats, aucun complété
+        ecrire_progression(fichier, [])
+        quatre = candidats_factices(4)
+        completes = charger_exercices_completes('python')
+        repartition = Counter(
+            tirer_exercice_non_complete(quatre, THEME, NIVEAU, completes)[0]['id'] for _ in range(args.tirages)
+        )
+        os.chdir(RACINE)
+
+    print(f"{args.candidats} candidats, {args.candidats - 1} déjà complétés")
+    print(f"  avant : {avant:8.1f} ms (extrapolé depuis {len(sous_ensemble)} candidats)")
+    print(f"  après : {apres:8.1f} ms, chargement de la progression compris")
+    print(f"tirage sur 4 candidats x {args.tirages} : {' / '.join(str(n) for n in sorted(repartition.values()))}")
+    correct = choisi is not None and choisi['id'] == restant['id']
+    print(f"exercice restant choisi : {'OK' if correct else 'ÉCHEC'}")
+    sys.exit(0 if correct else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark : verrou lecture/écriture contre verrou exclusif sur un fichier JSON
+
+Des threads lisent (safe_json_read) ou mettent à jour (safe_json_update) un
+même fichier, avec une proportion d'écritures donnée. Deux variantes :
+- rw       : verrou partagé en lecture, exclusif en écriture (file_lock actuel)
+- exclusif : toutes les opérations prennent le verrou exclusif (comportement
+             d'avant les ReadWriteLock)
+
+Une latence disque peut être simulée pendant chaque lecture du fichier
+(verrou tenu) ; sans elle, sur une machine à un cœur, le GIL domine et
+l'écart entre les variantes se réduit. Le cache de lecture est désactivé
+pour que chaque lecture passe par le disque.
+
+Usage (depuis la racine du dépôt) :
+    python scripts/bench_verrous_lecture_ecriture.py [--threads 16] [--ecritures 0.05]
+                                                     [--latence-ms 2] [--duree 3]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+
+from modules.core import file_lock  # noqa: E402
+
+
+def _incrementer(data):
+    data['compteur'] += 1
+    return data
+
+
+def mesurer(fichier: str, threads: int, part_ecritures: float, duree: float) -> dict:
+    """Opérations par seconde pendant duree secondes"""
+    compteurs = {'lectures': 0, 'ecritures': 0}
+    compteurs_lock = threading.Lock()
+    fin = time.perf_counter() + duree
+
+    def travailler():
+        lectures = ecritures = 0
+        while time.perf_counter() < fin:
+            if random.random() < part_ecritures:
+                file_lock.safe_json_update(fichier, _incrementer, durabilite='os')
+                ecritures += 1
+            else:
+                with file_lock.safe_json_read(fichier):
+                    pass
+                lectures += 1
+        with compteurs_lock:
+            compteurs['lectures'] += lectures
+            compteurs['ecritures'] += ecritures
+
+    groupe = [threading.Thread(target=travailler) for _ in range(threads)]
+    for thread in groupe:
+        thread.start()
+    for thread in groupe:
+        thread.join()
+    return {cle: valeur / duree for cle, valeur in compteurs.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--ecritures', type=float, default=0.05, help="Part d'écritures (0-1)")
+    parser.add_argument('--latence-ms', type=float, default=2.0, help='Latence disque simulée par lecture')
+    parser.add_argument('--duree', type=float, default=3.0, help='Durée de chaque mesure (s)')
+    args = parser.parse_args()
+
+    file_lock.configurer_cache_json(actif=False)
+    lire_json = file_lock._lire_json
+    verrou_fichier = file_lock.verrou_fichier
+
+    def lire_json_lent(filepath, *a, **kw):
+        time.sleep(args.latence_ms / 1000)
+        return lire_json(filepath, *a, **kw)
+
+    def verrou_exclusif(filepath, exclusif=True):
+        return verrou_fichier(filepath, exclusif=True)
+
+    file_lock._lire_json = lire_json_lent
+
+    with tempfile.TemporaryDirectory() as dossier:
+        os.chdir(dossier)
+        fichier = os.path.join(dossier, 'donnees.json')
+        with file_lock.atomic_json_writer(fichier) as writer:
+            writer({'compteur': 0, 'entrees': [{'id': i, 'valeur': 'x' * 20} for i in range(500)]})
+
+        print(f"{args.threads} threads, {args.ecritures:.0%} d'écritures, "
+              f"latence simulée {args.latence_ms} ms, {args.duree} s par variante")
+        for nom, verrou in (('exclusif', verrou_exclusif), ('rw', verrou_fichier)):
+            file_lock.verrou_fichier = verrou
+            debit = mesurer(fichier, args.threads, args.ecritures, args.duree)
+            print(f"  {nom:<9} {debit['lectures']:8.0f} lectures/s  {debit['ecritures']:6.0f} écritures/s")
+        file_lock.verrou_fichier = verrou_fichier
+        os.chdir(RACINE)
+
+
+if __name__ == '__main__':
+    main()
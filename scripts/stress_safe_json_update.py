@@ -0,0 +1,115 @@
+"""
+Test de charge : safe_json_update depuis plusieurs processus et threads
+
+Chaque processus lance des threads qui incrémentent un compteur dans un même
+fichier JSON via safe_json_update. Sans verrou inter-processus (flock sur le
+sidecar '<fichier>.lock'), des lectures-modifications-écritures concurrentes
+se chevauchent et des incréments sont perdus.
+
+Usage (depuis la racine du dépôt) :
+    python scripts/stress_safe_json_update.py [--processus 8] [--threads 2] [--increments 50]
+
+Code de sortie 0 si le compteur final vaut processus x threads x increments
+(aucune mise à jour perdue), 1 sinon.
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+
+
+def _incrementer(data):
+    data['compteur'] = data.get('compteur', 0) + 1
+    data.setdefault('par_processus', {})
+    cle = str(os.getpid())
+    data['par_processus'][cle] = data['par_processus'].get(cle, 0) + 1
+    return data
+
+
+def _processus(fichier: str, threads: int, increments: int, depart):
+    """Lance les threads d'un processus, tous démarrés en même temps"""
+    from modules.core.file_lock import safe_json_update
+
+    # Les logs de file_lock sont écrits relativement au dossier courant
+    os.chdir(os.path.dirname(fichier))
+    depart.wait()
+
+    erreurs = []
+
+    def travailler():
+        try:
+            for _ in range(increments):
+                safe_json_update(fichier, _incrementer)
+        except Exception as e:
+            erreurs.append(e)
+
+    groupe = [threading.Thread(target=travailler) for _ in range(threads)]
+    for thread in groupe:
+        thread.start()
+    for thread in groupe:
+        thread.join()
+    if erreurs:
+        print(f"processus {os.getpid()} : {erreurs[0]}", file=sys.stderr)
+        sys.exit(1)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--processus', type=int, default=8)
+    parser.add_argument('--threads', type=int, default=2)
+    parser.add_argument('--increments', type=int, default=50)
+    args = parser.parse_args()
+
+    from modules.core.file_lock import atomic_json_writer, safe_json_read
+
+    attendu = args.processus * args.threads * args.increments
+    with tempfile.TemporaryDirectory() as dossier:
+        fichier = os.path.join(dossier, 'compteur.json')
+        os.chdir(dossier)
+        with atomic_json_writer(fichier) as writer:
+            writer({'compteur': 0})
+
+        # spawn : chaque processus a son propre registre de verrous, comme
+        # des workers gunicorn
+        contexte = multiprocessing.get_context('spawn')
+        depart = contexte.Event()
+        processus = [
+            contexte.Process(target=_processus, args=(fichier, args.threads, args.increments, depart))
+            for _ in range(args.processus)
+        ]
+        for p in processus:
+            p.start()
+        debut = time.perf_counter()
+        depart.set()
+        for p in processus:
+            p.join()
+        duree = time.perf_counter() - debut
+
+        with safe_json_read(fichier) as data:
+            obtenu = data['compteur']
+            repartition = sorted(data.get('par_processus', {}).values())
+        os.chdir(RACINE)
+
+    echecs = [p.exitcode for p in processus if p.exitcode != 0]
+    print(f"{args.processus} processus x {args.threads} threads x {args.increments} incréments")
+    print(f"compteur : {obtenu}/{attendu} en {duree:.2f} s ({attendu / duree:.0f} mises à jour/s)")
+    print(f"incréments par processus : {repartition}")
+    if echecs:
+        print(f"ÉCHEC : {len(echecs)} processus en erreur (codes {echecs})")
+        return 1
+    if obtenu != attendu:
+        print(f"ÉCHEC : {attendu - obtenu} mises à jour perdues")
+        return 1
+    print("OK : aucune mise à jour perdue")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())